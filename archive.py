@@ -0,0 +1,291 @@
+import os
+import sys
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+from get_city_name import EARTH_RADIUS_KM
+from sounding import Sounding, PROFILE_FIELDS
+
+# Consolidated store of parsed soundings: chunk files of level columns plus a SQLite index
+ARCHIVE_DIR = os.environ.get('RADIOSONDE_ARCHIVE', 'SoundingArchive')
+ARCHIVE_VERSION = 1
+
+# Rows of every chunk: the profile fields (parse_geojson units) and the BUFR significance flags
+ARCHIVE_ROWS = list(PROFILE_FIELDS) + ['flags']
+CHUNK_LEVELS = 1 << 20  # Level capacity of a chunk file (~56 MB, allocated sparsely as it fills)
+
+class SoundingArchive:
+    """
+    Append-only archive of parsed soundings, indexed by station and synoptic time.
+
+    Profiles are stored as ragged arrays: every chunk file is one (ARCHIVE_ROWS, capacity) float64 block,
+    and a sounding occupies the `levels` columns from `offset` in one chunk. The SQLite index maps
+    station_id x syn_timestamp (and position) to that range, so a query never opens a JSON file and a
+    loaded Sounding is a view of the memory-mapped chunk. Archiving the same station and time again
+    replaces the index entry; the old levels stay in the chunk as unused space.
+    """
+
+    def __init__(self, path=ARCHIVE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(path, 'index.sqlite'), timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS chunks (chunk INTEGER PRIMARY KEY, capacity INTEGER NOT NULL, used INTEGER NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS soundings ('
+                'station_id TEXT NOT NULL, syn_timestamp INTEGER NOT NULL, lat REAL NOT NULL, lon REAL NOT NULL, '
+                'elevation REAL NOT NULL, location TEXT, chunk INTEGER NOT NULL, offset INTEGER NOT NULL, '
+                'levels INTEGER NOT NULL, source TEXT, size INTEGER, mtime_ns INTEGER, '
+                'PRIMARY KEY (station_id, syn_timestamp))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS soundings_time ON soundings (syn_timestamp)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS soundings_position ON soundings (lat, lon)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS soundings_source ON soundings (source)')
+            self.connection.execute('INSERT OR IGNORE INTO meta VALUES (?, ?)', ('version', str(ARCHIVE_VERSION)))
+            self.connection.execute('INSERT OR IGNORE INTO meta VALUES (?, ?)', ('rows', ','.join(ARCHIVE_ROWS)))
+        version, rows = (self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()[0]
+                         for key in ('version', 'rows'))
+        if version != str(ARCHIVE_VERSION) or rows != ','.join(ARCHIVE_ROWS):
+            raise ValueError(f'{path} is an archive of version {version} with rows {rows}, expected {ARCHIVE_VERSION}')
+        self._chunks = {}  # chunk -> read-only memory map
+
+    def _chunk_path(self, chunk):
+        return os.path.join(self.path, f'chunk_{chunk:05d}.f64')
+
+    def _chunk(self, chunk):
+        if chunk not in self._chunks:
+            capacity = self.connection.execute('SELECT capacity FROM chunks WHERE chunk = ?', (chunk,)).fetchone()[0]
+            self._chunks[chunk] = np.memmap(self._chunk_path(chunk), dtype=np.float64, mode='r',
+                                            shape=(len(ARCHIVE_ROWS), capacity))
+        return self._chunks[chunk]
+
+    def _allocate(self, levels):
+        # Inside the write transaction: the chunk and offset for `levels` new levels
+        row = self.connection.execute('SELECT chunk, capacity, used FROM chunks ORDER BY chunk DESC LIMIT 1').fetchone()
+        if row is not None and row['used'] + levels <= row['capacity']:
+            return row['chunk'], row['capacity'], row['used']
+        chunk = 0 if row is None else row['chunk'] + 1
+        capacity = max(CHUNK_LEVELS, levels)
+        # Sparse file: disk space is only used as levels are written
+        with open(self._chunk_path(chunk), 'wb') as f:
+            f.truncate(len(ARCHIVE_ROWS) * capacity * 8)
+        self.connection.execute('INSERT INTO chunks VALUES (?, ?, 0)', (chunk, capacity))
+        return chunk, capacity, 0
+
+    def append(self, sounding, source=None):
+        """
+        Add a sounding, replacing any archived sounding of the same station and synoptic time.
+
+        Parameters:
+        - sounding: Sounding to store
+        - source: Optional path of the file it was parsed from, so an unchanged file isn't archived twice
+        """
+        levels = len(sounding)
+        flags = np.full(levels, np.nan) if sounding.flags is None else sounding.flags
+        block = np.vstack((sounding.profile, flags)).astype(np.float64, copy=False)
+        stat = os.stat(source) if source is not None else None
+
+        # BEGIN IMMEDIATE takes the write lock before the offset is read, so concurrent writers never overlap
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            chunk, capacity, offset = self._allocate(levels)
+            with open(self._chunk_path(chunk), 'r+b') as f:
+                for row, values in enumerate(block):
+                    f.seek((row * capacity + offset) * 8)
+                    f.write(np.ascontiguousarray(values).tobytes())
+            self.connection.execute('UPDATE chunks SET used = ? WHERE chunk = ?', (offset + levels, chunk))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO soundings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (str(sounding.station_id), _syn_timestamp(sounding.timestamp), float(sounding.lat), float(sounding.lon),
+                 float(sounding.elevation), sounding.location, chunk, offset, levels,
+                 None if source is None else os.path.abspath(source),
+                 None if stat is None else stat.st_size, None if stat is None else stat.st_mtime_ns))
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+
+    def is_archived(self, source):
+        """True when `source` was archived and has not changed since (same size and modification time)."""
+        row = self.connection.execute('SELECT size, mtime_ns FROM soundings WHERE source = ? ORDER BY rowid DESC LIMIT 1',
+                                      (os.path.abspath(source),)).fetchone()
+        if row is None:
+            return False
+        stat = os.stat(source)
+        return (row['size'], row['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)
+
+    def add_files(self, paths, use_cache=True):
+        """
+        Parse and archive sounding files, skipping the ones archived unchanged.
+
+        Returns:
+        - added: Number of soundings archived
+        - failures: List of (path, error message) tuples
+        """
+        from parse_geojson import parse_geojson
+        from sounding_cache import load_sounding
+
+        parse = load_sounding if use_cache else parse_geojson
+        added, failures = 0, []
+        for path in paths:
+            try:
+                if not self.is_archived(path):
+                    self.append(parse(path), source=path)
+                    added += 1
+            except Exception as e:
+                failures.append((path, f'{type(e).__name__}: {e}'))
+        return added, failures
+
+    def query(self, station_id=None, start=None, end=None, hour=None, near=None):
+        """
+        Index entries of the archived soundings matching every given condition, ordered by station and time.
+
+        Parameters:
+        - station_id: WMO station ID
+        - start, end: datetime bounds of the synoptic time (start inclusive, end exclusive; naive means UTC)
+        - hour: Synoptic hour (UTC), e.g. 12 for the 12Z launches
+        - near: (lat, lon, radius_km), great-circle distance from the point
+
+        Returns:
+        - List of sqlite3.Row index entries (station_id, syn_timestamp, lat, lon, elevation, location,
+          chunk, offset, levels, source, ...), see `sounding` to load one
+        """
+        conditions, parameters = [], []
+        if station_id is not None:
+            conditions.append('station_id = ?')
+            parameters.append(str(station_id))
+        if start is not None:
+            conditions.append('syn_timestamp >= ?')
+            parameters.append(_syn_timestamp(start))
+        if end is not None:
+            conditions.append('syn_timestamp < ?')
+            parameters.append(_syn_timestamp(end))
+        if hour is not None:
+            conditions.append('((syn_timestamp % 86400) + 86400) % 86400 / 3600 = ?')
+            parameters.append(int(hour))
+        if near is not None:
+            # Bounding box on the position index first, the exact distance below
+            lat, lon, radius_km = near
+            box, box_parameters = _bounding_box(lat, lon, radius_km)
+            conditions.append(box)
+            parameters += box_parameters
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self.connection.execute(
+            f'SELECT * FROM soundings{where} ORDER BY station_id, syn_timestamp', parameters).fetchall()
+        if near is not None and rows:
+            distance = great_circle_km(lat, lon, [row['lat'] for row in rows], [row['lon'] for row in rows])
+            rows = [row for row, km in zip(rows, distance) if km <= radius_km]
+        return rows
+
+    def sounding(self, entry):
+        """The Sounding of an index entry from `query`; its profile is a read-only view of the memory-mapped chunk."""
+        block = self._chunk(entry['chunk'])[:, entry['offset']:entry['offset'] + entry['levels']]
+        return Sounding(
+            block[:len(PROFILE_FIELDS)], entry['elevation'], entry['station_id'], entry['lat'], entry['lon'],
+            entry['location'], datetime.utcfromtimestamp(entry['syn_timestamp']), block[len(PROFILE_FIELDS)])
+
+    def soundings(self, **conditions):
+        """Yield (entry, Sounding) for every archived sounding matching `query(**conditions)`."""
+        for entry in self.query(**conditions):
+            yield entry, self.sounding(entry)
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM soundings').fetchone()[0]
+
+    def close(self):
+        self._chunks.clear()
+        self.connection.close()
+
+def archive_name(entry):
+    """File name of an archive entry, for index rows and figures: the archived source, or <station_id>.json."""
+    return os.path.basename(entry['source']) if entry['source'] else f"{entry['station_id']}.json"
+
+def _syn_timestamp(timestamp):
+    # Unix seconds; naive datetimes are UTC, as everywhere in the pipeline
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return int(timestamp.timestamp())
+    return int(timestamp)
+
+def _bounding_box(lat, lon, radius_km):
+    # SQL condition on lat/lon that holds for every point within radius_km of (lat, lon), with its parameters
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_min, lat_max = lat - np.degrees(angle), lat + np.degrees(angle)
+    if lat_min <= -90 or lat_max >= 90 or np.sin(angle) >= np.cos(np.radians(lat)):
+        # The circle contains a pole: every longitude
+        return 'lat BETWEEN ? AND ?', [lat_min, lat_max]
+    dlon = np.degrees(np.arcsin(np.sin(angle) / np.cos(np.radians(lat))))
+    lon_min, lon_max = lon - dlon, lon + dlon
+    if lon_min < -180:
+        return 'lat BETWEEN ? AND ? AND (lon >= ? OR lon <= ?)', [lat_min, lat_max, lon_min + 360, lon_max]
+    if lon_max > 180:
+        return 'lat BETWEEN ? AND ? AND (lon >= ? OR lon <= ?)', [lat_min, lat_max, lon_min, lon_max - 360]
+    return 'lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?', [lat_min, lat_max, lon_min, lon_max]
+
+def great_circle_km(lat, lon, lats, lons):
+    """Haversine distance (km) from one point to arrays of points."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lons, dtype=float))
+    h = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+def add_query_arguments(parser):
+    """Add the archive selection options (--station, --start, --end, --hour, --near) to an argparse parser."""
+    parser.add_argument('--station', default=None, help='Only this WMO station ID')
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                        help='First synoptic time, ISO format in UTC (e.g. 2024-05-01)')
+    parser.add_argument('--end', type=datetime.fromisoformat, default=None,
+                        help='Synoptic times before this one, ISO format in UTC (e.g. 2024-06-01)')
+    parser.add_argument('--hour', type=int, default=None, help='Only launches for this synoptic hour (UTC), e.g. 12')
+    parser.add_argument('--near', type=float, nargs=3, default=None, metavar=('LAT', 'LON', 'KM'),
+                        help='Only stations within KM kilometers of LAT, LON')
+
+def query_arguments(args):
+    """The `query` conditions of parsed add_query_arguments options."""
+    return {'station_id': args.station, 'start': args.start, 'end': args.end, 'hour': args.hour, 'near': args.near}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Archive parsed soundings and query them by station, time and position.')
+    parser.add_argument('--archive', default=ARCHIVE_DIR, help='Archive directory (default: RADIOSONDE_ARCHIVE or SoundingArchive)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='Parse GeoJSON files (or every .json file of directories) into the archive')
+    add.add_argument('paths', nargs='+')
+    add.add_argument('--no-cache', action='store_true', help='Always parse the JSON, ignoring the binary sounding cache')
+    query = commands.add_parser('query', help='List the archived soundings matching the options')
+    add_query_arguments(query)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    archive = SoundingArchive(args.archive)
+    try:
+        if args.command == 'add':
+            paths = []
+            for path in args.paths:
+                if os.path.isdir(path):
+                    paths += sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json'))
+                else:
+                    paths.append(path)
+            added, failures = archive.add_files(paths, not args.no_cache)
+            print(f'  > ARCHIVED: {added}/{len(paths)} soundings ({len(paths) - added - len(failures)} unchanged) '
+                  f'| {len(archive)} in {args.archive}')
+            for path, error in failures:
+                print(f'  > FAILED: {path} | {error}')
+            return 1 if failures else 0
+
+        for entry in archive.query(**query_arguments(args)):
+            timestamp = datetime.utcfromtimestamp(entry['syn_timestamp'])
+            print(f"{entry['station_id']}  {timestamp:%Y-%m-%d %H:%MZ}  {entry['lat']:8.3f} {entry['lon']:9.3f}  "
+                  f"{entry['levels']:6d} levels  {entry['location']}")
+        return 0
+    finally:
+        archive.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
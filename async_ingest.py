@@ -0,0 +1,211 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import urllib.request
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from stream_geojson import stream_geojson
+from parse_geojson import parse_columns
+from qc import quality_control
+from get_city_name import get_city_name, rate_limited_reverse, OFFLINE
+from sounding_cache import cached_sounding, store_sounding
+from main import INPUT_DIR, render_sounding, make_pool, configure_memory_guard, format_runtime, run_guarded, stop_on_memory_ceiling
+from memory_guard import MAX_MEMORY_MB
+from metrics import configure_metrics, METRICS_PATH, PROFILE_DIR, PROFILER
+
+# Asyncio front end: reads, downloads, geocoding and the map data fetch overlap across soundings,
+# and parsed profiles go straight to the render pool.
+
+MAX_CONCURRENCY = 16  # Reads / downloads in flight
+QUEUE_PER_WORKER = 2  # Parsed soundings waiting per render worker, bounds the memory held by the front end
+NOMINATIM_DELAY = 1.0  # Seconds between Nominatim requests (usage policy: at most one per second)
+FETCH_TIMEOUT = 60  # Seconds per HTTP download
+
+def is_url(source):
+    return urlsplit(str(source)).scheme in ('http', 'https')
+
+def source_name(source):
+    """Output name of a sounding source: the file name of a path or of a URL's path."""
+    return os.path.basename(urlsplit(source).path if is_url(source) else source)
+
+def _read(source):
+    if is_url(source):
+        request = urllib.request.Request(source, headers={'User-Agent': 'SkewTdiagram'})
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            return response.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+def _read_columns(data):
+    # Parse and QC on an I/O thread: both are whole-array passes over every level, too long for the event loop
+    raw_columns, properties = stream_geojson(data)
+    columns, report = quality_control(raw_columns)
+    return raw_columns, properties, columns, report
+
+class Geocoder:
+    """
+    get_city_name for the event loop.
+
+    Every lookup runs on one dedicated thread, which owns the SQLite cache connection and spaces
+    Nominatim requests NOMINATIM_DELAY apart, so concurrency never breaks the usage policy.
+    Concurrent lookups of the same station share one request.
+    """
+
+    def __init__(self, delay=NOMINATIM_DELAY, offline=None):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='geocode')
+        self.delay = delay
+        self.offline = OFFLINE if offline is None else offline
+        self._reverse = None
+        self._pending = {}
+
+    def _lookup(self, lat, lon, station_id):
+        if self._reverse is None and not self.offline:
+            # Errors reach get_city_name, which falls back to the nearest cached station instead of caching a failure
+            self._reverse = rate_limited_reverse(self.delay, swallow_exceptions=False)
+        return get_city_name(lat, lon, station_id, self.offline, self._reverse)
+
+    async def city_name(self, lat, lon, station_id=None):
+        key = station_id if station_id is not None else (round(lat, 2), round(lon, 2))
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = asyncio.get_running_loop().run_in_executor(
+                self.executor, self._lookup, lat, lon, station_id)
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(future)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+async def load(source, geocoder, io_executor, use_cache=True):
+    """
+    Parse one sounding (path or http(s) URL) without blocking the event loop.
+
+    Local files are served from the sounding cache when it is up to date. Otherwise the bytes are read
+    on the I/O threads and parsed and quality-controlled there, and local files then get a fresh cache
+    entry. Either way the place name comes from `geocoder`.
+
+    Returns:
+    - Sounding
+    """
+    loop = asyncio.get_running_loop()
+    local = not is_url(source)
+    if local and use_cache:
+        sounding = await loop.run_in_executor(io_executor, cached_sounding, source, 'mtime', False)
+        if sounding is not None:
+            sounding.location = await geocoder.city_name(sounding.lat, sounding.lon, sounding.station_id)
+            return sounding
+
+    data = await loop.run_in_executor(io_executor, _read, source)
+    # A rejected profile fails here, before it is geocoded or sent to a worker
+    raw_columns, properties, columns, report = await loop.run_in_executor(io_executor, _read_columns, data)
+    location = await geocoder.city_name(properties['lat'], properties['lon'], properties['station_id'])
+    sounding = await loop.run_in_executor(io_executor, parse_columns, columns, properties, location, report)
+
+    if local and use_cache:
+        await loop.run_in_executor(io_executor, store_sounding, source, raw_columns, properties, sounding)
+    return sounding
+
+async def ingest(sources, workers=1, use_cache=True, max_concurrency=MAX_CONCURRENCY, max_memory=MAX_MEMORY_MB,
+                 trace_memory=False, recycle_after=None, metrics=METRICS_PATH, profile_dir=PROFILE_DIR, profiler=PROFILER,
+                 geocoder=None, manifest=None):
+    """
+    Load and render many soundings, overlapping all of their I/O.
+
+    Up to `max_concurrency` reads or downloads run at once, geocoding goes through a rate-limited
+    Geocoder, and the Natural Earth layers are fetched once in the background while the first soundings
+    load. Parsed soundings are rendered by a pool of `workers` processes (one background thread when
+    workers is 1, which stops rendering once the process stays above `max_memory`); at most
+    QUEUE_PER_WORKER parsed soundings per worker wait for it. Successful
+    renders of local files are recorded in `manifest` (a RenderManifest), if given.
+
+    Parameters:
+    - sources: Paths or http(s) URLs of GeoJSON soundings
+
+    Returns:
+    - failures: List of (source, error message) tuples
+    """
+    from map_data import ensure_boundaries
+
+    loop = asyncio.get_running_loop()
+    own_geocoder = geocoder is None
+    geocoder = geocoder or Geocoder()
+    io_executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='io')
+    if workers <= 1:
+        configure_memory_guard(max_memory, trace_memory)
+        configure_metrics(metrics, profile_dir, profiler)
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        executor = make_pool(workers, max_memory, trace_memory, recycle_after, metrics, profile_dir, profiler)
+
+    # Bounds the soundings between read and render, so a large batch isn't parsed into memory ahead of the pool
+    admitted = asyncio.Semaphore(max_concurrency + QUEUE_PER_WORKER * max(workers, 1))
+    map_data = loop.run_in_executor(io_executor, ensure_boundaries)
+    failures = []
+    total, done = len(sources), 0
+    ceiling, skipped = None, []  # MemoryCeilingError of the single render process, and the sources left undone after it
+
+    def render_here(sounding, name):
+        # workers=1, on the render thread: this process can't be replaced, so it renders nothing more once above its ceiling
+        nonlocal ceiling
+        if ceiling is not None:
+            return None
+        result, ceiling = run_guarded(render_sounding, sounding, name)
+        return result
+
+    render = render_here if workers <= 1 else render_sounding
+
+    async def process(source):
+        nonlocal done
+        async with admitted:
+            try:
+                result = None
+                if ceiling is None:
+                    sounding = await load(source, geocoder, io_executor, use_cache)
+                    await map_data
+                    result = await loop.run_in_executor(executor, render, sounding, source_name(source))
+                if result is None:
+                    skipped.append(source)
+                    return
+                elapsed_time, outputs = result
+                if manifest is not None and not is_url(source):
+                    manifest.record(source, outputs)
+                done += 1
+                print(f'  > [{done}/{total}] DONE: {source} | RUNTIME: {format_runtime(elapsed_time)}')
+            except Exception as e:
+                done += 1
+                failures.append((source, f'{type(e).__name__}: {e}'))
+                print(f'  > [{done}/{total}] FAILED: {source} | {type(e).__name__}: {e}')
+
+    try:
+        with executor:
+            await asyncio.gather(*(process(source) for source in sources))
+        if ceiling is not None:
+            failures += stop_on_memory_ceiling(ceiling, skipped)
+    finally:
+        io_executor.shutdown(wait=True)
+        if own_geocoder:
+            geocoder.close()
+    return failures
+
+def run_async(sources, workers=1, use_cache=True, max_concurrency=MAX_CONCURRENCY, **options):
+    """Blocking entry point for ingest(), see there."""
+    return asyncio.run(ingest(sources, workers, use_cache, max_concurrency, **options))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch, parse and render soundings with overlapping I/O.')
+    parser.add_argument('sources', nargs='*', help=f'GeoJSON paths or http(s) URLs (default: every .json in {INPUT_DIR})')
+    parser.add_argument('--workers', type=int, default=1, help='Render worker processes (default: 1)')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY,
+                        help=f'Reads / downloads in flight (default: {MAX_CONCURRENCY})')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the JSON, ignoring the binary sounding cache')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    sources = args.sources or sorted(os.path.join(INPUT_DIR, f) for f in os.listdir(INPUT_DIR) if f.endswith('.json'))
+    start_time = time.time()
+    failures = run_async(sources, args.workers, not args.no_cache, args.concurrency)
+    print(f'\n  > ASYNC: {len(sources) - len(failures)}/{len(sources)} soundings in {format_runtime(time.time() - start_time)}')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,578 @@
+"""
+Vectorized Skew-T diagnostics for many soundings at once.
+
+Profiles are NaN-padded (N, L) arrays ordered from the surface upward (pressure decreasing),
+in the units used everywhere else: hPa, °C, kt, m. Everything runs on bare NumPy magnitudes,
+reproducing the MetPy calls of skewT_calc, which takes its parcel analysis from here. Over the
+sample soundings the results match MetPy within TOLERANCES; the only difference is that moist
+ascent is integrated with fixed-step RK4 in log-pressure (Hermite-interpolated between steps)
+instead of LSODA.
+"""
+import numpy as np
+from scipy.special import lambertw
+
+# Physical constants, same values as metpy.constants
+RD = 287.04749097718457  # J/(kg K)
+RV = 461.52311572606084  # J/(kg K)
+CP_D = 1004.6662184201462  # J/(kg K)
+CP_V = 1860.078011865639  # J/(kg K)
+CP_L = 4219.400000000001  # J/(kg K)
+LV = 2500840.0  # J/kg
+T0 = 273.16  # K, triple point
+ZERO_DEGC = 273.15  # K
+SAT_PRESSURE_0C = 611.2  # Pa
+EPSILON = 0.6219569100577033
+KAPPA = 0.28571428571428564
+G = 9.80665  # m/s^2
+RHO_L = 999.97495  # kg/m^3
+KTS_TO_MS = 1852 / 3600
+
+MOIST_LOG_P_STEP = 0.05  # RK4 step in ln(p) of the moist ascent
+
+# Agreement with MetPy on the sample soundings, checked by tests/test_batch_calc.py: absolute tolerance per index
+TOLERANCES = {
+    'cape': 1.0, 'cin': 1.0,  # J/kg
+    'mlcape': 1.0, 'mlcin': 10.0, 'mucape': 1.0, 'mucin': 1.0,  # J/kg, MetPy's ML/MU functions also integrate over an inserted LCL level
+    'pressure_lcl': 0.01, 'pressure_lfc': 0.1, 'pressure_el': 0.1, 'pressure_ccl': 0.01,  # hPa
+    'temperature_lcl': 0.01, 'temperature_lfc': 0.01, 'temperature_el': 0.01, 'temperature_ccl': 0.01,  # °C
+    'height_lcl': 1.0, 'height_lfc': 1.0, 'height_el': 1.0, 'height_ccl': 1.0,  # m
+    'u_storm': 1e-6, 'v_storm': 1e-6, 'u_storm3': 1e-6, 'v_storm3': 1e-6,  # kt
+    'li': 1e-6, 'vt': 1e-6, 'tt': 1e-6,  # °C
+    'srh3': 1e-6, 'srh6': 1e-6,  # m²/s²
+    'pwat': 1e-6, 'frz': 1e-6,  # mm, m
+}
+
+def pad_profiles(profiles):
+    """
+    Stack ragged profiles into NaN-padded 2-D arrays.
+
+    Parameters:
+    - profiles: Iterable of Sounding.profile blocks, or of (pressures, temperatures, dewpoints, wind_u, wind_v, heights) 1-D arrays
+
+    Returns:
+    - Tuple of six (N, L) arrays; levels with a missing value in any variable are dropped
+    """
+    profiles = [np.asarray(profile, dtype=float) for profile in (np.vstack(p) for p in profiles)]
+    profiles = [profile[:, np.all(np.isfinite(profile), axis=0)] for profile in profiles]
+    levels = max(profile.shape[1] for profile in profiles)
+
+    padded = np.full((6, len(profiles), levels), np.nan)
+    for i, profile in enumerate(profiles):
+        padded[:, i, :profile.shape[1]] = profile
+    return tuple(padded)
+
+# Thermodynamic helpers (SI units: Pa, K) -------------------------------------------------------------------------------
+def _saturation_vapor_pressure(temperature):
+    latent_heat = LV - (CP_L - CP_V) * (temperature - T0)
+    heat_power = (CP_L - CP_V) / RV
+    exp_term = (LV / T0 - latent_heat / temperature) / RV
+    return SAT_PRESSURE_0C * (T0 / temperature) ** heat_power * np.exp(exp_term)
+
+def _mixing_ratio(partial_press, total_press):
+    return EPSILON * partial_press / (total_press - partial_press)
+
+def _saturation_mixing_ratio(pressure, temperature):
+    e_s = _saturation_vapor_pressure(temperature)
+    with np.errstate(invalid='ignore'):
+        return np.where(e_s >= pressure, np.nan, _mixing_ratio(e_s, pressure))
+
+def _dewpoint_from_vapor_pressure(vapor_pressure):
+    val = np.log(vapor_pressure / SAT_PRESSURE_0C)
+    return ZERO_DEGC + 243.5 * val / (17.67 - val)
+
+def _virtual_temperature(temperature, mixing_ratio):
+    return temperature * (mixing_ratio + EPSILON) / (EPSILON * (1 + mixing_ratio))
+
+def _lcl(pressure, temperature, dewpoint):
+    # Romps (2017), as in metpy.calc.lcl
+    r = _saturation_mixing_ratio(pressure, dewpoint)
+    q = r / (1 + r)
+    moist_heat_ratio = (CP_D + q * (CP_V - CP_D)) / (RD + q * (RV - RD))
+    spec_heat_diff = CP_L - CP_V
+    a = moist_heat_ratio + spec_heat_diff / RV
+    b = -(LV + spec_heat_diff * T0) / (RV * temperature)
+    c = b / a
+    rh = _saturation_vapor_pressure(dewpoint) / _saturation_vapor_pressure(temperature)
+    w_minus1 = lambertw(rh ** (1 / a) * c * np.exp(c), k=-1).real
+    t_lcl = c / w_minus1 * temperature
+    p_lcl = pressure * (t_lcl / temperature) ** moist_heat_ratio
+    return p_lcl, t_lcl
+
+def _moist_lapse_rate(log_p, temperature):
+    # dT/dln(p) along a saturated pseudo-adiabat
+    rs = _saturation_mixing_ratio(np.exp(log_p), temperature)
+    return (RD * temperature + LV * rs) / (CP_D + LV * LV * rs * EPSILON / (RD * temperature ** 2))
+
+def _moist_ascent(log_p, temperature, log_levels):
+    """
+    Saturated pseudo-adiabat of every row from (log_p, temperature) up to the levels log_levels (N, L).
+
+    RK4 runs on nodes MOIST_LOG_P_STEP apart in ln(p), the same nodes for every row relative to its
+    start, and the levels between two nodes are filled by cubic Hermite interpolation with the lapse
+    rates at both nodes. The number of steps depends on the depth of the ascent, not on the vertical
+    resolution of the sounding. Levels below the start come out NaN.
+    """
+    with np.errstate(invalid='ignore'):
+        depth = np.where(log_levels <= log_p[:, None], log_p[:, None] - log_levels, np.nan)
+    steps = max(int(np.ceil(np.nanmax(depth, initial=0) / MOIST_LOG_P_STEP)), 1)
+    h = -MOIST_LOG_P_STEP
+
+    nodes, slopes = [temperature], [_moist_lapse_rate(log_p, temperature)]
+    for _ in range(steps):
+        k1 = slopes[-1]
+        k2 = _moist_lapse_rate(log_p + h / 2, temperature + h / 2 * k1)
+        k3 = _moist_lapse_rate(log_p + h / 2, temperature + h / 2 * k2)
+        k4 = _moist_lapse_rate(log_p + h, temperature + h * k3)
+        temperature = temperature + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        log_p = log_p + h
+        nodes.append(temperature)
+        slopes.append(_moist_lapse_rate(log_p, temperature))
+    nodes, slopes = np.stack(nodes, axis=1), np.stack(slopes, axis=1) * h
+
+    position = depth / MOIST_LOG_P_STEP
+    index = np.clip(np.floor(np.nan_to_num(position)).astype(int), 0, steps - 1)
+    s = position - index
+    t0, t1 = np.take_along_axis(nodes, index, axis=1), np.take_along_axis(nodes, index + 1, axis=1)
+    d0, d1 = np.take_along_axis(slopes, index, axis=1), np.take_along_axis(slopes, index + 1, axis=1)
+    return ((2 * s - 3) * s * s + 1) * t0 + ((s - 2) * s + 1) * s * d0 + (3 - 2 * s) * s * s * t1 + (s - 1) * s * s * d1
+
+def _parcel_profile(pressure, temperature, dewpoint, lcl=None):
+    """Parcel temperature (K) at every level, lifted from the first one: dry adiabat to the LCL, moist pseudo-adiabat above."""
+    p_lcl, _ = lcl or _lcl(pressure[:, 0], temperature, dewpoint)
+    parcel = temperature[:, None] * (pressure / pressure[:, :1]) ** KAPPA
+
+    # One ascent for all soundings, each starting from its LCL
+    with np.errstate(invalid='ignore'):
+        above_lcl = pressure < p_lcl[:, None]
+    if not above_lcl.any():
+        return parcel
+    moist_t = _moist_ascent(np.log(p_lcl), temperature * (p_lcl / pressure[:, 0]) ** KAPPA, np.log(pressure))
+    return np.where(above_lcl, moist_t, parcel)
+
+# Profile searches --------------------------------------------------------------------------------------------------------
+def _last_valid(values):
+    # Value at the top (last non-NaN level) of every row
+    last = values.shape[1] - 1 - np.argmax(np.isfinite(values)[:, ::-1], axis=1)
+    return values[np.arange(values.shape[0]), last]
+
+def _first_true(mask, values):
+    index = np.argmax(mask, axis=1)
+    return np.where(mask.any(axis=1), values[np.arange(values.shape[0]), index], np.nan)
+
+def _last_true(mask, values):
+    index = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    return np.where(mask.any(axis=1), values[np.arange(values.shape[0]), index], np.nan)
+
+def _intersections(pressure, a, b):
+    """
+    Crossings of profiles a and b on every segment between consecutive levels (log-pressure interpolation).
+
+    Returns (x, y, direction), each (N, L - 1): the crossing pressure, the value of `a` there, and the
+    sign of a - b just above the crossing; x is NaN on segments without a crossing.
+    """
+    diff = a - b
+    sign = np.sign(diff)
+    crossing = np.isfinite(diff[:, :-1]) & np.isfinite(diff[:, 1:]) & (sign[:, :-1] != sign[:, 1:])
+
+    log_p = np.log(pressure)
+    x0, x1 = log_p[:, :-1], log_p[:, 1:]
+    d0, d1 = diff[:, :-1], diff[:, 1:]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = (d1 * x0 - d0 * x1) / (d1 - d0)
+        y = (x - x0) / (x1 - x0) * (a[:, 1:] - a[:, :-1]) + a[:, :-1]
+
+    return np.where(crossing, np.exp(x), np.nan), np.where(crossing, y, np.nan), np.where(crossing, sign[:, 1:], 0)
+
+def _interp_rows(target, pressure, values, log_p=False):
+    # Linear interpolation of every row at its own target pressure; NaN outside the profile
+    with np.errstate(invalid='ignore'):
+        above = np.sum(pressure > target[:, None], axis=1)
+    valid = (above > 0) & (above < np.sum(np.isfinite(pressure), axis=1))
+    upper = np.clip(above, 1, pressure.shape[1] - 1)
+    rows = np.arange(pressure.shape[0])
+    p0, p1 = pressure[rows, upper - 1], pressure[rows, upper]
+    v0, v1 = values[rows, upper - 1], values[rows, upper]
+    exact = p0 == target
+    if log_p:
+        p0, p1, target = np.log(p0), np.log(p1), np.log(target)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = np.where(exact, v0, v0 + (v1 - v0) * (target - p0) / (p1 - p0))
+    return np.where(valid | exact, result, np.nan)
+
+def _lfc(pressure, temperature, dewpoint, parcel, lcl=None):
+    """
+    Lowest level of free convection (metpy.calc.lfc with which='bottom'). Returns (pressure, parcel temperature).
+    `lcl` is the (pressure, temperature) LCL of the parcel's first level, when already known.
+    """
+    x, y, direction = _intersections(pressure, parcel, temperature)
+    increasing = direction > 0
+
+    # A parcel starting on the environment curve ignores the crossing at the first segment
+    start_close = np.isclose(parcel[:, 0], temperature[:, 0])
+    increasing[:, 0] &= ~start_close
+    p_lcl, t_lcl = lcl or _lcl(pressure[:, 0], parcel[:, 0], dewpoint[:, 0])
+
+    with np.errstate(invalid='ignore'):
+        above_lcl = increasing & (x < p_lcl[:, None])
+        positive_above = np.any((pressure < p_lcl[:, None]) & (parcel > temperature)
+                                & ~np.isclose(parcel, temperature), axis=1)
+        els = direction[:, 1:] < 0
+        lowest_el = np.nanmax(np.where(els, x[:, 1:], np.nan), axis=1, initial=-np.inf)
+    el_below_lcl = np.any(els, axis=1) & (lowest_el > p_lcl)
+
+    has_crossing = np.any(increasing, axis=1)
+    use_lcl = np.where(has_crossing, ~np.any(above_lcl, axis=1) & ~el_below_lcl, positive_above)
+    undefined = np.where(has_crossing, ~np.any(above_lcl, axis=1) & el_below_lcl, ~positive_above)
+
+    p_lfc = np.where(use_lcl, p_lcl, _first_true(above_lcl, x))
+    t_lfc = np.where(use_lcl, t_lcl, _first_true(above_lcl, y))
+    return np.where(undefined, np.nan, p_lfc), np.where(undefined, np.nan, t_lfc)
+
+def _el(pressure, temperature, dewpoint, parcel, lcl=None):
+    """Highest equilibrium level (metpy.calc.el with which='top'). Returns (pressure, parcel temperature)."""
+    x, y, direction = _intersections(pressure[:, 1:], parcel[:, 1:], temperature[:, 1:])
+    decreasing = direction < 0
+    p_lcl, _ = lcl or _lcl(pressure[:, 0], temperature[:, 0], dewpoint[:, 0])
+
+    p_el, t_el = _last_true(decreasing, x), _last_true(decreasing, y)
+    with np.errstate(invalid='ignore'):
+        undefined = (_last_valid(parcel) > _last_valid(temperature)) | ~(p_el < p_lcl)
+    return np.where(undefined, np.nan, p_el), np.where(undefined, np.nan, t_el)
+
+def _ccl(pressure, temperature, dewpoint):
+    """Highest convective condensation level (metpy.calc.ccl with which='top'). Returns (pressure, temperature)."""
+    r_start = _mixing_ratio(_saturation_vapor_pressure(dewpoint[:, 0]), pressure[:, 0])
+    vapor_pressure = pressure * r_start[:, None] / (EPSILON + r_start[:, None])
+    mixing_line = _dewpoint_from_vapor_pressure(vapor_pressure)
+
+    x, y, direction = _intersections(pressure, mixing_line, temperature)
+    return _last_true(direction > 0, x), _last_true(direction > 0, y)
+
+def _cape_cin(pressure, temperature, dewpoint, parcel, lcl=None):
+    """CAPE and CIN (J/kg) of a parcel lifted from the first level, with the virtual temperature correction, as metpy.calc.cape_cin."""
+    p_lcl, _ = lcl or _lcl(pressure[:, 0], temperature[:, 0], dewpoint[:, 0])
+    with np.errstate(invalid='ignore'):
+        below_lcl = pressure > p_lcl[:, None]
+    parcel_mixing_ratio = np.where(below_lcl,
+                                   _saturation_mixing_ratio(pressure[:, :1], dewpoint[:, :1]),
+                                   _saturation_mixing_ratio(pressure, parcel))
+    temperature_v = _virtual_temperature(temperature, _saturation_mixing_ratio(pressure, dewpoint))
+    parcel_v = _virtual_temperature(parcel, parcel_mixing_ratio)
+
+    # Both start from the same virtual temperature, so they share one LCL
+    lcl_v = _lcl(pressure[:, 0], temperature_v[:, 0], dewpoint[:, 0])
+    p_lfc, _ = _lfc(pressure, temperature_v, dewpoint, parcel_v, lcl_v)
+    p_el, _ = _el(pressure, temperature_v, dewpoint, parcel_v, lcl_v)
+    p_el = np.where(np.isnan(p_el), _last_valid(pressure), p_el)
+
+    # Split every segment at its zero crossing (except the first segment, like MetPy), then integrate
+    # Rd * (Tv_parcel - Tv_env) d ln(p) over the sub-segments whose ends both lie inside the layer
+    buoyancy = parcel_v - temperature_v
+    x_cross, _, _ = _intersections(pressure, buoyancy, np.zeros_like(buoyancy))
+    x_cross[:, 0] = np.nan
+    split = np.isfinite(x_cross)
+
+    p_bottom, p_top = pressure[:, :-1], pressure[:, 1:]
+    b_bottom, b_top = buoyancy[:, :-1], buoyancy[:, 1:]
+    p_mid = np.where(split, x_cross, p_top)
+    b_mid = np.where(split, 0.0, b_top)
+    pieces = [(p_bottom, b_bottom, p_mid, b_mid), (p_mid, b_mid, p_top, b_top)]
+
+    def integrate(inside):
+        total = np.zeros(pressure.shape[0])
+        for p0, b0, p1, b1 in pieces:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                area = 0.5 * (b0 + b1) * (np.log(p0) - np.log(p1))
+            keep = inside(p0) & inside(p1) & np.isfinite(area)
+            total += np.sum(np.where(keep, area, 0.0), axis=1)
+        return RD * total
+
+    def less_or_close(a, value):
+        with np.errstate(invalid='ignore'):
+            return (a < value[:, None]) | np.isclose(a, value[:, None])
+
+    def greater_or_close(a, value):
+        with np.errstate(invalid='ignore'):
+            return (a > value[:, None]) | np.isclose(a, value[:, None])
+
+    cape = integrate(lambda p: less_or_close(p, p_lfc) & greater_or_close(p, p_el))
+    cin = np.minimum(integrate(lambda p: greater_or_close(p, p_lfc)), 0.0)
+
+    no_lfc = np.isnan(p_lfc)
+    return np.where(no_lfc, 0.0, cape), np.where(no_lfc, 0.0, cin)
+
+# Parcel analysis ----------------------------------------------------------------------------------------------------------
+PARCEL_TYPES = ('sb', 'ml', 'mu')  # Surface-based, mixed-layer, most unstable
+MIXED_LAYER_DEPTH = 100  # hPa above the surface averaged into the mixed-layer parcel (metpy.calc.mixed_parcel)
+MOST_UNSTABLE_DEPTH = 300  # hPa above the surface searched for the most unstable parcel (metpy.calc.most_unstable_parcel)
+
+def _compact(keep, *arrays):
+    # Move the kept levels of every row to the front and NaN-pad behind them, the layout every search here expects
+    order = np.argsort(~keep, axis=1, kind='stable')
+    kept = np.take_along_axis(keep, order, axis=1)
+    return tuple(np.where(kept, np.take_along_axis(array, order, axis=1), np.nan) for array in arrays)
+
+def _equivalent_potential_temperature(pressure, temperature, dewpoint):
+    # Bolton (1980), as metpy.calc.equivalent_potential_temperature
+    e = _saturation_vapor_pressure(dewpoint)
+    r = _mixing_ratio(e, pressure)
+    t_l = 56 + 1 / (1 / (dewpoint - 56) + np.log(temperature / dewpoint) / 800)
+    th_l = temperature * (100000 / (pressure - e)) ** KAPPA * (temperature / t_l) ** (0.28 * r)
+    return th_l * np.exp(r * (1 + 0.448 * r) * (3036 / t_l - 1.78))
+
+def _mixed_layer_start(pressure, temperature, dewpoint, depth):
+    # Pressure-weighted mean potential temperature and mixing ratio of the lowest `depth` Pa, brought to the surface
+    p_surface = pressure[:, 0]
+    p_top = p_surface - depth
+    theta = temperature * (100000 / pressure) ** KAPPA
+    mixing_ratio = _saturation_mixing_ratio(pressure, dewpoint)
+    mean_theta = _layer_average(pressure, theta, p_surface, p_top)
+    mean_mixing_ratio = _layer_average(pressure, mixing_ratio, p_surface, p_top)
+    t_start = mean_theta * (p_surface / 100000) ** KAPPA
+    td_start = _dewpoint_from_vapor_pressure(p_surface * mean_mixing_ratio / (EPSILON + mean_mixing_ratio))
+    return t_start, td_start
+
+def _parcel_start(pressure, temperature, dewpoint, parcel_type):
+    """
+    Profile a parcel of `parcel_type` is lifted through, the parcel starting at its first level (SI units: Pa, K).
+
+    Like metpy.calc.mixed_layer_cape_cin and most_unstable_cape_cin, the mixed-layer parcel replaces the
+    levels of the mixed layer, and the most unstable parcel (highest theta-e in the lowest
+    MOST_UNSTABLE_DEPTH) starts at its own level with the levels below it dropped.
+    """
+    if parcel_type == 'ml':
+        t_start, td_start = _mixed_layer_start(pressure, temperature, dewpoint, MIXED_LAYER_DEPTH * 100)
+        with np.errstate(invalid='ignore'):
+            keep = pressure < pressure[:, :1] - MIXED_LAYER_DEPTH * 100
+        keep[:, 0] = True
+        pressure, temperature, dewpoint = _compact(keep, pressure, temperature, dewpoint)
+        temperature[:, 0], dewpoint[:, 0] = t_start, td_start
+    elif parcel_type == 'mu':
+        with np.errstate(invalid='ignore'):
+            theta_e = _equivalent_potential_temperature(pressure, temperature, dewpoint)
+            in_layer = (pressure >= pressure[:, :1] - MOST_UNSTABLE_DEPTH * 100) & np.isfinite(theta_e)
+        start = np.argmax(np.where(in_layer, theta_e, -np.inf), axis=1)
+        keep = np.arange(pressure.shape[1]) >= start[:, None]
+        pressure, temperature, dewpoint = _compact(keep, pressure, temperature, dewpoint)
+    elif parcel_type != 'sb':
+        raise ValueError(f'Unknown parcel type {parcel_type}, use one of {PARCEL_TYPES}')
+    return pressure, temperature, dewpoint
+
+def _parcel_analysis(pressure, temperature, dewpoint, parcel_types=('sb',)):
+    """
+    LCL, parcel ascent, LFC, EL, CAPE and CIN of every parcel type (SI units: Pa, K).
+
+    The parcels of all types are stacked into one batch: the LCL is found and the ascent integrated
+    once for all of them, and the level searches and integrals reuse that single ascent.
+    """
+    n = pressure.shape[0]
+    starts = [_parcel_start(pressure, temperature, dewpoint, parcel_type) for parcel_type in parcel_types]
+    pressure, temperature, dewpoint = (np.concatenate(arrays) for arrays in zip(*starts))
+
+    lcl = _lcl(pressure[:, 0], temperature[:, 0], dewpoint[:, 0])
+    parcel = _parcel_profile(pressure, temperature[:, 0], dewpoint[:, 0], lcl)
+    p_lfc, t_lfc = _lfc(pressure, temperature, dewpoint, parcel, lcl)
+    p_el, t_el = _el(pressure, temperature, dewpoint, parcel, lcl)
+    cape, cin = _cape_cin(pressure, temperature, dewpoint, parcel, lcl)
+
+    result = {
+        'pressure': pressure, 'parcel': parcel,
+        'pressure_start': pressure[:, 0], 'temperature_start': temperature[:, 0], 'dewpoint_start': dewpoint[:, 0],
+        'pressure_lcl': lcl[0], 'temperature_lcl': lcl[1],
+        'pressure_lfc': p_lfc, 'temperature_lfc': t_lfc,
+        'pressure_el': p_el, 'temperature_el': t_el,
+        'cape': cape, 'cin': cin,
+    }
+    return {parcel_type: {name: value[i * n:(i + 1) * n] for name, value in result.items()}
+            for i, parcel_type in enumerate(parcel_types)}
+
+def parcel_analysis(pressures, temperatures, dewpoints, parcel_types=PARCEL_TYPES):
+    """
+    LCL, LFC, EL, CAPE and CIN of surface-based, mixed-layer and most unstable parcels, all from one ascent.
+
+    Parameters:
+    - pressures, temperatures, dewpoints: (L,) profile or (N, L) NaN-padded batch (hPa, °C), surface first
+    - parcel_types: Any of 'sb', 'ml' (lowest MIXED_LAYER_DEPTH hPa mixed) and 'mu' (highest theta-e in
+      the lowest MOST_UNSTABLE_DEPTH hPa)
+
+    Returns:
+    - Dictionary parcel type -> dictionary with 'pressure' (the levels the parcel is lifted through) and
+      'parcel' (its temperature there), the start pressure / temperature / dewpoint, pressure and
+      temperature of the LCL, LFC and EL (hPa, °C; NaN when undefined), and 'cape', 'cin' (J/kg).
+      Arrays are (N,) or (N, L), scalars and (L,) for a single profile.
+    """
+    p, t, td = (np.asarray(a, dtype=float) for a in (pressures, temperatures, dewpoints))
+    single = p.ndim == 1
+    p, t, td = (np.atleast_2d(a) for a in (p, t, td))
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        parcels = _parcel_analysis(p * 100, t + ZERO_DEGC, td + ZERO_DEGC, tuple(parcel_types))
+
+    for result in parcels.values():
+        for name in ('pressure', 'pressure_start', 'pressure_lcl', 'pressure_lfc', 'pressure_el'):
+            result[name] = result[name] / 100
+        for name in ('parcel', 'temperature_start', 'dewpoint_start', 'temperature_lcl', 'temperature_lfc', 'temperature_el'):
+            result[name] = result[name] - ZERO_DEGC
+    if single:
+        return {parcel_type: {name: value[0] for name, value in result.items()} for parcel_type, result in parcels.items()}
+    return parcels
+
+# Kinematics ------------------------------------------------------------------------------------------------------------------
+def _layer_average(pressure, values, p_bottom, p_top):
+    """Pressure-weighted layer mean between two pressures, bounds interpolated in log-pressure (weighted_continuous_average)."""
+    v_bottom = _interp_rows(p_bottom, pressure, values, log_p=True)
+    v_top = _interp_rows(p_top, pressure, values, log_p=True)
+    with np.errstate(invalid='ignore'):
+        inside = ((pressure <= p_bottom[:, None]) | np.isclose(pressure, p_bottom[:, None])) & \
+                 ((pressure >= p_top[:, None]) | np.isclose(pressure, p_top[:, None]))
+
+    segments = inside[:, :-1] & inside[:, 1:]
+    inner = np.where(segments, 0.5 * (values[:, :-1] + values[:, 1:]) * (pressure[:, 1:] - pressure[:, :-1]), 0.0)
+    total = np.sum(inner, axis=1)
+
+    has_inner = inside.any(axis=1)
+    p_first, v_first = _first_true(inside, pressure), _first_true(inside, values)
+    p_last, v_last = _last_true(inside, pressure), _last_true(inside, values)
+    edges = 0.5 * (v_bottom + v_first) * (p_first - p_bottom) + 0.5 * (v_last + v_top) * (p_top - p_last)
+    total = np.where(has_inner, total + edges, 0.5 * (v_bottom + v_top) * (p_top - p_bottom))
+    return total / (p_top - p_bottom)
+
+def _height_to_pressure(target, heights, pressure):
+    # np.interp(target, heights, pressure) for every row
+    with np.errstate(invalid='ignore'):
+        below = np.sum(heights <= target[:, None], axis=1)
+    rows = np.arange(heights.shape[0])
+    upper = np.clip(below, 1, heights.shape[1] - 1)
+    z0, z1 = heights[rows, upper - 1], heights[rows, upper]
+    p0, p1 = pressure[rows, upper - 1], pressure[rows, upper]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(z0 == target, p0, p0 + (p1 - p0) * (target - z0) / (z1 - z0))
+
+def _bunkers_storm_motion(pressure, wind_u, wind_v, heights):
+    """Bunkers right- and left-mover (kt), as metpy.calc.bunkers_storm_motion."""
+    surface_p, surface_z = pressure[:, 0], heights[:, 0]
+    p_500m = _height_to_pressure(surface_z + 500, heights, pressure)
+    p_5500m = _height_to_pressure(surface_z + 5500, heights, pressure)
+    p_6km = _height_to_pressure(surface_z + 6000, heights, pressure)
+
+    mean_u, mean_v = (_layer_average(pressure, w, surface_p, p_6km) for w in (wind_u, wind_v))
+    low_u, low_v = (_layer_average(pressure, w, surface_p, p_500m) for w in (wind_u, wind_v))
+    high_u, high_v = (_layer_average(pressure, w, p_5500m, p_6km) for w in (wind_u, wind_v))
+
+    shear_u, shear_v = high_u - low_u, high_v - low_v
+    scale = (7.5 / KTS_TO_MS) / np.hypot(shear_u, shear_v)
+    rdev_u, rdev_v = shear_v * scale, -shear_u * scale
+    return (mean_u + rdev_u, mean_v + rdev_v), (mean_u - rdev_u, mean_v - rdev_v)
+
+def _manual_storm_motion(heights, wind_u, wind_v, lat):
+    """Vectorized calc.manual_storm_motion (0-3 km Bunkers-style motion, kt)."""
+    with np.errstate(invalid='ignore'):
+        mask = heights <= 3000
+    mean_u = np.sum(np.where(mask, wind_u, 0), axis=1) / np.sum(mask, axis=1)
+    mean_v = np.sum(np.where(mask, wind_v, 0), axis=1) / np.sum(mask, axis=1)
+    u_shear = _last_true(mask, wind_u) - _first_true(mask, wind_u)
+    v_shear = _last_true(mask, wind_v) - _first_true(mask, wind_v)
+    shear_mag = np.sqrt(u_shear ** 2 + v_shear ** 2)
+    u_shear_90, v_shear_90 = -v_shear / shear_mag, u_shear / shear_mag
+    hemisphere = np.where(np.asarray(lat) >= 0, 1.0, -1.0)
+    return mean_u + hemisphere * 7.5 * u_shear_90, mean_v + hemisphere * 7.5 * v_shear_90
+
+def _storm_relative_helicity(heights, wind_u, wind_v, depth, storm_u, storm_v):
+    """Positive storm-relative helicity (m²/s²) over 0-depth m AGL, as metpy.calc.storm_relative_helicity."""
+    agl = heights - np.nanmin(heights, axis=1, keepdims=True)
+    with np.errstate(invalid='ignore'):
+        inside = (agl <= depth) | np.isclose(agl, depth)
+    top = np.full(heights.shape[0], float(depth))
+    u_top = _interp_rows(-top, -agl, wind_u)
+    v_top = _interp_rows(-top, -agl, wind_v)
+
+    sru, srv = wind_u - storm_u[:, None], wind_v - storm_v[:, None]
+    terms = sru[:, 1:] * srv[:, :-1] - sru[:, :-1] * srv[:, 1:]
+    terms = np.where(inside[:, :-1] & inside[:, 1:], terms, 0.0)
+
+    # Closing segment from the last level in the layer to the interpolated top
+    u_last, v_last = _last_true(inside, sru), _last_true(inside, srv)
+    top_in_data = np.any(inside & (agl == depth), axis=1)
+    closing = (u_top - storm_u) * v_last - u_last * (v_top - storm_v)
+    closing = np.where(top_in_data | np.isnan(closing), 0.0, closing)
+
+    positive = np.sum(np.where(terms > 0, terms, 0.0), axis=1) + np.where(closing > 0, closing, 0.0)
+    return positive * KTS_TO_MS ** 2
+
+def _precipitable_water(pressure, dewpoint):
+    # mm, trapezoid over the whole profile
+    pressure = pressure * 100
+    e = _saturation_vapor_pressure(dewpoint + ZERO_DEGC)
+    w = _mixing_ratio(e, pressure)
+    segments = 0.5 * (w[:, :-1] + w[:, 1:]) * (pressure[:, 1:] - pressure[:, :-1])
+    return -np.nansum(segments, axis=1) / (G * RHO_L) * 1000
+
+def _freezing_level(temperatures, heights):
+    # Height of the lowest downward 0°C crossing; surface height if already below freezing
+    with np.errstate(invalid='ignore'):
+        crossing = (temperatures[:, :-1] >= 0) & (temperatures[:, 1:] < 0)
+        t0, t1 = temperatures[:, :-1], temperatures[:, 1:]
+        z0, z1 = heights[:, :-1], heights[:, 1:]
+        level = z0 + (z1 - z0) * t0 / (t0 - t1)
+    return np.where(crossing.any(axis=1), _first_true(crossing, level), heights[:, 0])
+
+# Public entry point ---------------------------------------------------------------------------------------------------------
+def batch_calc(pressures, temperatures, dewpoints, wind_u, wind_v, heights, lat):
+    """
+    Compute the skewT_calc indices for N soundings in one vectorized pass.
+
+    Parameters:
+    - pressures, temperatures, dewpoints, wind_u, wind_v, heights: (N, L) NaN-padded arrays (hPa, °C, kt, m),
+      see pad_profiles
+    - lat: Latitude of each sounding, (N,) or scalar (hemisphere of the storm motion)
+
+    Returns:
+    - Dictionary of (N,) arrays named like the skewT_calc outputs (pressures in hPa, temperatures in °C,
+      heights in m), plus 'mlcape' / 'mlcin' / 'mucape' / 'mucin' of the mixed-layer and most unstable
+      parcels (see parcel_analysis) and 'parcel': the (N, L) surface parcel profile in °C
+    """
+    p, t, td = (np.atleast_2d(np.asarray(a, dtype=float)) for a in (pressures, temperatures, dewpoints))
+    u, v, z = (np.atleast_2d(np.asarray(a, dtype=float)) for a in (wind_u, wind_v, heights))
+    lat = np.broadcast_to(np.asarray(lat, dtype=float), p.shape[:1])
+
+    # NaN padding and levels outside a parcel's range produce invalid intermediates, which end up masked
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        return _batch_calc(p, t, td, u, v, z, lat)
+
+def _batch_calc(p, t, td, u, v, z, lat):
+    p_pa, t_k, td_k = p * 100, t + ZERO_DEGC, td + ZERO_DEGC
+    parcels = _parcel_analysis(p_pa, t_k, td_k, PARCEL_TYPES)
+    surface, mixed, unstable = (parcels[parcel_type] for parcel_type in PARCEL_TYPES)
+    parcel, cape, cin = surface['parcel'], surface['cape'], surface['cin']
+    p_lcl, t_lcl = surface['pressure_lcl'], surface['temperature_lcl']
+    p_lfc, t_lfc = surface['pressure_lfc'], surface['temperature_lfc']
+    p_el, t_el = surface['pressure_el'], surface['temperature_el']
+    p_ccl, t_ccl = _ccl(p_pa, t_k, td_k)
+    p_lcl, p_lfc, p_el, p_ccl = p_lcl / 100, p_lfc / 100, p_el / 100, p_ccl / 100
+
+    (rm_u, rm_v), (lm_u, lm_v) = _bunkers_storm_motion(p, u, v, z)
+    u_storm = np.where(lat >= 0, rm_u, lm_u)
+    v_storm = np.where(lat >= 0, rm_v, lm_v)
+    u_storm3, v_storm3 = _manual_storm_motion(z, u, v, lat)
+
+    levels = np.array([850.0, 500.0])
+    t850, t500 = (_interp_rows(np.full(len(p), level), p, t) for level in levels)
+    td850, td500 = (_interp_rows(np.full(len(p), level), p, td) for level in levels)
+
+    return {
+        'parcel': parcel - ZERO_DEGC,
+        'cape': cape, 'cin': cin,
+        'mlcape': mixed['cape'], 'mlcin': mixed['cin'], 'mucape': unstable['cape'], 'mucin': unstable['cin'],
+        'pressure_lcl': p_lcl, 'temperature_lcl': t_lcl - ZERO_DEGC, 'height_lcl': _interp_rows(p_lcl, p, z),
+        'pressure_lfc': p_lfc, 'temperature_lfc': t_lfc - ZERO_DEGC, 'height_lfc': _interp_rows(p_lfc, p, z),
+        'pressure_el': p_el, 'temperature_el': t_el - ZERO_DEGC, 'height_el': _interp_rows(p_el, p, z),
+        'pressure_ccl': p_ccl, 'temperature_ccl': t_ccl - ZERO_DEGC, 'height_ccl': _interp_rows(p_ccl, p, z),
+        'u_storm': u_storm, 'v_storm': v_storm, 'u_storm3': u_storm3, 'v_storm3': v_storm3,
+        'li': t500 - td500,  # skewT_calc passes the dewpoint profile as the lifted parcel
+        'vt': t850 - t500,
+        'tt': (t850 - t500) + (td850 - t500),
+        'srh3': _storm_relative_helicity(z, u, v, 3000, u_storm, v_storm),
+        'srh6': _storm_relative_helicity(z, u, v, 6000, u_storm, v_storm),
+        'pwat': _precipitable_water(p, td),
+        'frz': _freezing_level(t, z),
+    }
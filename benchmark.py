@@ -0,0 +1,356 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+
+# Render benchmarks only ever write files
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# Benchmark grid: levels per sounding x soundings per batch
+LEVELS = [100, 1000, 5000, 20000]
+BATCH_SIZES = [1]
+STAGES = ['parse', 'calc', 'advection', 'plot', 'batch_calc']
+REPEAT = 3
+
+UNIQUE_PROFILES = 16  # Distinct synthetic soundings per case; larger batches cycle through them
+REGRESSION_RATIO = 1.25  # --compare flags a case that got this much slower
+RESULTS_VERSION = 1
+
+# Startup budget per entry point: modules it imports, total import time (ms, best of STARTUP_REPEAT fresh
+# interpreters, measured with -X importtime), and packages it must not load before the first sounding is read
+PLOTTING_PACKAGES = ('matplotlib', 'metpy', 'pint', 'geopandas', 'shapely', 'pyproj')
+STARTUP_BUDGETS = {
+    'main': (['main'], 300, PLOTTING_PACKAGES + ('scipy', 'geopy')),
+    'indices': (['main', 'indices'], 600, PLOTTING_PACKAGES + ('geopy', 'pyarrow')),
+    'async_ingest': (['async_ingest'], 400, PLOTTING_PACKAGES + ('scipy', 'geopy')),
+    'watch_dir': (['watch_dir'], 300, PLOTTING_PACKAGES + ('scipy', 'geopy')),
+    'serve': (['serve'], 400, PLOTTING_PACKAGES + ('scipy', 'geopy')),
+}
+STARTUP_REPEAT = 5
+
+# Synthetic atmosphere
+TOP_HEIGHT = 24000  # m, ~30 hPa
+ASCENT_RATE = 5.0  # m/s
+RD, G = 287.04749097718457, 9.80665
+LAUNCH_TIMESTAMP = 1716206400  # 2024-05-20 12Z
+
+def synthetic_sounding(levels, seed=0, station_id='99999', lat=35.0, lon=-97.0, elevation=350.0):
+    """
+    A physically plausible sounding as a GeoJSON FeatureCollection (same layout as GeojsonData/).
+
+    Temperature follows a standard-atmosphere-like lapse rate with a tropopause, with a random surface
+    temperature and small level-to-level noise. Pressure is integrated hydrostatically, the dewpoint
+    depression grows with height, and the wind veers and strengthens through the lower troposphere.
+    The `levels` levels are evenly spaced in height between the surface and TOP_HEIGHT.
+    """
+    rng = np.random.default_rng(seed)
+    z = np.linspace(elevation, TOP_HEIGHT, levels)
+    agl = z - elevation
+
+    t_surface = 295.0 + rng.normal(0, 5)
+    tropopause = 11000 + rng.normal(0, 1000)
+    lapse = np.clip(z, None, tropopause) - elevation
+    temperature = t_surface - 0.0065 * lapse + 0.001 * np.clip(z - 20000, 0, None) + rng.normal(0, 0.1, levels)
+
+    # Hydrostatic pressure: d ln(p) = -g / (Rd T) dz, trapezoid between levels
+    p_surface = 1013.25 * np.exp(-G * elevation / (RD * t_surface))
+    d_log_p = -G / RD * np.diff(z) * 0.5 * (1 / temperature[:-1] + 1 / temperature[1:])
+    pressure = p_surface * np.exp(np.concatenate(([0.0], np.cumsum(d_log_p))))
+
+    depression = 2.0 + rng.uniform(0, 4) + 25.0 * np.clip(agl / 12000, 0, 1) + np.abs(rng.normal(0, 0.5, levels))
+    dewpoint = temperature - depression
+
+    speed = 5.0 + 35.0 * np.clip(agl / 10000, 0, 1) + rng.normal(0, 1, levels)
+    direction = np.radians(150.0 + 120.0 * np.clip(agl / 6000, 0, 1) + rng.normal(0, 3, levels))
+    wind_u, wind_v = -speed * np.sin(direction), -speed * np.cos(direction)
+
+    launch_time = LAUNCH_TIMESTAMP - 3600
+    seconds = launch_time + agl / ASCENT_RATE
+    drift = agl / TOP_HEIGHT * 0.5
+
+    features = []
+    for i in range(levels):
+        properties = {
+            'time': int(seconds[i]),
+            'gpheight': round(float(z[i]), 1),
+            'temp': round(float(temperature[i]), 2),
+            'dewpoint': round(float(dewpoint[i]), 2),
+            'pressure': round(float(pressure[i]), 3),
+            'wind_u': round(float(wind_u[i]), 2),
+            'wind_v': round(float(wind_v[i]), 2),
+        }
+        if i == 0:
+            properties['flags'] = 145408
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(lon + drift[i], 5), round(lat + drift[i], 5), round(float(z[i]), 1)]},
+            'properties': properties,
+        })
+
+    return {
+        'type': 'FeatureCollection',
+        'features': features,
+        'properties': {
+            'station_id': station_id,
+            'lat': lat,
+            'lon': lon,
+            'elevation': elevation,
+            'syn_timestamp': LAUNCH_TIMESTAMP,
+        },
+    }
+
+def write_synthetic(directory, levels, count, seed=0):
+    """Write `count` synthetic soundings with `levels` levels to `directory`, returns their filenames."""
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for i in range(count):
+        filename = f'synthetic_{levels}_{i}.json'
+        sounding = synthetic_sounding(levels, seed=seed + i, station_id=f'{90000 + i}',
+                                      lat=35.0 + (i % 7) - 3, lon=-97.0 + (i % 11) - 5)
+        with open(os.path.join(directory, filename), 'w') as f:
+            json.dump(sounding, f)
+        filenames.append(filename)
+    return filenames
+
+@contextmanager
+def offline_stubs():
+    """Replace the network-backed lookups (Nominatim, Natural Earth) with constant stand-ins."""
+    import parse_geojson
+    import skewT_plot
+    saved = parse_geojson.get_city_name, skewT_plot.boundaries_in_bbox
+    parse_geojson.get_city_name = lambda lat, lon, station_id=None: 'SYNTHETIC, XX'
+    skewT_plot.boundaries_in_bbox = lambda name, bbox: None
+    try:
+        yield
+    finally:
+        parse_geojson.get_city_name, skewT_plot.boundaries_in_bbox = saved
+
+def _time(function, repeat):
+    # Wall times (s) of `repeat` calls
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def _stage_functions(paths, batch):
+    """Closure per stage that runs it over one batch (cycling through the parsed unique profiles)."""
+    from parse_geojson import parse_geojson
+    from skewT_calc import skewT_calc
+    from skewT_plot import skewT_plot
+    from calc import temp_advection
+    from batch_calc import batch_calc, pad_profiles
+
+    parsed = [parse_geojson(path) for path in paths]
+    profiles = [parsed[i % len(parsed)] for i in range(batch)]
+    calculated = {}
+
+    def run_parse():
+        for i in range(batch):
+            parse_geojson(paths[i % len(paths)])
+
+    def run_calc():
+        for sounding in profiles:
+            skewT_calc(sounding)
+
+    def run_advection():
+        for sounding in profiles:
+            temp_advection(sounding.temperatures, sounding.pressures, sounding.wind_u, sounding.wind_v, sounding.heights, sounding.lat)
+
+    def run_plot():
+        for i, sounding in enumerate(profiles):
+            if id(sounding) not in calculated:
+                calculated[id(sounding)] = skewT_calc(sounding)
+            skewT_plot(sounding, calculated[id(sounding)], os.path.basename(paths[i % len(paths)]))
+
+    padded = pad_profiles([sounding.profile for sounding in profiles])
+    lats = [sounding.lat for sounding in profiles]
+
+    def run_batch_calc():
+        batch_calc(*padded, lats)
+
+    return {'parse': run_parse, 'calc': run_calc, 'advection': run_advection, 'plot': run_plot, 'batch_calc': run_batch_calc}
+
+def run_benchmarks(levels=LEVELS, batch_sizes=BATCH_SIZES, stages=STAGES, repeat=REPEAT, workdir=None):
+    """
+    Time every stage on synthetic soundings for each (levels, batch size) case.
+
+    parse, calc, advection and plot run once per sounding of the batch (parse_geojson, skewT_calc,
+    calc.temp_advection, skewT_plot), batch_calc runs once on the whole padded batch. Geocoding and
+    the map boundaries are stubbed, plots are written below `workdir`. The first call of every stage
+    warms up imports and caches and isn't timed.
+
+    Returns:
+    - results: List of dictionaries with stage, levels, batch, repeat, best_s, median_s, per_profile_s
+    """
+    import warnings
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, offline_stubs(), warnings.catch_warnings():
+        # MetPy warns about the synthetic noise (e.g. LFC/EL edge cases); that's not what's measured here
+        warnings.simplefilter('ignore')
+        workdir = workdir or tmp
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for n_levels in levels:
+                paths = [os.path.join(workdir, 'input', name)
+                         for name in write_synthetic(os.path.join(workdir, 'input'), n_levels, min(max(batch_sizes), UNIQUE_PROFILES))]
+                for batch in batch_sizes:
+                    functions = _stage_functions(paths[:min(batch, UNIQUE_PROFILES)], batch)
+                    for name in stages:
+                        functions[name]()  # Warm-up
+                        timings = _time(functions[name], repeat)
+                        result = {
+                            'stage': name,
+                            'levels': n_levels,
+                            'batch': batch,
+                            'repeat': repeat,
+                            'best_s': min(timings),
+                            'median_s': float(np.median(timings)),
+                            'per_profile_s': min(timings) / batch,
+                        }
+                        results.append(result)
+                        print(f'  > {name:<11} {n_levels:>6} levels x {batch:>5} | best {result["best_s"]:9.4f} s | '
+                              f'{result["per_profile_s"] * 1000:9.3f} ms/profile')
+        finally:
+            os.chdir(cwd)
+    return results
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    import scipy
+    import metpy
+    import matplotlib
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'metpy': metpy.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+def write_results(results, path):
+    """Write benchmark results as JSON, with the environment they were measured in."""
+    with open(path, 'w') as f:
+        json.dump({
+            'version': RESULTS_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'environment': _environment(),
+            'results': results,
+        }, f, indent=1)
+
+def compare(baseline_path, current_path, ratio=REGRESSION_RATIO):
+    """
+    Compare two result files case by case (stage, levels, batch) on the best time.
+
+    Returns:
+    - regressions: List of (case, baseline best_s, current best_s) that got slower than `ratio`
+    """
+    def load(path):
+        with open(path) as f:
+            return {(r['stage'], r['levels'], r['batch']): r['best_s'] for r in json.load(f)['results']}
+
+    baseline, current = load(baseline_path), load(current_path)
+    regressions = []
+    for case in sorted(baseline.keys() & current.keys()):
+        change = current[case] / baseline[case] if baseline[case] > 0 else float('inf')
+        marker = 'REGRESSION' if change > ratio else ''
+        print(f'  > {case[0]:<11} {case[1]:>6} levels x {case[2]:>5} | {baseline[case]:9.4f} s -> {current[case]:9.4f} s '
+              f'| x{change:5.2f} {marker}')
+        if change > ratio:
+            regressions.append((case, baseline[case], current[case]))
+    return regressions
+
+def import_time(modules, repeat=STARTUP_REPEAT):
+    """
+    Import time of `modules` in a fresh interpreter, read from -X importtime.
+
+    Returns:
+    - best_ms: Best over `repeat` interpreters of the summed cumulative time of the top-level imports
+    - loaded: Top-level packages that were imported
+    """
+    best, loaded = None, set()
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ', '.join(modules)],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode:
+            raise RuntimeError(f'import {", ".join(modules)} failed: {result.stderr.strip().splitlines()[-1]}')
+        total = 0
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            if not name[1:].startswith(' '):  # Nested imports are indented, their time is in their parent's
+                total += int(cumulative)
+            loaded.add(name.strip().split('.')[0])
+        best = total if best is None else min(best, total)
+    return best / 1000, loaded
+
+def check_startup(budgets=STARTUP_BUDGETS, repeat=STARTUP_REPEAT):
+    """
+    Measure the import time of every entry point against its budget.
+
+    Returns:
+    - failures: List of (entry point, reason) for each budget exceeded or forbidden package loaded
+    """
+    failures = []
+    for entry, (modules, budget_ms, forbidden) in budgets.items():
+        best_ms, loaded = import_time(modules, repeat)
+        heavy = sorted(loaded.intersection(forbidden))
+        if best_ms > budget_ms:
+            failures.append((entry, f'{best_ms:.0f} ms over the {budget_ms} ms budget'))
+        if heavy:
+            failures.append((entry, f'loads {", ".join(heavy)} at startup'))
+        status = 'OK' if best_ms <= budget_ms and not heavy else 'OVER BUDGET'
+        print(f'  > {entry:<13} {best_ms:8.1f} ms / {budget_ms:>4} ms | {status}' + (f' (loads {", ".join(heavy)})' if heavy else ''))
+    return failures
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the sounding pipeline on synthetic soundings.')
+    parser.add_argument('--levels', type=int, nargs='+', default=LEVELS, help=f'Levels per sounding (default: {LEVELS})')
+    parser.add_argument('--batch', type=int, nargs='+', default=BATCH_SIZES, help=f'Soundings per batch (default: {BATCH_SIZES})')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Stages to time (default: all)')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help=f'Timed runs per case, the best is kept (default: {REPEAT})')
+    parser.add_argument('--output', default='benchmark.json', help='Results file (default: benchmark.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two results files instead of running, exit 1 on a regression')
+    parser.add_argument('--ratio', type=float, default=REGRESSION_RATIO,
+                        help=f'Slowdown counted as a regression by --compare (default: {REGRESSION_RATIO})')
+    parser.add_argument('--startup', action='store_true',
+                        help='Check the import time of every entry point against its budget instead of running, exit 1 if over')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        regressions = compare(*args.compare, args.ratio)
+        print(f'  > COMPARE: {len(regressions)} regression(s) above x{args.ratio}')
+        return 1 if regressions else 0
+    if args.startup:
+        failures = check_startup()
+        print(f'  > STARTUP: {len(failures)} budget(s) exceeded')
+        return 1 if failures else 0
+
+    results = run_benchmarks(args.levels, args.batch, args.stages, args.repeat)
+    write_results(results, args.output)
+    print(f'  > BENCHMARK: {len(results)} cases -> {args.output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
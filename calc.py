@@ -1,19 +1,104 @@
-from scipy.interpolate import interp1d
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.ndimage import gaussian_filter1d
-import metpy.calc as mpcalc
 from metpy.units import units
 
+class ProfileInterpolator:
+    """
+    Pressure <-> height interpolation for one profile, built once and evaluated for many levels per call.
+
+    The profile is sorted once in each direction; every evaluation is a single vectorized np.interp.
+    Levels outside the profile (or NaN) give NaN. With `log_pressure`, interpolation is linear in
+    ln(p) instead of p, which follows the hypsometric equation more closely between sparse levels.
+    """
+
+    def __init__(self, pressures, heights, log_pressure=False):
+        pressures = np.asarray(getattr(pressures, 'magnitude', pressures), dtype=float)
+        heights = np.asarray(heights, dtype=float)
+        valid = np.isfinite(pressures) & np.isfinite(heights)
+        pressures, heights = pressures[valid], heights[valid]
+        self.log_pressure = log_pressure
+
+        by_pressure = np.argsort(pressures, kind='stable')
+        self._p = self._transform(pressures[by_pressure])
+        self._z_by_p = heights[by_pressure]
+
+        by_height = np.argsort(heights, kind='stable')
+        self._z = heights[by_height]
+        self._p_by_z = self._transform(pressures[by_height])
+
+    def _transform(self, pressures):
+        return np.log(pressures) if self.log_pressure else pressures
+
+    def height_at(self, pressure_levels):
+        """Height (m) at one or many pressure levels (hPa, plain or pint)."""
+        levels = np.asarray(getattr(pressure_levels, 'magnitude', pressure_levels), dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.interp(self._transform(levels), self._p, self._z_by_p, left=np.nan, right=np.nan)
+
+    def pressure_at(self, height_levels):
+        """Pressure (hPa) at one or many heights (m)."""
+        pressure = np.interp(np.asarray(height_levels, dtype=float), self._z, self._p_by_z, left=np.nan, right=np.nan)
+        return np.exp(pressure) if self.log_pressure else pressure
+
 def pressure_to_height(pressure_level, pressures, heights):
-    """Interpolate height for a given pressure level using available data."""
-    height_interp = interp1d(pressures, heights, bounds_error=False, fill_value=np.nan)
-    return height_interp(pressure_level.m)
+    """Interpolate height for a given pressure level using available data (see ProfileInterpolator for many levels)."""
+    return ProfileInterpolator(pressures, heights).height_at(pressure_level)
 
 def height_to_pressure(height_level, heights, pressures):
-    """Interpolate pressure for a given height level using available data."""
-    pressure_interp = interp1d(heights[::-1], pressures[::-1], bounds_error=False, fill_value=np.nan)
-    return pressure_interp(height_level)
+    """Interpolate pressure for a given height level using available data (see ProfileInterpolator for many levels)."""
+    return ProfileInterpolator(pressures, heights).pressure_at(height_level)
+
+def layer_index(coords, bounds):
+    """
+    Layer of every level, for layers between consecutive `bounds`.
+
+    Parameters:
+    - coords: Pressure or height of each level, any shape
+    - bounds: Layer boundaries, increasing (heights) or decreasing (pressures); layer i lies between
+      bounds[i] and bounds[i + 1], including the smaller of the two values and excluding the larger
+
+    Returns:
+    - Integer array shaped like coords: layer number in the order of `bounds`, -1 outside every layer (or NaN)
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    descending = bounds[0] > bounds[-1]
+    edges = bounds[::-1] if descending else bounds
+
+    index = np.searchsorted(edges, coords, side='right') - 1
+    outside = (index < 0) | (index >= len(edges) - 1)
+    if descending:
+        index = len(edges) - 2 - index
+    return np.where(outside, -1, index)
+
+def layer_mean(values, coords, bounds, weights=None):
+    """
+    Mean of `values` in every layer, for one profile or a batch, in a single binned reduction.
+
+    Parameters:
+    - values: (L,) or (N, L) array, e.g. temperature advection or a wind component
+    - coords: Pressure or height of each value, same shape (or broadcastable to it)
+    - bounds: Layer boundaries, see layer_index
+    - weights: Optional weights of each value (e.g. layer thickness), same shape; NaN values and weights are skipped
+
+    Returns:
+    - (K,) or (N, K) array of layer means, K = len(bounds) - 1; NaN where a layer has no data
+    """
+    values = np.asarray(values, dtype=float)
+    single = values.ndim == 1
+    values = np.atleast_2d(values)
+    coords = np.broadcast_to(coords, values.shape)
+    weights = np.ones_like(values) if weights is None else np.broadcast_to(np.asarray(weights, dtype=float), values.shape)
+    n_layers = len(bounds) - 1
+
+    index = layer_index(coords, bounds)
+    valid = (index >= 0) & np.isfinite(values) & np.isfinite(weights)
+    bins = (np.arange(values.shape[0])[:, None] * n_layers + index)[valid]
+    size = values.shape[0] * n_layers
+
+    totals = np.bincount(bins, weights=(values * weights)[valid], minlength=size)
+    norms = np.bincount(bins, weights=weights[valid], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(norms != 0, totals / norms, np.nan).reshape(-1, n_layers)
+    return means[0] if single else means
 
 def temp_advection(temperatures, pressures, wind_u, wind_v, heights, lat):
     """
@@ -0,0 +1,358 @@
+import os
+import sys
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+
+# Per-station climatology of the indices (SQLite), off unless a path is given (--climatology, RADIOSONDE_CLIMATOLOGY)
+CLIMATOLOGY_PATH = os.environ.get('RADIOSONDE_CLIMATOLOGY', '')
+CLIMATOLOGY_VERSION = 1
+
+# Indices put in context (skewT_calc / batch_calc names), and their percentile columns in the output tables
+CLIMATOLOGY_INDICES = ['cape', 'cin', 'srh3', 'pwat', 'frz', 'li']
+PERCENTILE_COLUMNS = [f'{name}_pct' for name in CLIMATOLOGY_INDICES]
+
+COMPRESSION = float(os.environ.get('RADIOSONDE_SKETCH_COMPRESSION', 100))  # t-digest δ, ~δ/2 centroids per sketch
+MIN_HISTORY = int(os.environ.get('RADIOSONDE_CLIMATOLOGY_MIN_HISTORY', 10))  # Soundings before a percentile is given
+
+_path = CLIMATOLOGY_PATH  # Climatology of this process, see configure_climatology
+_store = None
+
+class QuantileSketch:
+    """
+    Mergeable t-digest of one index: weighted centroids whose size shrinks towards both tails.
+
+    Compression groups the sorted centroids by the integer part of the k1 scale function
+    k(q) = δ / 2π · asin(2q - 1), all at once, so every group covers at most about one unit of k:
+    the tails keep single values while the median is summarized by wide centroids. A centroid of
+    one distinct value is `exact` and is a step of the distribution, so small histories rank exactly
+    and a value too frequent to share a centroid (e.g. CAPE = 0) is never averaged with others.
+    Adding values and merging sketches are the same operation, which is why sketches built by
+    separate workers or shards can be combined in any order.
+    """
+
+    __slots__ = ('compression', 'means', 'weights', 'exact', 'minimum', 'maximum')
+
+    def __init__(self, compression=COMPRESSION, means=(), weights=(), exact=(), minimum=np.inf, maximum=-np.inf):
+        self.compression = float(compression)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.exact = np.asarray(exact, dtype=bool)
+        self.minimum, self.maximum = float(minimum), float(maximum)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def add(self, values):
+        """Add the finite values of an array (NaN, e.g. an undefined LI, is skipped)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if len(values):
+            self._update(values, np.ones_like(values), np.ones(len(values), dtype=bool), values.min(), values.max())
+        return self
+
+    def merge(self, other):
+        """Add every value summarized by another sketch."""
+        if len(other.means):
+            self._update(other.means, other.weights, other.exact, other.minimum, other.maximum)
+        return self
+
+    def _update(self, means, weights, exact, minimum, maximum):
+        means, weights = np.concatenate((self.means, means)), np.concatenate((self.weights, weights))
+        exact = np.concatenate((self.exact, exact))
+        order = np.argsort(means, kind='stable')
+        means, weights, exact = means[order], weights[order], exact[order]
+
+        # Equal values are one centroid
+        starts = np.flatnonzero(np.r_[True, means[1:] != means[:-1]])
+        weights, exact = np.add.reduceat(weights, starts), np.logical_and.reduceat(exact, starts)
+        means = means[starts]
+
+        # Scale function across every centroid; one group per unit of k, and a centroid wider than one unit
+        # (a value repeated that often, e.g. CIN = 0) is a group of its own
+        cumulative = np.cumsum(weights) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * np.r_[0.0, cumulative] - 1)
+        group = np.floor((k[:-1] + k[1:]) / 2)
+        wide = k[1:] - k[:-1] >= 1
+        starts = np.flatnonzero(np.r_[True, (group[1:] != group[:-1]) | wide[1:] | wide[:-1]])
+        ends = np.r_[starts[1:], len(means)]
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.exact = (ends - starts == 1) & exact[starts]
+        # Rounding must not move a mean outside the values it summarizes
+        self.means = np.clip(np.add.reduceat(means * weights, starts) / self.weights, means[starts], means[ends - 1])
+        self.minimum, self.maximum = min(self.minimum, minimum), max(self.maximum, maximum)
+
+    def _ranks(self):
+        # Piecewise-linear cumulative weight: a step over every exact centroid, through the centre of the
+        # others, pinned at the extremes
+        after = np.cumsum(self.weights)
+        before = after - self.weights
+        middle = after - self.weights / 2
+        values = np.repeat(self.means, 2)
+        ranks = np.column_stack((np.where(self.exact, before, middle), np.where(self.exact, after, middle))).ravel()
+        if self.minimum < values[0]:
+            values, ranks = np.r_[self.minimum, values], np.r_[0.0, ranks]
+        if self.maximum > values[-1]:
+            values, ranks = np.r_[values, self.maximum], np.r_[ranks, self.count]
+        return values, ranks
+
+    def percentile(self, values):
+        """Percentile rank (0-100) of values in the summarized distribution (mid-rank for ties); NaN if empty."""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(self.means):
+            return np.full(values.shape, np.nan)
+        xp, ranks = self._ranks()
+        # Searched from either end, a value on a step gets its upper and its lower rank: the mid-rank is their mean
+        upper = np.interp(values, xp, ranks, left=0.0, right=self.count)
+        lower = -np.interp(-values, -xp[::-1], -ranks[::-1], left=-self.count, right=0.0)
+        return np.where(np.isnan(values), np.nan, 50 * (lower + upper) / self.count)
+
+    def quantile(self, q):
+        """Values at the quantiles q (0-1); NaN if empty."""
+        q = np.asarray(q, dtype=np.float64)
+        if not len(self.means):
+            return np.full(q.shape, np.nan)
+        xp, ranks = self._ranks()
+        return np.interp(q * self.count, ranks, xp)
+
+    def to_bytes(self):
+        return np.concatenate(([self.compression, self.minimum, self.maximum], self.means, self.weights, self.exact)).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        array = np.frombuffer(data, dtype=np.float64)
+        means, weights, exact = array[3:].reshape(3, -1)
+        return cls(array[0], means.copy(), weights.copy(), exact.astype(bool), array[1], array[2])
+
+    def __repr__(self):
+        return f'QuantileSketch({len(self.means)} centroids, count={self.count:g}, range=[{self.minimum:g}, {self.maximum:g}])'
+
+class Climatology:
+    """
+    Quantile sketches of CLIMATOLOGY_INDICES per station, calendar month and synoptic hour.
+
+    The sketches are updated incrementally as soundings are processed, never recomputed from the
+    archive: `update` reads the affected sketches, merges the new values and writes them back in one
+    write transaction, so any number of processes (render workers, the watch daemon, indices runs)
+    can update the same file. Every station and synoptic time is counted once, however often it is
+    processed again.
+    """
+
+    def __init__(self, path, compression=COMPRESSION):
+        self.path = path
+        self.compression = compression
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS sketches (station_id TEXT NOT NULL, month INTEGER NOT NULL, '
+                'hour INTEGER NOT NULL, name TEXT NOT NULL, sketch BLOB NOT NULL, '
+                'PRIMARY KEY (station_id, month, hour, name))')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS soundings (station_id TEXT NOT NULL, syn_timestamp INTEGER NOT NULL, '
+                'PRIMARY KEY (station_id, syn_timestamp))')
+            self.connection.execute('INSERT OR IGNORE INTO meta VALUES (?, ?)', ('version', str(CLIMATOLOGY_VERSION)))
+        version = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        if version != str(CLIMATOLOGY_VERSION):
+            raise ValueError(f'{path} is a climatology of version {version}, expected {CLIMATOLOGY_VERSION}')
+
+    def sketch(self, station_id, month, hour, name):
+        """QuantileSketch of one index for a station, month (1-12) and synoptic hour, None if nothing was added."""
+        row = self.connection.execute('SELECT sketch FROM sketches WHERE station_id = ? AND month = ? AND hour = ? AND name = ?',
+                                      (str(station_id), int(month), int(hour), name)).fetchone()
+        return None if row is None else QuantileSketch.from_bytes(row[0])
+
+    def _sketches(self, keys):
+        # {(station_id, month, hour): {name: QuantileSketch}} for the given keys
+        sketches = {}
+        for station_id, month, hour in keys:
+            rows = self.connection.execute('SELECT name, sketch FROM sketches WHERE station_id = ? AND month = ? AND hour = ?',
+                                           (station_id, month, hour))
+            sketches[station_id, month, hour] = {name: QuantileSketch.from_bytes(sketch) for name, sketch in rows}
+        return sketches
+
+    def update(self, rows):
+        """
+        Set the percentile columns of index rows, then add the rows to the climatology.
+
+        A row's percentiles compare it with the soundings of the same station, month and hour already
+        in the climatology, i.e. with its history; rows are ranked and added oldest first, so the earlier
+        rows of the same call count too. They are NaN with fewer than MIN_HISTORY soundings.
+
+        Parameters:
+        - rows: Dictionaries with 'station_id', 'timestamp' (datetime or ISO string, UTC) and the
+          CLIMATOLOGY_INDICES values, e.g. from indices.compute_indices or Diagnostics.as_dict; updated
+          in place with PERCENTILE_COLUMNS
+
+        Returns:
+        - added: Number of rows added (the others were already in the climatology)
+        """
+        keys = [_key(row) for row in rows]
+        # The write lock is taken before anything is read, so concurrent updates merge instead of overwriting
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            stored = self._sketches({key[:3] for key in keys})
+            new, changed = set(), set()
+            # Oldest first, each row ranked before it is added: the earlier rows of the batch are part of its history
+            for i in sorted(range(len(rows)), key=lambda i: keys[i][3]):
+                row, key = rows[i], keys[i]
+                sketches = stored[key[:3]]
+                enough = self._history(sketches) >= MIN_HISTORY
+                for name, column in zip(CLIMATOLOGY_INDICES, PERCENTILE_COLUMNS):
+                    sketch = sketches.get(name)
+                    row[column] = float(sketch.percentile(row[name])) if enough and sketch is not None else float('nan')
+
+                # Only soundings not counted yet, once each
+                if key in new or self.connection.execute(
+                        'SELECT 1 FROM soundings WHERE station_id = ? AND syn_timestamp = ?', (key[0], key[3])).fetchone() is not None:
+                    continue
+                for name in CLIMATOLOGY_INDICES:
+                    sketches.setdefault(name, QuantileSketch(self.compression)).add(row[name])
+                new.add(key)
+                changed.add(key[:3])
+
+            for station_id, month, hour in changed:
+                for name, sketch in stored[station_id, month, hour].items():
+                    self.connection.execute('INSERT OR REPLACE INTO sketches VALUES (?, ?, ?, ?, ?)',
+                                            (station_id, month, hour, name, sketch.to_bytes()))
+            self.connection.executemany('INSERT INTO soundings VALUES (?, ?)', [(key[0], key[3]) for key in new])
+            self.connection.execute('COMMIT')
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        return len(new)
+
+    def _history(self, sketches):
+        # Soundings behind a station/month/hour: the largest count, since an undefined index adds nothing
+        return max((sketch.count for sketch in sketches.values()), default=0)
+
+    def merge(self, path):
+        """
+        Add another climatology file (e.g. a shard built on another machine) to this one.
+
+        Raises:
+        - ValueError: If both hold some of the same soundings, which would be counted twice
+        """
+        other = sqlite3.connect(path)
+        try:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                soundings = other.execute('SELECT station_id, syn_timestamp FROM soundings').fetchall()
+                shared = sum(self.connection.execute('SELECT COUNT(*) FROM soundings WHERE station_id = ? AND syn_timestamp = ?',
+                                                     sounding).fetchone()[0] for sounding in soundings)
+                if shared:
+                    raise ValueError(f'{path} shares {shared} soundings with {self.path}, merging would count them twice')
+                for station_id, month, hour, name, data in other.execute('SELECT * FROM sketches'):
+                    sketch = self.sketch(station_id, month, hour, name) or QuantileSketch(self.compression)
+                    sketch.merge(QuantileSketch.from_bytes(data))
+                    self.connection.execute('INSERT OR REPLACE INTO sketches VALUES (?, ?, ?, ?, ?)',
+                                            (station_id, month, hour, name, sketch.to_bytes()))
+                self.connection.executemany('INSERT INTO soundings VALUES (?, ?)', soundings)
+                self.connection.execute('COMMIT')
+            except BaseException:
+                self.connection.execute('ROLLBACK')
+                raise
+        finally:
+            other.close()
+        return len(soundings)
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM soundings').fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+def _key(row):
+    # (station_id, month, hour, syn_timestamp) of an index row; naive datetimes are UTC, as everywhere in the pipeline
+    timestamp = row['timestamp']
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return str(row['station_id']), timestamp.month, timestamp.hour, int(timestamp.timestamp())
+
+def configure_climatology(path):
+    """Update the climatology at `path` (None or '' for none) from this process, and from worker processes spawned after this call."""
+    global _path, _store
+    if _store is not None:
+        _store.close()
+    _path, _store = path or '', None
+    os.environ['RADIOSONDE_CLIMATOLOGY'] = _path
+
+def climatology():
+    """The Climatology of this process (opened on first use), None when not configured."""
+    global _store
+    if _store is None and _path:
+        _store = Climatology(_path)
+    return _store
+
+def format_percentiles(row):
+    """One-line summary of the percentile columns of a row, e.g. 'CAPE p93 | CIN p40 | ...'."""
+    return ' | '.join(f"{name.upper()} {'-' if np.isnan(row[column]) else f'p{row[column]:.0f}'}"
+                      for name, column in zip(CLIMATOLOGY_INDICES, PERCENTILE_COLUMNS))
+
+def parse_args(argv=None):
+    from archive import ARCHIVE_DIR, add_query_arguments
+
+    parser = argparse.ArgumentParser(description='Per-station climatology of the indices, as mergeable quantile sketches.')
+    parser.add_argument('--climatology', default=CLIMATOLOGY_PATH or 'climatology.sqlite',
+                        help='Climatology file (default: RADIOSONDE_CLIMATOLOGY or climatology.sqlite)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='Add the archived soundings matching the options (see archive.py)')
+    build.add_argument('--archive', default=ARCHIVE_DIR, help='Archive directory (default: RADIOSONDE_ARCHIVE or SoundingArchive)')
+    add_query_arguments(build)
+    merge = commands.add_parser('merge', help='Add other climatology files holding different soundings')
+    merge.add_argument('paths', nargs='+')
+    show = commands.add_parser('show', help='Print the quantiles of a station')
+    show.add_argument('station')
+    show.add_argument('--month', type=int, default=None, help='Only this month (1-12)')
+    show.add_argument('--hour', type=int, default=None, help='Only this synoptic hour (UTC)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = Climatology(args.climatology)
+    try:
+        if args.command == 'build':
+            from archive import SoundingArchive, query_arguments
+            from indices import compute_archive_indices, BATCH_SIZE
+
+            archive = SoundingArchive(args.archive)
+            try:
+                entries = archive.query(**query_arguments(args))
+                added = 0
+                # Oldest first, so every row's percentiles compare it with its own history
+                entries.sort(key=lambda entry: entry['syn_timestamp'])
+                for batch_start in range(0, len(entries), BATCH_SIZE):
+                    added += store.update(compute_archive_indices(archive, entries[batch_start:batch_start + BATCH_SIZE]))
+            finally:
+                archive.close()
+            print(f'  > CLIMATOLOGY: {added}/{len(entries)} soundings added | {len(store)} in {args.climatology}')
+        elif args.command == 'merge':
+            for path in args.paths:
+                print(f'  > MERGED: {store.merge(path)} soundings from {path}')
+            print(f'  > CLIMATOLOGY: {len(store)} soundings in {args.climatology}')
+        else:
+            conditions, parameters = ['station_id = ?'], [args.station]
+            for column in ('month', 'hour'):
+                if getattr(args, column) is not None:
+                    conditions.append(f'{column} = ?')
+                    parameters.append(getattr(args, column))
+            rows = store.connection.execute(f"SELECT month, hour, name, sketch FROM sketches WHERE {' AND '.join(conditions)} "
+                                            'ORDER BY month, hour', parameters).fetchall()
+            sketches = {(month, hour, name): QuantileSketch.from_bytes(data) for month, hour, name, data in rows}
+            print(f"{'month':>5} {'hour':>4} {'index':<6} {'n':>6} {'p5':>9} {'p25':>9} {'p50':>9} {'p75':>9} {'p95':>9}")
+            for month, hour, name in sorted(sketches, key=lambda key: (key[0], key[1], CLIMATOLOGY_INDICES.index(key[2]))):
+                sketch = sketches[month, hour, name]
+                quantiles = ' '.join(f'{value:9.1f}' for value in sketch.quantile([0.05, 0.25, 0.5, 0.75, 0.95]))
+                print(f'{month:5d} {hour:3d}Z {name:<6} {sketch.count:6.0f} {quantiles}')
+        return 0
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
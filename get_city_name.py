@@ -1,26 +1,192 @@
-from geopy.geocoders import Nominatim
+import os
+import sys
+import csv
+import sqlite3
+import warnings
+from urllib.parse import urlsplit
+import numpy as np
 
-def get_city_name(lat, lon):
-    geolocator = Nominatim(user_agent="SkewTdiagram")
-    location = geolocator.reverse((lat, lon), exactly_one=True)
+# Persistent station-location cache (SQLite, shared safely between worker processes)
+GEOCODE_CACHE = os.environ.get('RADIOSONDE_GEOCODE_CACHE', 'station_locations.sqlite')
 
-    if location and location.raw.get('address'):
-        address = location.raw['address']
+# Offline mode never contacts Nominatim and falls back to the nearest cached station
+OFFLINE = os.environ.get('RADIOSONDE_OFFLINE', '0') not in ('', '0')
+
+# Nominatim instance, e.g. a local stand-in server for tests
+NOMINATIM_URL = os.environ.get('RADIOSONDE_NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+
+UNKNOWN_LOCATION = 'Unknown Location'
+MAX_NEAREST_KM = 50  # Furthest cached station accepted by the offline fallback
+EARTH_RADIUS_KM = 6371.0
+
+_names = {}  # In-process cache: station_id or rounded (lat, lon) -> name
+_connection = None
+_geolocator = None
+_tree = None  # (KD-tree over cached positions, names), rebuilt after inserts
+
+def _location_key(lat, lon):
+    # ~1 km resolution, enough to absorb the launch-to-launch jitter of a station
+    return round(float(lat), 2), round(float(lon), 2)
 
-        city = address.get('city') or address.get('town') or address.get('village') or address.get('county')
-        country = address.get('country_code').upper()
+def _connect():
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(GEOCODE_CACHE, timeout=30)
+        _connection.execute('PRAGMA journal_mode=WAL')
+        _connection.execute(
+            'CREATE TABLE IF NOT EXISTS locations ('
+            'lat REAL NOT NULL, lon REAL NOT NULL, station_id TEXT, name TEXT NOT NULL, PRIMARY KEY (lat, lon))')
+        _connection.execute('CREATE INDEX IF NOT EXISTS locations_station ON locations (station_id)')
+    return _connection
 
-        if city:
-            city_name = city.lower().strip()  # Make sure to strip any extra spaces
+def _get_geolocator():
+    global _geolocator
+    if _geolocator is None:
+        # geopy is only imported once a lookup misses the cache
+        from geopy.geocoders import Nominatim
+        url = urlsplit(NOMINATIM_URL)
+        _geolocator = Nominatim(user_agent="SkewTdiagram", domain=url.netloc + url.path.rstrip('/'), scheme=url.scheme)
+    return _geolocator
 
-            if "town of" in city_name:
-                city_name = city_name.replace("town of", "").strip()
-                return f'{city_name.upper()}, {country}'
-            
-            if "village of" in city_name:
-                city_name = city_name.replace("village of", "").strip()
-                return f'{city_name.upper()}, {country}'
+def format_address(address):
+    """Turn a Nominatim address dictionary into the 'CITY, CC' label used on the plots."""
+    city = address.get('city') or address.get('town') or address.get('village') or address.get('county')
+    country = address.get('country_code').upper()
 
+    if city:
+        city_name = city.lower().strip()  # Make sure to strip any extra spaces
+
+        if "town of" in city_name:
+            city_name = city_name.replace("town of", "").strip()
+            return f'{city_name.upper()}, {country}'
+
+        if "village of" in city_name:
+            city_name = city_name.replace("village of", "").strip()
             return f'{city_name.upper()}, {country}'
-        
-    return 'Unknown Location'
+
+        return f'{city_name.upper()}, {country}'
+
+    return UNKNOWN_LOCATION
+
+def _reverse_geocode(lat, lon, reverse=None):
+    reverse = reverse or _get_geolocator().reverse
+    location = reverse((lat, lon), exactly_one=True)
+
+    if location and location.raw.get('address'):
+        return format_address(location.raw['address'])
+
+    return UNKNOWN_LOCATION
+
+def _lookup_cached(lat, lon, station_id):
+    key = _location_key(lat, lon)
+    if station_id is not None and station_id in _names:
+        return _names[station_id]
+    if key in _names:
+        return _names[key]
+
+    connection = _connect()
+    row = None
+    if station_id is not None:
+        row = connection.execute('SELECT name FROM locations WHERE station_id = ? LIMIT 1', (str(station_id),)).fetchone()
+    if row is None:
+        row = connection.execute('SELECT name FROM locations WHERE lat = ? AND lon = ?', key).fetchone()
+    if row is None:
+        return None
+
+    _names[key] = row[0]
+    if station_id is not None:
+        _names[station_id] = row[0]
+    return row[0]
+
+def _store(lat, lon, station_id, name):
+    global _tree
+    key = _location_key(lat, lon)
+    connection = _connect()
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO locations (lat, lon, station_id, name) VALUES (?, ?, ?, ?)',
+                           (*key, None if station_id is None else str(station_id), name))
+    _names[key] = name
+    if station_id is not None:
+        _names[station_id] = name
+    _tree = None
+
+def _to_unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def nearest_station_name(lat, lon, max_distance_km=MAX_NEAREST_KM):
+    """Name of the closest cached location within max_distance_km, or None."""
+    global _tree
+    if _tree is None:
+        rows = _connect().execute(
+            'SELECT lat, lon, name FROM locations WHERE name != ?', (UNKNOWN_LOCATION,)).fetchall()
+        if not rows:
+            return None
+        from scipy.spatial import cKDTree
+        positions = np.array([row[:2] for row in rows], dtype=float)
+        _tree = (cKDTree(_to_unit_vectors(positions[:, 0], positions[:, 1])), [row[2] for row in rows])
+
+    tree, names = _tree
+    chord, index = tree.query(_to_unit_vectors(lat, lon)[0])
+    distance_km = 2 * EARTH_RADIUS_KM * np.arcsin(min(chord / 2, 1.0))
+
+    return names[index] if distance_km <= max_distance_km else None
+
+def get_city_name(lat, lon, station_id=None, offline=None, reverse=None):
+    """
+    Place name for a sounding location.
+
+    Lookups go through the in-process cache, then the SQLite cache (by station_id, then by
+    rounded lat/lon), then Nominatim. Offline, or when Nominatim is unreachable, the nearest
+    cached station is used instead. `reverse` replaces the Nominatim reverse call (e.g. with
+    a rate-limited one, see rate_limited_reverse).
+    """
+    name = _lookup_cached(lat, lon, station_id)
+    if name is not None:
+        return name
+
+    offline = OFFLINE if offline is None else offline
+    if not offline:
+        try:
+            name = _reverse_geocode(lat, lon, reverse)
+            _store(lat, lon, station_id, name)
+            return name
+        except Exception as e:
+            warnings.warn(f'Reverse geocoding failed for ({lat}, {lon}): {e}; using the nearest cached station')
+
+    return nearest_station_name(lat, lon) or UNKNOWN_LOCATION
+
+def rate_limited_reverse(min_delay_seconds=1, swallow_exceptions=True):
+    """Nominatim reverse call that waits so consecutive requests are at least min_delay_seconds apart."""
+    from geopy.extra.rate_limiter import RateLimiter
+    return RateLimiter(_get_geolocator().reverse, min_delay_seconds=min_delay_seconds, swallow_exceptions=swallow_exceptions)
+
+def prewarm_cache(stations, offline=None):
+    """
+    Fill the cache for a list of stations, querying Nominatim at most once per second.
+
+    A failed lookup (timeout, HTTP 429 or 5xx) is not cached, so the station is looked up again on
+    the next run; meanwhile it gets the nearest cached station's name.
+
+    Parameters:
+    - stations: Iterable of (station_id, lat, lon)
+
+    Returns:
+    - names: Dictionary station_id -> place name
+    """
+    offline = OFFLINE if offline is None else offline
+    # Errors reach get_city_name, which falls back to the nearest cached station instead of caching a failure
+    reverse = None if offline else rate_limited_reverse(swallow_exceptions=False)
+
+    names = {}
+    for station_id, lat, lon in stations:
+        names[station_id] = get_city_name(float(lat), float(lon), station_id, offline, reverse)
+    return names
+
+if __name__ == '__main__':
+    # Pre-warm from a CSV station list with columns station_id, lat, lon
+    with open(sys.argv[1], newline='') as f:
+        stations = [(row['station_id'], row['lat'], row['lon']) for row in csv.DictReader(f)]
+
+    for station_id, name in prewarm_cache(stations).items():
+        print(f'  > {station_id}: {name}')
@@ -0,0 +1,126 @@
+import os
+import csv
+import json
+import math
+from parse_geojson import parse_geojson
+from sounding_cache import load_sounding
+from batch_calc import batch_calc, pad_profiles
+from archive import archive_name
+from climatology import PERCENTILE_COLUMNS
+
+# Headless path: parse + calc only. Nothing here imports matplotlib, geopandas or metpy.plots.
+
+# Output columns, one row per sounding
+META_COLUMNS = ['file', 'station_id', 'timestamp', 'lat', 'lon', 'elevation', 'location']
+INDEX_COLUMNS = [
+    'cape', 'cin', 'mlcape', 'mlcin', 'mucape', 'mucin',
+    'pressure_lcl', 'temperature_lcl', 'height_lcl',
+    'pressure_lfc', 'temperature_lfc', 'height_lfc',
+    'pressure_el', 'temperature_el', 'height_el',
+    'pressure_ccl', 'temperature_ccl', 'height_ccl',
+    'u_storm', 'v_storm', 'u_storm3', 'v_storm3',
+    'li', 'vt', 'tt', 'srh3', 'srh6', 'pwat', 'frz',
+]
+OUTPUT_FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+BATCH_SIZE = 256  # Soundings per vectorized calc call, bounds the padded arrays
+
+def compute_indices(filenames, input_dir='.', use_cache=True):
+    """
+    Parse soundings and compute their indices with the vectorized engine (batch_calc).
+
+    Parameters:
+    - filenames: Sounding files, relative to input_dir
+    - input_dir: Directory containing the files
+    - use_cache: Read through the binary sounding cache
+
+    Returns:
+    - rows: List of dictionaries with META_COLUMNS + INDEX_COLUMNS, in input order
+    - failures: List of (filename, error message) tuples
+    """
+    parse = load_sounding if use_cache else parse_geojson
+    rows, failures = [], []
+
+    for batch_start in range(0, len(filenames), BATCH_SIZE):
+        parsed = []
+        for filename in filenames[batch_start:batch_start + BATCH_SIZE]:
+            try:
+                parsed.append((filename, parse(os.path.join(input_dir, filename))))
+            except Exception as e:
+                failures.append((filename, f'{type(e).__name__}: {e}'))
+        rows += _index_rows(parsed)
+
+    return rows, failures
+
+def compute_archive_indices(archive, entries):
+    """
+    Indices of archived soundings (see archive.SoundingArchive.query), without opening any JSON file.
+
+    Returns:
+    - rows: List of dictionaries with META_COLUMNS + INDEX_COLUMNS, in entry order; 'file' is the archive_name
+    """
+    rows = []
+    for batch_start in range(0, len(entries), BATCH_SIZE):
+        parsed = [(archive_name(entry), archive.sounding(entry)) for entry in entries[batch_start:batch_start + BATCH_SIZE]]
+        rows += _index_rows(parsed)
+    return rows
+
+def _index_rows(parsed):
+    # One vectorized calc over a batch of (name, Sounding) pairs
+    if not parsed:
+        return []
+    profiles = pad_profiles([sounding.profile for _, sounding in parsed])
+    results = batch_calc(*profiles, [sounding.lat for _, sounding in parsed])
+
+    rows = []
+    for i, (filename, sounding) in enumerate(parsed):
+        row = {
+            'file': filename,
+            'station_id': sounding.station_id,
+            'timestamp': sounding.timestamp.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'lat': sounding.lat,
+            'lon': sounding.lon,
+            'elevation': sounding.elevation,
+            'location': sounding.location,
+        }
+        row.update({name: float(results[name][i]) for name in INDEX_COLUMNS})
+        rows.append(row)
+    return rows
+
+def _missing_to_none(row):
+    return {key: None if isinstance(value, float) and math.isnan(value) else value for key, value in row.items()}
+
+def write_indices(rows, path, fmt=None):
+    """
+    Write index rows to CSV, Parquet or JSON Lines; the format follows the file extension unless given.
+    Undefined indices (e.g. no LFC) are written as empty / null. Rows updated by a climatology
+    (see climatology.Climatology.update) add its PERCENTILE_COLUMNS.
+    """
+    fmt = fmt or OUTPUT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in OUTPUT_FORMATS.values():
+        raise ValueError(f'Unknown output format for {path}, use one of {sorted(set(OUTPUT_FORMATS.values()))}')
+
+    percentiles = PERCENTILE_COLUMNS if rows and PERCENTILE_COLUMNS[0] in rows[0] else []
+    columns = META_COLUMNS + INDEX_COLUMNS + percentiles
+    rows = [_missing_to_none(row) for row in rows]
+
+    if fmt == 'csv':
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    elif fmt == 'jsonl':
+        with open(path, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+    else:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Parquet output requires pyarrow (pip install pyarrow)') from None
+        table = pa.Table.from_pylist(rows, schema=pa.schema(
+            [(name, pa.string()) for name in ('file', 'station_id', 'timestamp', 'location')]
+            + [(name, pa.float64()) for name in ('lat', 'lon', 'elevation')]
+            + [(name, pa.float64()) for name in INDEX_COLUMNS + percentiles]))
+        pq.write_table(table.select(columns), path)
@@ -1,42 +1,525 @@
 import os
+import sys
 import time
+import argparse
+import threading
+import multiprocessing
 from datetime import timedelta
-from load_geojson import load_geojson
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, BrokenExecutor, as_completed
 from parse_geojson import parse_geojson
-from skewT_calc import skewT_calc
-from skewT_plot import skewT_plot
-
-def main():
-    filenames = [file for file in os.listdir('GeojsonData') if file.endswith('.json')]
-    
-    for filename in filenames:
-        start_time = time.time()
-        full_path = os.path.join('GeojsonData', filename)
-
-        data = load_geojson(full_path)
-        pressures, temperatures, dewpoints, wind_u, wind_v, heights, elevation, station_id, lat, lon, location, timestamp = parse_geojson(data)
-        print_time = timestamp.strftime('%b %d, %Y at %M')
-        print(f'  > PROFILE FOUND: {station_id} on {print_time}Z | {location}')
-
-        (pressures_short, wind_u_short, wind_v_short, parcel, cape, cin, pressure_lcl, temperature_lcl, height_lcl,
-         pressure_lfc, temperature_lfc, height_lfc, pressure_el, temperature_el, height_el, pressure_ccl, temperature_ccl, height_ccl,
-         pressures_cape, temperatures_cape, parcel_cape, pressures_cin, temperatures_cin, parcel_cin, u_storm, v_storm, u_storm3, v_storm3,
-         li, vt, tt, srh3, srh6, pwat, frz) = skewT_calc(
-            pressures, temperatures, dewpoints, wind_u, wind_v, heights, lat)
-        
-        skewT_plot(
-            pressures, temperatures, dewpoints, wind_u, wind_v, heights, elevation, station_id, lat, lon, location, timestamp, filename,
-            pressures_short, wind_u_short, wind_v_short, parcel, cape, cin, pressure_lcl, temperature_lcl, height_lcl,
-            pressure_lfc, temperature_lfc, height_lfc, pressure_el, temperature_el, height_el,
-            pressure_ccl, temperature_ccl, height_ccl, pressures_cape, temperatures_cape, parcel_cape, pressures_cin, temperatures_cin, parcel_cin,
-            u_storm, v_storm, u_storm3, v_storm3, li, vt, tt, srh3, srh6, pwat, frz
-        )
-
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        formatted_time = str(timedelta(seconds=int(elapsed_time)))
-        formatted_time = formatted_time.zfill(8)
-        print(f'  > RUNTIME: {formatted_time}\n')
+from sounding_cache import load_sounding
+from memory_guard import MemoryGuard, MemoryCeilingError, MAX_MEMORY_MB, rss_mb
+from metrics import record, stage, configure_metrics, METRICS_PATH, PROFILE_DIR, PROFILER, PROFILERS
+from render_output import configure_render_profile
+from thinning import thin_sounding, thinning_enabled, configure_thinning
+from archive import add_query_arguments, query_arguments
+from climatology import climatology, configure_climatology, format_percentiles
+
+# Rendering only ever writes files: select the non-interactive backend before pyplot is imported
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+INPUT_DIR = 'GeojsonData'
+
+_guard = None  # MemoryGuard of this process, see configure_memory_guard
+
+def format_runtime(elapsed_time):
+    # HH:MM:SS.mmm, sub-second runs would otherwise all read 00:00:00
+    milliseconds = int(round(elapsed_time * 1000))
+    formatted_time = str(timedelta(seconds=milliseconds // 1000))
+    return f'{formatted_time.zfill(8)}.{milliseconds % 1000:03d}'
+
+def process_file(filename, input_dir=INPUT_DIR, use_cache=True):
+    """Run the full load -> parse -> calc -> plot pipeline for one sounding file, returns its runtime (s) and output paths."""
+    start_time = time.perf_counter()
+    with record(filename):
+        # The binary sidecar cache skips JSON decoding when the file hasn't changed
+        parse = load_sounding if use_cache else parse_geojson
+        with stage('parse'):
+            sounding = parse(os.path.join(input_dir, filename))
+        outputs = _render(sounding, filename)
+    elapsed_time = time.perf_counter() - start_time
+
+    check_memory(filename, (elapsed_time, outputs))
+    return elapsed_time, outputs
+
+def render_sounding(sounding, filename):
+    """Run calc -> plot for a Sounding that is already parsed, returns its runtime (s) and output paths."""
+    start_time = time.perf_counter()
+    with record(filename):
+        outputs = _render(sounding, filename)
+    elapsed_time = time.perf_counter() - start_time
+
+    check_memory(filename, (elapsed_time, outputs))
+    return elapsed_time, outputs
+
+def _render(sounding, filename):
+    # Imported here so --indices-only never loads MetPy plotting, matplotlib or geopandas
+    from skewT_calc import skewT_calc
+    from skewT_plot import skewT_plot
+
+    print_time = sounding.timestamp.strftime('%b %d, %Y at %M')
+    print(f'  > PROFILE FOUND: {sounding.station_id} on {print_time}Z | {sounding.location}')
+    if sounding.qc is not None and sounding.qc.repaired:
+        print(f'  > QC: {sounding.qc.summary()}')
+
+    if thinning_enabled():
+        levels = len(sounding)
+        with stage('thin'):
+            sounding = thin_sounding(sounding)
+        print(f'  > THINNED: {levels} -> {len(sounding)} levels')
+
+    with stage('calc'):
+        diagnostics = skewT_calc(sounding)
+
+    if climatology() is not None:
+        with stage('climatology'):
+            row = {'station_id': sounding.station_id, 'timestamp': sounding.timestamp, **diagnostics.as_dict()}
+            climatology().update([row])
+        print(f'  > CLIMATOLOGY: {format_percentiles(row)}')
+
+    with stage('plot'):
+        return skewT_plot(sounding, diagnostics, filename)
+
+def configure_memory_guard(max_memory=MAX_MEMORY_MB, trace_memory=False):
+    """Check the memory ceiling (MB) after every render in this process; a breach closes the figure template."""
+    global _guard
+    if max_memory is None and not trace_memory:
+        _guard = None
+    else:
+        _guard = MemoryGuard(max_memory, trace_memory, release=[_release_template])
+    return _guard
+
+def check_memory(label, result=None):
+    """
+    Check the memory ceiling of this process after processing `label` (see configure_memory_guard).
+
+    Raises:
+    - MemoryCeilingError: If the process stays above the ceiling after releasing its caches. It carries
+      `result`, the output of the work just done; a RenderPool then replaces its workers, and the
+      single-process loops (run_batch, run_archive, the watcher, async_ingest) stop.
+    """
+    if _guard is not None and not _guard.check(label):
+        raise MemoryCeilingError(label, rss_mb(), _guard.ceiling_mb, result)
+
+def run_guarded(fn, *args):
+    """
+    Run a unit of work in this process. A MemoryCeilingError still carries the work's result, but this
+    process can't be replaced: the caller stops after it (see stop_on_memory_ceiling).
+
+    Returns:
+    - result: The return value of fn
+    - ceiling: The MemoryCeilingError, or None
+    """
+    try:
+        return fn(*args), None
+    except MemoryCeilingError as e:
+        return e.result, e
+
+def stop_on_memory_ceiling(error, remaining):
+    """Failures for the work a single process leaves undone once it is above its memory ceiling."""
+    print(f'  > STOPPED: {error}; {len(remaining)} sounding(s) not processed, '
+          f'use --workers so the worker processes can be replaced')
+    return [(name, 'Not processed: the process was above its memory ceiling') for name in remaining]
+
+def _release_template():
+    # Only a process that has rendered holds a template; closing it must not import the plotting stack
+    skewT_plot = sys.modules.get('skewT_plot')
+    if skewT_plot is not None:
+        skewT_plot.close_template()
+
+def _init_worker(max_memory=None, trace_memory=False, metrics=None, profile_dir=None, profiler=PROFILER, warm_up=False):
+    # Every worker owns its own pyplot state; keep it headless and single-threaded
+    import matplotlib
+    matplotlib.use('Agg')
+    configure_memory_guard(max_memory, trace_memory)
+    configure_metrics(metrics, profile_dir, profiler)
+    if warm_up:
+        _warm_up()
+
+def _warm_up():
+    # Pay the imports, the figure template and the map layers now rather than on the first sounding
+    import skewT_calc
+    from skewT_plot import get_template
+    from map_data import local_boundaries, boundaries_in_bbox, NATURAL_EARTH_URLS
+    get_template()
+    for name in NATURAL_EARTH_URLS:
+        if local_boundaries(name) is not None:
+            boundaries_in_bbox(name, (0.0, 0.0, 0.0, 0.0))  # Opens the GeoPackage driver; the open-ocean box reads next to nothing
+
+def make_pool(workers, max_memory=MAX_MEMORY_MB, trace_memory=False, recycle_after=None,
+              metrics=METRICS_PATH, profile_dir=PROFILE_DIR, profiler=PROFILER, warm_up=False):
+    """RenderPool of headless render workers (spawned, one BLAS thread each, memory guard and metrics installed);
+    with `warm_up`, every worker loads the plotting stack, the figure template and the map data as it starts."""
+    # Workers inherit these before they import anything: one BLAS thread per process
+    for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ.setdefault(var, '1')
+
+    return RenderPool(workers, (max_memory, trace_memory, metrics, profile_dir, profiler, warm_up), recycle_after)
+
+class RenderPool(Executor):
+    """
+    Process pool that replaces its workers when one of them goes over its memory ceiling.
+
+    A task that raises MemoryCeilingError succeeded: its future gets the error's `result`. The pool
+    then starts a new process pool, moves the tasks that haven't started yet over to it, and shuts
+    the old one down once its running tasks are done. A ProcessPoolExecutor can't replace a single
+    worker without breaking the whole pool, so all of them are replaced. Once shutdown has started,
+    no pool is started: the tasks that haven't started are cancelled instead. `abandon` stops a
+    task even while it runs, the same way.
+    """
+
+    def __init__(self, workers, initargs, recycle_after=None):
+        self.workers, self.initargs, self.recycle_after = workers, initargs, recycle_after
+        self._lock = threading.RLock()  # Cancelling a task runs its callback, which takes the lock, right away
+        self._executor = self._new_executor()
+        self._moving = False
+        self._shutting_down = False  # Set by shutdown: no pool is started after it
+        self._queued = {}  # Task future -> (returned future, fn, args, kwargs, process pool), until the task finishes
+        self._retired = []  # Replaced process pools, still running their last tasks
+        self._stopped = set()  # Process pools whose workers abandon terminated
+
+    def _new_executor(self):
+        context = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                                   initargs=self.initargs, max_tasks_per_child=self.recycle_after)
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            self._submit(future, fn, args, kwargs)
+        return future
+
+    def _submit(self, future, fn, args, kwargs):
+        executor = self._executor
+        task = executor.submit(fn, *args, **kwargs)
+        self._queued[task] = (future, fn, args, kwargs, executor)
+        task.add_done_callback(lambda task: self._done(task, executor))
+
+    def _done(self, task, executor):
+        with self._lock:
+            future, fn, args, kwargs, _ = self._queued.pop(task, (None,) * 5)
+            if future is None:
+                return
+            if task.cancelled():
+                if not self._moving:
+                    future.cancel()
+                return
+            if executor in self._stopped and not self._shutting_down and isinstance(task.exception(), BrokenExecutor):
+                # Its worker was terminated along with an abandoned task: run it again on the current pool
+                self._submit(future, fn, args, kwargs)
+                return
+        error = task.exception()
+        if isinstance(error, MemoryCeilingError):
+            self._replace(executor, f'MEMORY: {error}')
+            future.set_result(error.result)
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(task.result())
+
+    def _replace(self, executor, reason):
+        with self._lock:
+            if executor is not self._executor:
+                return  # Already replaced
+            if self._shutting_down:
+                # No new pool once shutdown has taken its list of pools: the tasks that haven't started are cancelled
+                cancelled = sum(task.cancel() for task in list(self._queued))
+                if cancelled:
+                    print(f'  > {reason}, cancelled {cancelled} queued task(s) of the pool being shut down')
+                return
+            print(f'  > {reason}, replacing the {self.workers} worker processes')
+            self._executor, self._moving = self._new_executor(), True
+            try:
+                for task, (future, fn, args, kwargs, _) in list(self._queued.items()):
+                    # Only tasks that haven't started can be cancelled: they run on the new pool
+                    if task.cancel():
+                        self._submit(future, fn, args, kwargs)
+            finally:
+                self._moving = False
+            executor.shutdown(wait=False)
+            self._retired.append(executor)
+
+    def abandon(self, future, reason='abandoned'):
+        """
+        Cancel a future returned by submit, stopping its task even if it is running.
+
+        A running task can only be stopped with the workers of its whole process pool: the pool is
+        replaced, its workers are terminated, and its other tasks start again on the new pool.
+
+        Returns:
+        - False if the task had already finished, True otherwise
+        """
+        with self._lock:
+            task = next((task for task, (queued, *_) in self._queued.items() if queued is future), None)
+            if task is None:
+                return False
+            if task.cancel():
+                return True
+            executor = self._queued.pop(task)[4]
+            future.cancel()
+            if executor is self._executor and not self._shutting_down:
+                print(f'  > {reason}, replacing the {self.workers} worker processes')
+                self._executor = self._new_executor()
+                self._retired.append(executor)
+            # ProcessPoolExecutor has no public way to stop a running task (terminate_workers is Python 3.14+).
+            # Every other task of the pool then fails with BrokenExecutor, and _done submits it again
+            self._stopped.add(executor)
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False)
+            return True
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            self._shutting_down = True
+            executors = self._retired + [self._executor]
+        for executor in executors:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+def run_batch(filenames, input_dir=INPUT_DIR, workers=1, use_cache=True, max_memory=MAX_MEMORY_MB, trace_memory=False,
+              recycle_after=None, metrics=METRICS_PATH, profile_dir=PROFILE_DIR, profiler=PROFILER, manifest=None):
+    """
+    Process many sounding files, optionally across a pool of worker processes.
+
+    A failure in one file is reported and counted, but does not stop the batch.
+    Every process checks its RSS against `max_memory` (MB) after each render: the pool is
+    replaced when a worker stays above it (see RenderPool), a single process stops. Pool
+    workers are also replaced after `recycle_after` soundings. Per-stage timings of every sounding are
+    appended to `metrics` (JSON Lines), and `profile_dir` receives one profiler dump per sounding.
+    Every successful render is recorded in `manifest` (a RenderManifest), if given.
+
+    Returns:
+    - failures: List of (filename, error message) tuples
+    """
+    failures = []
+    total = len(filenames)
+
+    if workers <= 1:
+        guard = configure_memory_guard(max_memory, trace_memory)
+        configure_metrics(metrics, profile_dir, profiler)
+        for position, filename in enumerate(filenames, start=1):
+            ceiling = None
+            try:
+                (elapsed_time, outputs), ceiling = run_guarded(process_file, filename, input_dir, use_cache)
+                if manifest is not None:
+                    manifest.record(os.path.join(input_dir, filename), outputs)
+                print(f'  > RUNTIME: {format_runtime(elapsed_time)}\n')
+            except Exception as e:
+                failures.append((filename, f'{type(e).__name__}: {e}'))
+                print(f'  > FAILED: {filename} | {type(e).__name__}: {e}\n')
+            if ceiling is not None:
+                failures += stop_on_memory_ceiling(ceiling, filenames[position:])
+                break
+        if trace_memory:
+            for line in guard.report():
+                print(line)
+        return failures
+
+    # Largest files first so the slowest soundings don't end up alone at the tail of the batch
+    filenames = sorted(filenames, key=lambda f: os.path.getsize(os.path.join(input_dir, f)), reverse=True)
+
+    with make_pool(workers, max_memory, trace_memory, recycle_after, metrics, profile_dir, profiler) as executor:
+        futures = {executor.submit(process_file, filename, input_dir, use_cache): filename for filename in filenames}
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            filename = futures[future]
+            try:
+                elapsed_time, outputs = future.result()
+                if manifest is not None:
+                    manifest.record(os.path.join(input_dir, filename), outputs)
+                print(f'  > [{done}/{total}] DONE: {filename} | RUNTIME: {format_runtime(elapsed_time)}')
+            except Exception as e:
+                failures.append((filename, f'{type(e).__name__}: {e}'))
+                print(f'  > [{done}/{total}] FAILED: {filename} | {type(e).__name__}: {e}')
+
+    return failures
+
+def run_indices(filenames, input_dir, output, use_cache=True):
+    """Compute the indices of every sounding (no rendering) and write one row per sounding to `output`."""
+    from indices import compute_indices, write_indices
+
+    start_time = time.time()
+    rows, failures = compute_indices(filenames, input_dir, use_cache)
+    if climatology() is not None:
+        climatology().update(rows)
+    write_indices(rows, output)
+
+    print(f'  > INDICES: {len(rows)}/{len(filenames)} soundings -> {output} | RUNTIME: {format_runtime(time.time() - start_time)}')
+    for filename, error in failures:
+        print(f'  > FAILED: {filename} | {error}')
+
+    return 1 if failures else 0
+
+def run_archive(archive_path, conditions, workers=1, indices_output=None, max_memory=MAX_MEMORY_MB, trace_memory=False,
+                recycle_after=None, metrics=METRICS_PATH, profile_dir=PROFILE_DIR, profiler=PROFILER):
+    """
+    Render (or, with `indices_output`, only compute the indices of) the archived soundings matching `conditions`.
+
+    Parameters:
+    - archive_path: SoundingArchive directory
+    - conditions: Keyword arguments of SoundingArchive.query (station_id, start, end, hour, near)
+    - workers: Render worker processes; the other options as in run_batch
+
+    Returns:
+    - failures: List of (name, error message) tuples
+    """
+    from archive import SoundingArchive, archive_name
+
+    archive = SoundingArchive(archive_path)
+    start_time = time.time()
+    entries = archive.query(**conditions)
+    print(f'  > ARCHIVE: {len(entries)} soundings match | QUERY: {format_runtime(time.time() - start_time)}')
+
+    failures = []
+    try:
+        if indices_output is not None:
+            from indices import compute_archive_indices, write_indices
+            rows = compute_archive_indices(archive, entries)
+            if climatology() is not None:
+                climatology().update(rows)
+            write_indices(rows, indices_output)
+            print(f'  > INDICES: {len(rows)} soundings -> {indices_output} | RUNTIME: {format_runtime(time.time() - start_time)}')
+            return failures
+
+        if workers <= 1:
+            configure_memory_guard(max_memory, trace_memory)
+            configure_metrics(metrics, profile_dir, profiler)
+            for position, entry in enumerate(entries, start=1):
+                name, ceiling = archive_name(entry), None
+                try:
+                    (elapsed_time, _), ceiling = run_guarded(render_sounding, archive.sounding(entry), name)
+                    print(f'  > RUNTIME: {format_runtime(elapsed_time)}\n')
+                except Exception as e:
+                    failures.append((name, f'{type(e).__name__}: {e}'))
+                    print(f'  > FAILED: {name} | {type(e).__name__}: {e}\n')
+                if ceiling is not None:
+                    failures += stop_on_memory_ceiling(ceiling, [archive_name(entry) for entry in entries[position:]])
+                    break
+            return failures
+
+        # Each submitted Sounding pickles as a copy of its levels, the workers never open the archive
+        with make_pool(workers, max_memory, trace_memory, recycle_after, metrics, profile_dir, profiler) as executor:
+            futures = {executor.submit(render_sounding, archive.sounding(entry), archive_name(entry)): archive_name(entry)
+                       for entry in entries}
+            for done, future in enumerate(as_completed(futures), start=1):
+                name = futures[future]
+                try:
+                    elapsed_time, _ = future.result()
+                    print(f'  > [{done}/{len(entries)}] DONE: {name} | RUNTIME: {format_runtime(elapsed_time)}')
+                except Exception as e:
+                    failures.append((name, f'{type(e).__name__}: {e}'))
+                    print(f'  > [{done}/{len(entries)}] FAILED: {name} | {type(e).__name__}: {e}')
+        return failures
+    finally:
+        archive.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate Skew-T diagrams from GeoJSON soundings.')
+    parser.add_argument('--input-dir', default=INPUT_DIR, help='Directory containing the .json soundings')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes (default: 1, i.e. run sequentially)')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the JSON, ignoring the binary sounding cache')
+    parser.add_argument('--indices-only', action='store_true',
+                        help='Skip the plots, only compute the indices and write them to --output')
+    parser.add_argument('--output', default='indices.csv',
+                        help='Index table for --indices-only (.csv, .parquet or .jsonl, default: indices.csv)')
+    parser.add_argument('--max-memory', type=float, default=MAX_MEMORY_MB,
+                        help='Memory ceiling per process in MB, checked after every render (default: RADIOSONDE_MAX_MEMORY_MB or none)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Track allocations with tracemalloc and report the largest growth when the ceiling is hit')
+    parser.add_argument('--recycle-after', type=int, default=None,
+                        help='Replace each worker process after this many soundings (with --workers > 1)')
+    parser.add_argument('--metrics', default=METRICS_PATH,
+                        help='Append per-stage wall/CPU time and memory of every sounding to this JSON Lines file '
+                             '(default: RADIOSONDE_METRICS or none)')
+    parser.add_argument('--profile', default=PROFILE_DIR, metavar='DIR',
+                        help='Write one profiler dump per sounding to DIR (default: RADIOSONDE_PROFILE_DIR or none)')
+    parser.add_argument('--profiler', choices=PROFILERS, default=PROFILER,
+                        help='Profiler used with --profile: cprofile (.prof, read with pstats) or pyinstrument (.html)')
+    parser.add_argument('--async-io', action='store_true',
+                        help='Overlap file reads, geocoding and the map data fetch with asyncio (see async_ingest.py)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Reads in flight with --async-io (default: 16)')
+    parser.add_argument('--force', action='store_true',
+                        help='Render every sounding, even those whose output is up to date in the render manifest')
+    parser.add_argument('--manifest', default=None,
+                        help='Render manifest of up-to-date outputs (default: RADIOSONDE_MANIFEST or render_manifest.sqlite)')
+    parser.add_argument('--render-profile', default=None,
+                        help='Output files of every figure: web, dashboard, publication, gallery, or specs such as '
+                             '"png:9,webp@1024:80,svg" (default: RADIOSONDE_RENDER_PROFILE or png)')
+    parser.add_argument('--thin', action='store_true',
+                        help='Drop levels that change no profile by more than RADIOSONDE_THIN_TEMPERATURE (°C) or '
+                             'RADIOSONDE_THIN_WIND (kt) before calc and plot, see thinning.py')
+    parser.add_argument('--climatology', default=None, metavar='PATH',
+                        help='Give the percentile of CAPE, CIN, SRH-3, PWAT, FRZ and LI against the station\'s month and hour '
+                             'in this climatology, and add every sounding to it (default: RADIOSONDE_CLIMATOLOGY or none)')
+    parser.add_argument('--archive', default=None, metavar='DIR',
+                        help='Read the soundings from this archive (see archive.py) instead of --input-dir, '
+                             'selected with the options below')
+    add_query_arguments(parser)
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and process new or changed soundings as they land in --input-dir')
+    parser.add_argument('--ledger', default=None,
+                        help='Processed-files ledger for --watch (default: RADIOSONDE_LEDGER or processed_soundings.sqlite)')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between directory scans with --watch')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.render_profile:
+        configure_render_profile(args.render_profile)
+    if args.thin:
+        configure_thinning(True)
+    if args.climatology:
+        configure_climatology(args.climatology)
+    if args.watch:
+        from watch_dir import watch_directory, LEDGER_PATH
+        failures = watch_directory(args.input_dir, args.workers, not args.no_cache, args.ledger or LEDGER_PATH,
+                                   args.poll_interval, args.max_memory, args.trace_memory, args.recycle_after,
+                                   args.metrics, args.profile, args.profiler)
+        return 1 if failures else 0
+
+    if args.archive:
+        failures = run_archive(args.archive, query_arguments(args), args.workers, args.output if args.indices_only else None,
+                               args.max_memory, args.trace_memory, args.recycle_after, args.metrics, args.profile, args.profiler)
+        for name, error in failures:
+            print(f'  > FAILED: {name} | {error}')
+        return 1 if failures else 0
+
+    filenames = [file for file in os.listdir(args.input_dir) if file.endswith('.json')]
+
+    if args.indices_only:
+        return run_indices(sorted(filenames), args.input_dir, args.output, not args.no_cache)
+
+    # Only new or changed soundings, unless --force; rendered outputs are recorded either way
+    from render_manifest import RenderManifest, MANIFEST_PATH
+    manifest = RenderManifest(args.manifest or MANIFEST_PATH)
+    if not args.force:
+        total = len(filenames)
+        stale = set(manifest.stale([os.path.join(args.input_dir, filename) for filename in filenames]))
+        filenames = [filename for filename in filenames if os.path.join(args.input_dir, filename) in stale]
+        if len(filenames) < total:
+            print(f'  > UP TO DATE: {total - len(filenames)}/{total} soundings skipped (--force to render them again)')
+
+    start_time = time.time()
+    if args.async_io:
+        from async_ingest import run_async
+        failures = run_async([os.path.join(args.input_dir, filename) for filename in filenames], args.workers,
+                             not args.no_cache, args.concurrency, max_memory=args.max_memory, trace_memory=args.trace_memory,
+                             recycle_after=args.recycle_after, metrics=args.metrics, profile_dir=args.profile, profiler=args.profiler,
+                             manifest=manifest)
+    else:
+        failures = run_batch(filenames, args.input_dir, args.workers, not args.no_cache,
+                             args.max_memory, args.trace_memory, args.recycle_after, args.metrics, args.profile, args.profiler,
+                             manifest)
+
+    if args.workers > 1 or args.async_io:
+        print(f'\n  > BATCH: {len(filenames) - len(failures)}/{len(filenames)} soundings '
+              f'in {format_runtime(time.time() - start_time)} with {args.workers} workers')
+    for filename, error in failures:
+        print(f'  > FAILED: {filename} | {error}')
+    manifest.close()
+
+    return 1 if failures else 0
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import os
+import sys
+import warnings
+from functools import lru_cache
+import geopandas as gpd
+
+# Natural Earth 10m administrative layers used for the map inset
+NATURAL_EARTH_URLS = {
+    'admin1': 'https://naciscdn.org/naturalearth/10m/cultural/ne_10m_admin_1_states_provinces.zip',
+    'admin2': 'https://naciscdn.org/naturalearth/10m/cultural/ne_10m_admin_2_counties.zip',
+}
+
+# Local store for the boundaries (GeoPackage, with an on-disk R-tree)
+MAP_DATA_DIR = os.environ.get('RADIOSONDE_MAP_DIR', 'MapData')
+
+def boundaries_path(name):
+    return os.path.join(MAP_DATA_DIR, f'{name}_boundaries.gpkg')
+
+def fetch_boundaries(name, source=None):
+    """
+    Build the local boundary file for one Natural Earth layer.
+
+    Parameters:
+    - name: Layer name ('admin1' or 'admin2')
+    - source: Optional local path to the Natural Earth zip (for air-gapped nodes), defaults to the download URL
+
+    Returns:
+    - path: Path of the written GeoPackage
+    """
+    polygons = gpd.read_file(source or NATURAL_EARTH_URLS[name])
+
+    # Only the outlines are ever drawn, so store them instead of the polygons
+    boundaries = gpd.GeoDataFrame(geometry=polygons.boundary, crs=polygons.crs)
+
+    os.makedirs(MAP_DATA_DIR, exist_ok=True)
+    path = boundaries_path(name)
+    boundaries.to_file(path, driver='GPKG', SPATIAL_INDEX='YES')
+    return path
+
+def ensure_boundaries(names=tuple(NATURAL_EARTH_URLS)):
+    """Fetch the boundary layers that aren't cached locally yet. Returns the names of the layers available."""
+    available = []
+    for name in names:
+        if not os.path.exists(boundaries_path(name)):
+            try:
+                fetch_boundaries(name)
+            except Exception as e:
+                warnings.warn(f'Map layer {name} could not be fetched ({e}); drawing the map inset without it')
+                continue
+        available.append(name)
+    return available
+
+@lru_cache(maxsize=None)
+def local_boundaries(name):
+    """Path of one local boundary layer, fetched on first use; None if unavailable. Checked once per process."""
+    path = boundaries_path(name)
+    if not os.path.exists(path):
+        try:
+            fetch_boundaries(name)
+        except Exception as e:
+            warnings.warn(f'Map layer {name} is not cached in {MAP_DATA_DIR} and could not be fetched ({e}); '
+                          f'drawing the map inset without it')
+            return None
+    return path
+
+def boundaries_in_bbox(name, bbox):
+    """
+    Select the boundaries of one layer that intersect a bounding box.
+
+    Only those geometries are read: the GeoPackage's on-disk R-tree does the filtering, so no
+    process ever holds a whole 10m layer in memory.
+
+    Parameters:
+    - name: Layer name ('admin1' or 'admin2')
+    - bbox: (lon_min, lat_min, lon_max, lat_max)
+
+    Returns:
+    - GeoDataFrame with the intersecting geometries, or None if the layer is unavailable
+    """
+    path = local_boundaries(name)
+    if path is None:
+        return None
+    return gpd.read_file(path, bbox=tuple(bbox))
+
+if __name__ == '__main__':
+    # Pre-seed the cache: `python map_data.py` downloads, `python map_data.py <dir>` reads the zips from <dir>
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    for name, url in NATURAL_EARTH_URLS.items():
+        source = os.path.join(source_dir, os.path.basename(url)) if source_dir else None
+        print(f'  > MAP DATA: {name} -> {fetch_boundaries(name, source)}')
@@ -0,0 +1,97 @@
+import os
+import gc
+import tracemalloc
+
+# Default memory ceiling in MB for long-running renders (0 or unset: no ceiling)
+MAX_MEMORY_MB = float(os.environ.get('RADIOSONDE_MAX_MEMORY_MB', 0)) or None
+
+TRACE_FRAMES = 1  # Stack depth kept by tracemalloc, enough to group allocations by line
+REPORT_LINES = 10  # Allocation sites listed in a report
+
+# Allocations by the tracing itself and by the import system aren't leaks
+_TRACE_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+
+def rss_mb():
+    """Resident set size of this process in MB, or None where it can't be measured."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak instead of current RSS; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if os.uname().sysname == 'Darwin' else peak / 2**10
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+class MemoryCeilingError(MemoryError):
+    """
+    A process still above its memory ceiling after releasing its caches (MemoryGuard.check returned False).
+    The unit of work that was just checked succeeded: its return value is `result`. The process must not
+    take more work; main.RenderPool replaces its worker pool, a single-process run stops.
+    """
+
+    def __init__(self, label, rss_mb, ceiling_mb, result=None):
+        super().__init__(f'{rss_mb:.0f} MB above the {ceiling_mb:.0f} MB memory ceiling after {label}')
+        self.label, self.rss_mb, self.ceiling_mb, self.result = label, rss_mb, ceiling_mb, result
+
+    def __reduce__(self):
+        return MemoryCeilingError, (self.label, self.rss_mb, self.ceiling_mb, self.result)
+
+class MemoryGuard:
+    """
+    Memory ceiling for a process that renders many soundings.
+
+    check() runs after every unit of work. When the RSS is above the ceiling, the cached
+    rendering state is released (`release` callbacks, then a garbage collection). If that
+    doesn't bring it back under the ceiling, check() returns False and the owner should
+    replace the process (see main.check_memory, which raises MemoryCeilingError). With `trace`, tracemalloc runs and
+    every breach reports the allocation sites that grew since the first check.
+    """
+
+    def __init__(self, ceiling_mb=MAX_MEMORY_MB, trace=False, release=()):
+        self.ceiling_mb = ceiling_mb
+        self.release = list(release)
+        self.trace = trace
+        self.baseline = None
+        self.checks = 0
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    def report(self, limit=REPORT_LINES):
+        """Largest allocation growth since the first check (needs `trace`), as printable lines."""
+        if not tracemalloc.is_tracing() or self.baseline is None:
+            return []
+        stats = _snapshot().compare_to(self.baseline, 'lineno')
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f'  > TRACEMALLOC: {current / 2**20:.1f} MB traced, peak {peak / 2**20:.1f} MB']
+        lines += [f'    {stat}' for stat in stats[:limit]]
+        return lines
+
+    def check(self, label=''):
+        """Call after each render; returns False if the process stays above the ceiling."""
+        self.checks += 1
+        if self.trace and self.baseline is None:
+            # The first unit of work builds the caches, growth is measured from there
+            self.baseline = _snapshot()
+
+        rss = rss_mb()
+        if self.ceiling_mb is None or rss is None or rss <= self.ceiling_mb:
+            return True
+
+        print(f'  > MEMORY: {rss:.0f} MB above the {self.ceiling_mb:.0f} MB ceiling after {label or f"{self.checks} renders"}')
+        for line in self.report():
+            print(line)
+
+        for release in self.release:
+            release()
+        gc.collect()
+
+        rss = rss_mb()
+        print(f'  > MEMORY: {rss:.0f} MB after releasing the render caches')
+        return rss <= self.ceiling_mb
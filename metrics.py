@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import tracemalloc
+from contextvars import ContextVar
+from contextlib import contextmanager, nullcontext
+from memory_guard import rss_mb
+
+# Per-stage metrics (JSON Lines, one record per sounding) and profiler dumps, both off unless configured
+METRICS_PATH = os.environ.get('RADIOSONDE_METRICS') or None
+PROFILE_DIR = os.environ.get('RADIOSONDE_PROFILE_DIR') or None
+PROFILER = os.environ.get('RADIOSONDE_PROFILER', 'cprofile')
+PROFILERS = ('cprofile', 'pyinstrument')
+
+_metrics_path = METRICS_PATH
+_profile_dir = PROFILE_DIR
+_profiler = PROFILER
+# StageRecorder of the sounding being processed, per thread: stages timed by other threads (e.g. the I/O
+# threads of async_ingest) stay out of it
+_recorder = ContextVar('recorder', default=None)
+
+def _max_rss_mb():
+    # High-water mark of the process RSS; kilobytes on Linux, bytes on macOS
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+class StageRecorder:
+    """
+    Wall time, CPU time and memory of the named stages of one unit of work.
+
+    Stages nest: a stage opened inside another is recorded as 'outer/inner'. Every stage records
+    its wall and CPU time (s), the RSS and the process RSS high-water mark when it ends (MB), and,
+    while tracemalloc is tracing (--trace-memory), the peak of traced Python allocations within it.
+    """
+
+    def __init__(self, label=''):
+        self.label = label
+        self.stages = []
+        self._names = []
+        self._peaks = []  # Running traced peak of every open stage, innermost last
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # tracemalloc has one peak counter: hand the parent's peak so far over before resetting it
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._names.append(name)
+        self._peaks.append(0)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1]) if tracing else None
+            if tracing and self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self.stages.append({
+                'stage': '/'.join(self._names),
+                'wall_s': round(wall, 6),
+                'cpu_s': round(cpu, 6),
+                'rss_mb': _round(rss_mb()),
+                'max_rss_mb': _round(_max_rss_mb()),
+                'traced_peak_mb': _round(peak / 2**20) if tracing else None,
+            })
+            self._names.pop()
+
+    def as_dict(self):
+        """Record of the whole unit of work, stages in the order they finished."""
+        return {
+            'label': self.label,
+            'pid': os.getpid(),
+            'wall_s': round(time.perf_counter() - self._start, 6),
+            'cpu_s': round(time.process_time() - self._start_cpu, 6),
+            'max_rss_mb': _round(_max_rss_mb()),
+            'stages': self.stages,
+        }
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+def configure_metrics(metrics_path=METRICS_PATH, profile_dir=PROFILE_DIR, profiler=PROFILER):
+    """Where this process writes stage metrics (JSON Lines) and profiler dumps; None turns either off."""
+    global _metrics_path, _profile_dir, _profiler
+    if profiler not in PROFILERS:
+        raise ValueError(f'Unknown profiler {profiler}, use one of {PROFILERS}')
+    _metrics_path, _profile_dir, _profiler = metrics_path, profile_dir, profiler
+
+def stage(name):
+    """Time a stage of the sounding currently being recorded in this thread; does nothing outside of `record`."""
+    recorder = _recorder.get()
+    return nullcontext() if recorder is None else recorder.stage(name)
+
+@contextmanager
+def record(label):
+    """
+    Record the stages of one sounding (see `stage`), if metrics or profiling are configured.
+
+    The record is appended to the metrics file as one JSON line. A single write per record keeps the
+    lines of concurrent worker processes intact. With a profile directory, the whole unit of work also
+    runs under the profiler and is dumped to <profile_dir>/<label>.prof (cProfile, readable with pstats)
+    or <label>.html (pyinstrument). Only stages timed by the thread that entered `record` are recorded.
+    """
+    if _metrics_path is None and _profile_dir is None:
+        yield None
+        return
+
+    recorder = StageRecorder(label)
+    profiler = _start_profiler() if _profile_dir is not None else None
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+        if profiler is not None:
+            _dump_profile(profiler, label)
+        if _metrics_path is not None:
+            line = json.dumps(recorder.as_dict()) + '\n'
+            fd = os.open(_metrics_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+
+def _start_profiler():
+    if _profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError('The pyinstrument profiler requires pyinstrument (pip install pyinstrument)') from None
+        profiler = Profiler()
+        profiler.start()
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+def _dump_profile(profiler, label):
+    os.makedirs(_profile_dir, exist_ok=True)
+    base = os.path.join(_profile_dir, os.path.splitext(os.path.basename(label))[0])
+    if _profiler == 'pyinstrument':
+        profiler.stop()
+        with open(base + '.html', 'w') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        profiler.dump_stats(base + '.prof')
+
+def summarize(records):
+    """
+    Aggregate stage timings over many records.
+
+    Returns:
+    - Dictionary stage name -> {'count', 'wall_total_s', 'wall_mean_s', 'wall_max_s', 'cpu_total_s'},
+      in the order the stages first appear
+    """
+    summary = {}
+    for rec in records:
+        for entry in rec['stages']:
+            stats = summary.setdefault(entry['stage'], {'count': 0, 'wall_total_s': 0.0, 'wall_max_s': 0.0, 'cpu_total_s': 0.0})
+            stats['count'] += 1
+            stats['wall_total_s'] += entry['wall_s']
+            stats['wall_max_s'] = max(stats['wall_max_s'], entry['wall_s'])
+            stats['cpu_total_s'] += entry['cpu_s']
+    for stats in summary.values():
+        stats['wall_mean_s'] = stats['wall_total_s'] / stats['count']
+    return summary
+
+if __name__ == '__main__':
+    # Per-stage summary of a metrics file: `python metrics.py metrics.jsonl`
+    with open(sys.argv[1]) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    print(f'  > METRICS: {len(records)} soundings in {sys.argv[1]}')
+    print(f'    {"stage":<28} {"count":>6} {"mean (s)":>10} {"max (s)":>10} {"total (s)":>10} {"cpu (s)":>10}')
+    for name, stats in summarize(records).items():
+        print(f'    {name:<28} {stats["count"]:>6} {stats["wall_mean_s"]:>10.4f} {stats["wall_max_s"]:>10.4f} '
+              f'{stats["wall_total_s"]:>10.3f} {stats["cpu_total_s"]:>10.3f}')
@@ -1,52 +1,62 @@
-import numpy as np
 from datetime import datetime
 from get_city_name import get_city_name
+from stream_geojson import stream_geojson, columns_from_features
+from metrics import stage
+from sounding import Sounding
+from qc import quality_control
 
 # Parse the GeoJSON data for Skew-T plot
 def parse_geojson(data):
-    pressures = []  # in hPa
-    temperatures = []  # in Celsius
-    dewpoints = []  # in Celsius
-    wind_u = []  # in kts
-    wind_v = []  # in kts
-    heights = []  # Geopotential height in meters
-    timestamp = 0  # Unix timestamp
-
-    for feature in data['features']:
-        if feature['geometry']['type'] == 'Point':
-            props = feature['properties']
-            pressures.append(props['pressure'])
-            temperatures.append(props['temp'] - 273.15)  # Convert Kelvin to Celsius
-            dewpoints.append(props['dewpoint'] - 273.15)  # Convert Kelvin to Celsius
-            wind_u.append(props['wind_u'])
-            wind_v.append(props['wind_v'])
-            heights.append(props['gpheight'])
-    elevation = data['properties']['elevation']
+    """
+    Extract the Skew-T profile from a sounding.
 
-    # Extract latitude and longitude
-    lat = data['properties']['lat']
-    lon = data['properties']['lon']
+    `data` is either a FeatureCollection already loaded as a dictionary (see load_geojson),
+    or a path / bytes buffer, which is parsed directly into arrays by stream_geojson.
+    """
+    if isinstance(data, dict):
+        columns, properties = columns_from_features(data)
+    else:
+        columns, properties = stream_geojson(data)
+
+    return parse_columns(columns, properties)
+
+def parse_columns(columns, properties, location=None, report=None):
+    """
+    Sounding from the columns of stream_geojson; the place name is looked up unless `location` is given.
+
+    The columns go through qc.quality_control first, which raises qc.QCError for a profile that is
+    rejected, before anything else is done with it. Pass the QCReport as `report` when `columns` are
+    already the output of quality_control.
+    """
+    if report is None:
+        with stage('qc'):
+            columns, report = quality_control(columns)
+
+    pressures = columns['pressure']  # in hPa
+    temperatures = columns['temp'] - 273.15  # Convert Kelvin to Celsius
+    dewpoints = columns['dewpoint'] - 273.15  # Convert Kelvin to Celsius
+    wind_u = columns['wind_u']  # in kts
+    wind_v = columns['wind_v']  # in kts
+    heights = columns['gpheight']  # Geopotential height in meters
 
-    location = get_city_name(lat, lon)
+    elevation = properties['elevation']
+
+    # Extract latitude and longitude
+    lat = properties['lat']
+    lon = properties['lon']
 
     # Unix timestamp
-    timestamp = data['properties']['syn_timestamp']
+    timestamp = properties['syn_timestamp']
     timestamp = datetime.utcfromtimestamp(timestamp)  # Convert the timestamp to a datetime object
 
     # Station ID
-    station_id = data['properties']['station_id']
-
-    return (
-        np.array(pressures),
-        np.array(temperatures),
-        np.array(dewpoints),
-        np.array(wind_u),
-        np.array(wind_v),
-        np.array(heights),
-        elevation,
-        station_id,
-        lat,
-        lon,
-        location,
-        timestamp
-    )
\ No newline at end of file
+    station_id = properties['station_id']
+
+    if location is None:
+        with stage('geocode'):
+            location = get_city_name(lat, lon, station_id)
+
+    return Sounding.from_columns(
+        pressures, temperatures, dewpoints, wind_u, wind_v, heights,
+        elevation, station_id, lat, lon, location, timestamp, flags=columns['flags'], qc=report
+    )
@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from stream_geojson import PROPERTY_COLUMNS
+from sounding import (significance_bits, BEGIN_MISSING_TEMPERATURE, END_MISSING_TEMPERATURE, BEGIN_MISSING_HUMIDITY,
+                      END_MISSING_HUMIDITY, BEGIN_MISSING_WIND, END_MISSING_WIND)
+
+# Spans of missing data the BUFR significance flags declare, between a beginning and an end level
+MISSING_SPANS = {
+    'temp': (BEGIN_MISSING_TEMPERATURE, END_MISSING_TEMPERATURE),
+    'dewpoint': (BEGIN_MISSING_HUMIDITY, END_MISSING_HUMIDITY),
+    'wind': (BEGIN_MISSING_WIND, END_MISSING_WIND),
+}
+
+# Physical bounds of the raw profile columns (hPa, K, K, kt, kt, m); a value outside them is an encoding or sensor error
+LOWER_BOUNDS = (1.0, 150.0, 150.0, -300.0, -300.0, -500.0)
+UPPER_BOUNDS = (1100.0, 350.0, 350.0, 300.0, 300.0, 60000.0)
+SUPERSATURATION = 1.0  # K a dewpoint may exceed the temperature (sensor noise) before the level is dropped
+
+# Shallowest profile skewT_calc can use: Bunkers motion and SRH-6 integrate over 0-6 km
+MIN_LEVELS = 10
+MIN_DEPTH = 6000.0  # m
+
+# Columns checked for missing and impossible values (the profile), as in batch_calc.pad_profiles
+PROFILE_COLUMNS = PROPERTY_COLUMNS[:6]
+
+_lower, _upper = np.array(LOWER_BOUNDS)[:, None], np.array(UPPER_BOUNDS)[:, None]
+_SPAN_BITS = sum(begin | end for begin, end in MISSING_SPANS.values())
+
+class QCError(ValueError):
+    """A profile rejected by quality_control; `report` is its QCReport."""
+
+    def __init__(self, report):
+        super().__init__(f'QC rejected the profile: {report.rejected} ({report.summary()})')
+        self.report = report
+
+class QCReport:
+    """
+    What quality_control did to one profile: the number of levels read and kept, the levels dropped
+    for each reason, whether the levels had to be reordered, and why the profile was rejected, if it was.
+    `levels` holds the indices of the kept levels in the raw columns, in output order.
+    """
+
+    __slots__ = ('raw_levels', 'kept', 'missing', 'out_of_range', 'flagged', 'descent', 'duplicates', 'heights',
+                 'reordered', 'rejected', 'levels')
+    COUNTS = ('missing', 'out_of_range', 'flagged', 'descent', 'duplicates', 'heights')
+
+    def __init__(self, raw_levels=0, kept=0, missing=0, out_of_range=0, flagged=0, descent=0, duplicates=0, heights=0,
+                 reordered=False, rejected=None, levels=None):
+        self.raw_levels, self.kept = raw_levels, kept
+        self.missing, self.out_of_range, self.flagged = missing, out_of_range, flagged
+        self.descent, self.duplicates, self.heights = descent, duplicates, heights
+        self.reordered, self.rejected, self.levels = reordered, rejected, levels
+
+    @property
+    def repaired(self):
+        """True if the profile was changed in any way."""
+        return self.reordered or self.kept != self.raw_levels
+
+    def summary(self):
+        dropped = ', '.join(f'{getattr(self, name)} {name.replace("_", " ")}' for name in self.COUNTS if getattr(self, name))
+        return (f'{self.raw_levels} -> {self.kept} levels' + (f' (dropped: {dropped})' if dropped else '')
+                + (', reordered' if self.reordered else ''))
+
+    def as_dict(self):
+        """The report without `levels`, as JSON-compatible values."""
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'levels'}
+
+    def __reduce__(self):
+        return QCReport, tuple(getattr(self, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f'QCReport({self.summary()}' + (f', rejected={self.rejected!r})' if self.rejected else ')')
+
+def _inside_spans(bits, begin, end):
+    # Levels strictly between a beginning and the following end flag (raw order)
+    begins, ends = (bits & begin) != 0, (bits & end) != 0
+    return np.cumsum(begins) - begins - np.cumsum(ends) > 0
+
+def _reject(good, height):
+    # Reason to reject the kept levels, None if they are usable
+    if len(good) < MIN_LEVELS:
+        return f'{len(good)} usable levels, at least {MIN_LEVELS} needed'
+    depth = height[good[-1]] - height[good[0]]
+    if not depth >= MIN_DEPTH:
+        return f'{depth:.0f} m deep, at least {MIN_DEPTH:.0f} m needed'
+    return None
+
+def quality_control(columns):
+    """
+    Repair a raw profile, or reject it, before any calculation.
+
+    The checks are whole-array operations, so a rejected file costs microseconds, not a calc and plot:
+    1. Levels inside a span the BUFR significance flags declare missing (temperature, humidity or
+       wind), levels with a missing profile value and levels outside physical bounds are dropped.
+    2. Descent data is truncated: in launch order (the `time` column when complete, else the order
+       of the file), everything after the lowest pressure, where the balloon burst, is dropped.
+    3. The levels are sorted by decreasing pressure, repeated pressures keep their first report,
+       and a level whose height does not exceed every height below it is dropped, so pressure and
+       height are both strictly monotonic for the interpolations of skewT_calc.
+    4. Profiles with fewer than MIN_LEVELS levels or shallower than MIN_DEPTH are rejected.
+
+    Parameters:
+    - columns: Raw columns of stream_geojson (pressure in hPa, temperatures in K, wind in kt, heights in m)
+
+    Returns:
+    - columns: The same columns restricted to the kept levels, surface first
+    - report: QCReport
+
+    Raises:
+    - QCError: If the profile is rejected
+    """
+    profile = np.vstack([columns[name] for name in PROFILE_COLUMNS])
+    pressure, temp, dewpoint, height = profile[0], profile[1], profile[2], profile[5]
+    report = QCReport(raw_levels=profile.shape[1])
+
+    missing = ~np.isfinite(profile).all(axis=0)
+    out_of_range = ((profile < _lower) | (profile > _upper)).any(axis=0) | (dewpoint > temp + SUPERSATURATION)
+    flagged = np.zeros(report.raw_levels, dtype=bool)
+    bits = significance_bits(columns['flags'])
+    if np.any(bits & _SPAN_BITS):
+        for begin, end in MISSING_SPANS.values():
+            flagged |= _inside_spans(bits, begin, end)
+    report.flagged = int(np.count_nonzero(flagged))
+    report.missing = int(np.count_nonzero(missing & ~flagged))
+    report.out_of_range = int(np.count_nonzero(out_of_range & ~missing & ~flagged))
+    good = np.flatnonzero(~(flagged | missing | out_of_range))
+
+    # Too little left: reject before ordering anything
+    if len(good) < MIN_LEVELS:
+        report.kept, report.levels, report.rejected = len(good), good, _reject(good, height)
+        raise QCError(report)
+
+    # Launch order, then everything after the burst
+    launch_time = columns['time'][good]
+    if np.isfinite(launch_time).all() and np.any(launch_time[1:] < launch_time[:-1]):
+        good = good[np.argsort(launch_time, kind='stable')]
+    burst = int(np.argmin(pressure[good]))
+    report.descent = len(good) - burst - 1
+    good = good[:burst + 1]
+
+    # Surface first; repeated pressures keep their first report
+    levels_pressure = pressure[good]
+    if np.any(levels_pressure[1:] >= levels_pressure[:-1]):
+        order = np.argsort(-levels_pressure, kind='stable')
+        report.reordered = bool(np.any(order[1:] < order[:-1]))
+        good, levels_pressure = good[order], levels_pressure[order]
+        first = np.ones(len(good), dtype=bool)
+        first[1:] = levels_pressure[1:] != levels_pressure[:-1]
+        report.duplicates = len(good) - int(np.count_nonzero(first))
+        good = good[first]
+
+    # Heights must rise with every level
+    levels_height = height[good]
+    rising = np.ones(len(good), dtype=bool)
+    rising[1:] = levels_height[1:] > np.maximum.accumulate(levels_height)[:-1]
+    report.heights = len(good) - int(np.count_nonzero(rising))
+    if report.heights:
+        good = good[rising]
+
+    report.kept, report.levels = len(good), good
+    report.rejected = _reject(good, height)
+    if report.rejected:
+        raise QCError(report)
+
+    if report.repaired:
+        columns = {name: values[good] for name, values in columns.items()}
+    return columns, report
+
+def check_file(path):
+    """QCReport of a GeoJSON sounding file (rejected or not) and the QC time in seconds; nothing is geocoded."""
+    from stream_geojson import stream_geojson
+
+    columns, _ = stream_geojson(path)
+    start = time.perf_counter()
+    try:
+        report = quality_control(columns)[1]
+    except QCError as e:
+        report = e.report
+    return report, time.perf_counter() - start
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Check soundings with the QC stage and report what it repairs or rejects.')
+    parser.add_argument('paths', nargs='+', help='GeoJSON sounding files, or directories of them')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    rejected = 0
+    for path in args.paths:
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json')) if os.path.isdir(path) else [path]
+        for path in paths:
+            report, elapsed = check_file(path)
+            status = f'REJECTED: {report.rejected}' if report.rejected else 'REPAIRED' if report.repaired else 'OK'
+            print(f'  > {path}: {status} | {report.summary()} | QC: {elapsed * 1e6:.0f} µs')
+            rejected += bool(report.rejected)
+    return 1 if rejected else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
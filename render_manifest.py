@@ -0,0 +1,93 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime, timezone
+from importlib import metadata
+from sounding_cache import file_sha256
+from render_output import parse_profile
+from thinning import thinning_enabled, TEMPERATURE_TOLERANCE, WIND_TOLERANCE
+
+# Manifest of rendered soundings (SQLite), so a run only renders new or changed inputs
+MANIFEST_PATH = os.environ.get('RADIOSONDE_MANIFEST', 'render_manifest.sqlite')
+
+# Everything that changes a rendered figure: the pipeline sources and the libraries drawing it.
+# Bump RENDER_VERSION for anything else that should invalidate every output (fonts, map data, ...).
+RENDER_VERSION = 1
+RENDERER_SOURCES = [
+    'stream_geojson.py', 'qc.py', 'parse_geojson.py', 'get_city_name.py', 'sounding.py',
+    'skewT_calc.py', 'calc.py', 'batch_calc.py', 'skewT_plot.py', 'render_output.py', 'thinning.py', 'map_data.py',
+]
+RENDERER_PACKAGES = ['numpy', 'scipy', 'pint', 'metpy', 'matplotlib', 'geopandas', 'shapely']
+
+def renderer_version(profile=None):
+    """Digest of RENDER_VERSION, the output specs of the render profile (default: the process's), the level
+    thinning settings, the renderer sources and the installed versions of RENDERER_PACKAGES."""
+    thinning = (TEMPERATURE_TOLERANCE, WIND_TOLERANCE) if thinning_enabled() else None
+    sha = hashlib.sha256(f'{RENDER_VERSION}\n{parse_profile(profile)}\nthinning={thinning}\n'.encode())
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in RENDERER_SOURCES:
+        with open(os.path.join(root, name), 'rb') as f:
+            sha.update(name.encode() + b'\0' + f.read())
+    for package in RENDERER_PACKAGES:
+        try:
+            version = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            version = None
+        sha.update(f'{package}={version}\n'.encode())
+    return sha.hexdigest()[:16]
+
+class RenderManifest:
+    """
+    Which input versions were rendered, by which renderer version, to which output files.
+
+    An input is up to date when the renderer version matches, all its outputs still exist, and the
+    input is unchanged: same size and modification time, or, if only the modification time
+    changed, the same content hash. Only successful renders are recorded, so failures are
+    retried on the next run.
+    """
+
+    def __init__(self, path=MANIFEST_PATH, version=None, profile=None):
+        self.version = version or renderer_version(profile)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS rendered ('
+            'input TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL, '
+            'renderer TEXT NOT NULL, outputs TEXT NOT NULL, rendered_at TEXT NOT NULL)')
+
+    def stale(self, paths):
+        """The input paths whose output is missing or out of date, in the given order."""
+        rows = self.connection.execute('SELECT input, size, mtime_ns, sha256, renderer, outputs FROM rendered')
+        entries = {row[0]: row[1:] for row in rows}
+        return [path for path in paths if not self._is_fresh(path, entries.get(os.path.abspath(path)))]
+
+    def _is_fresh(self, path, entry):
+        if entry is None:
+            return False
+        size, mtime_ns, sha256, renderer, outputs = entry
+        if renderer != self.version or not all(os.path.exists(output) for output in json.loads(outputs)):
+            return False
+        stat = os.stat(path)
+        if stat.st_size != size:
+            return False
+        if stat.st_mtime_ns == mtime_ns:
+            return True
+        # Touched without changing: keep the output and remember the new modification time
+        if file_sha256(path) != sha256:
+            return False
+        with self.connection:
+            self.connection.execute('UPDATE rendered SET mtime_ns = ? WHERE input = ?', (stat.st_mtime_ns, os.path.abspath(path)))
+        return True
+
+    def record(self, path, outputs):
+        """Record that the current version of the input `path` was rendered to the list of files `outputs`."""
+        stat = os.stat(path)
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO rendered VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, file_sha256(path), self.version,
+                 json.dumps([os.path.abspath(output) for output in outputs]), datetime.now(timezone.utc).isoformat(timespec='seconds')))
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,134 @@
+import os
+import numpy as np
+from metrics import stage
+
+# Output files written from every drawn figure: a named profile or a list of output specs (see parse_profile)
+RENDER_PROFILE = os.environ.get('RADIOSONDE_RENDER_PROFILE', 'default')
+
+RENDER_PROFILES = {
+    'default': 'png',
+    'web': 'png,webp:85,png@480',
+    'dashboard': 'webp:75,jpg@1024:80',
+    'publication': 'png,pdf,svg',
+    'gallery': 'png@480,png@240',
+}
+
+RASTER_FORMATS = ('png', 'jpg', 'webp')
+VECTOR_FORMATS = ('pdf', 'svg')
+DEFAULT_LEVELS = {'png': 6, 'jpg': 90, 'webp': 85}  # PNG compression level (0-9), JPEG/WebP quality (1-100)
+
+# Thumbnail-only profiles draw at this multiple of the largest thumbnail width, then downsample
+THUMBNAIL_OVERSAMPLE = 2
+
+_profile = RENDER_PROFILE  # Render profile of this process, see configure_render_profile
+
+class OutputSpec:
+    """One output file of a render: format, width in pixels (None for full size) and compression level or quality."""
+
+    def __init__(self, format, width=None, level=None):
+        if format not in RASTER_FORMATS + VECTOR_FORMATS:
+            raise ValueError(f'Unknown output format {format!r}, expected one of {RASTER_FORMATS + VECTOR_FORMATS}')
+        if format in VECTOR_FORMATS and (width is not None or level is not None):
+            raise ValueError(f'{format} output takes no width or level')
+        self.format = format
+        self.width = width
+        self.level = DEFAULT_LEVELS.get(format) if level is None else level
+
+    def suffix(self):
+        # File name ending; resized outputs are tagged with their width
+        return f'_{self.width}px.{self.format}' if self.width else f'.{self.format}'
+
+    def __repr__(self):
+        return f'OutputSpec({self.format!r}, width={self.width}, level={self.level})'
+
+def configure_render_profile(profile):
+    """Use `profile` for every render of this process, and of worker processes spawned after this call."""
+    global _profile
+    parse_profile(profile)  # Reject a bad profile before anything is rendered
+    _profile = profile
+    os.environ['RADIOSONDE_RENDER_PROFILE'] = profile
+
+def render_profile():
+    """The render profile of this process."""
+    return _profile
+
+def parse_profile(profile=None):
+    """
+    Output specs of a render profile.
+
+    Parameters:
+    - profile: Name in RENDER_PROFILES, or comma-separated specs FORMAT[@WIDTH][:LEVEL],
+      e.g. 'png:9,webp@1024:80,svg' (PNG compression level 0-9, JPEG/WebP quality 1-100);
+      defaults to the profile of this process
+
+    Returns:
+    - specs: List of OutputSpec, in the given order
+    """
+    profile = profile or _profile
+    specs = []
+    for item in RENDER_PROFILES.get(profile, profile).split(','):
+        item, _, level = item.strip().partition(':')
+        format, _, width = item.partition('@')
+        specs.append(OutputSpec(format.lower(), int(width) if width else None, int(level) if level else None))
+    if not specs:
+        raise ValueError(f'Render profile {profile!r} has no outputs')
+    return specs
+
+def write_outputs(fig, basename, specs, full_width):
+    """
+    Write every output of a drawn figure from one rasterization.
+
+    The figure is drawn once on its Agg canvas. Full-size and resized PNG, JPEG and WebP files are
+    all encoded from that buffer, and thumbnails are downsampled from it. When every raster output
+    is a thumbnail, the figure is drawn at THUMBNAIL_OVERSAMPLE times the largest width instead of
+    full size. Vector formats are written with their own backend.
+
+    Parameters:
+    - fig: Matplotlib figure with an Agg canvas
+    - basename: Output path without extension
+    - specs: List of OutputSpec
+    - full_width: Width of the full-size image (px) at the figure's dpi
+
+    Returns:
+    - paths: Written file paths, in the order of `specs`
+    """
+    # Pillow ships with matplotlib; imported here so parsing a profile doesn't load it
+    from PIL import Image
+
+    paths = []
+    raster = [spec for spec in specs if spec.format in RASTER_FORMATS]
+    if raster:
+        with stage('rasterize'):
+            widths = [spec.width or full_width for spec in raster]
+            draw_width = min(full_width, THUMBNAIL_OVERSAMPLE * max(widths)) if all(spec.width for spec in raster) else full_width
+            dpi = fig.dpi
+            fig.dpi = dpi * draw_width / full_width
+            try:
+                fig.canvas.draw()
+                image = Image.fromarray(np.asarray(fig.canvas.buffer_rgba()).copy())
+            finally:
+                fig.dpi = dpi
+
+    for spec in specs:
+        path = basename + spec.suffix()
+        with stage(f'write_{spec.format}'):
+            if spec.format in VECTOR_FORMATS:
+                fig.savefig(path, format=spec.format)
+            else:
+                _write_raster(image, path, spec, dpi)
+        paths.append(path)
+    return paths
+
+def _write_raster(image, path, spec, dpi):
+    from PIL import Image
+
+    if spec.width and spec.width < image.width:
+        height = round(image.height * spec.width / image.width)
+        image = image.resize((spec.width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if spec.format == 'png':
+        image.save(path, format='png', compress_level=spec.level, dpi=(dpi, dpi))
+    elif spec.format == 'jpg':
+        # No alpha in JPEG; the figure background is opaque anyway
+        image.convert('RGB').save(path, format='jpeg', quality=spec.level, optimize=True)
+    else:
+        image.save(path, format='webp', quality=spec.level, method=4)
@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor, BrokenExecutor
+from main import make_pool, configure_memory_guard, check_memory, format_runtime
+from memory_guard import MAX_MEMORY_MB
+from metrics import record, stage, configure_metrics, METRICS_PATH, PROFILE_DIR, PROFILER
+from archive import ARCHIVE_DIR
+from thinning import thin_sounding, thinning_enabled
+
+# Local render service: warm worker processes behind a small HTTP server, see `serve`
+SERVE_HOST = os.environ.get('RADIOSONDE_SERVE_HOST', '127.0.0.1')
+SERVE_PORT = int(os.environ.get('RADIOSONDE_SERVE_PORT', 8750))
+CACHE_MB = float(os.environ.get('RADIOSONDE_SERVE_CACHE_MB', 256))  # Response cache size
+MAX_UPLOAD_MB = float(os.environ.get('RADIOSONDE_SERVE_MAX_UPLOAD_MB', 64))
+REQUEST_TIMEOUT = 300  # Seconds a request waits for its worker
+
+CONTENT_TYPES = {'png': 'image/png', 'json': 'application/json'}
+
+class ResponseCache:
+    """
+    Least-recently-used cache of response bodies, bounded by their total size in bytes.
+
+    `get_or_compute` also joins concurrent requests for the same key, so a burst of identical
+    requests renders once.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> bytes, least recently used first
+        self.size = 0
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> threading.Event of the request computing it
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_or_compute(self, key, compute):
+        """Cached body of `key`, or the result of `compute()` (stored); returns (body, cached)."""
+        while True:
+            with self._lock:
+                body = self.entries.get(key)
+                if body is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return body, True
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another request is computing it: wait, then look again (it may have failed)
+            pending.wait()
+        try:
+            body = compute()
+            self.put(key, body)
+            return body, False
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self.entries), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+def render_request(source, kind, width=None, name='request'):
+    """
+    Worker task of the service: the PNG or the indices of one sounding, as response bytes.
+
+    Parameters:
+    - source: GeoJSON bytes, or a Sounding (from the archive)
+    - kind: 'png' or 'json'
+    - width: PNG width in pixels (None for full size)
+    - name: Label of the request's metrics record and profiler dump, see request_name
+    """
+    from parse_geojson import parse_geojson
+    from sounding import Sounding
+    from skewT_calc import skewT_calc
+
+    with record(name):
+        if isinstance(source, Sounding):
+            sounding = source
+        else:
+            with stage('parse'):
+                sounding = parse_geojson(source)
+        if thinning_enabled():
+            with stage('thin'):
+                sounding = thin_sounding(sounding)
+        with stage('calc'):
+            diagnostics = skewT_calc(sounding)
+
+        if kind == 'json':
+            indices = {key: None if math.isnan(value) else value for key, value in diagnostics.as_dict().items()}
+            body = json.dumps({
+                'station_id': sounding.station_id, 'timestamp': sounding.timestamp.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'lat': sounding.lat, 'lon': sounding.lon, 'elevation': sounding.elevation,
+                'location': sounding.location, 'levels': len(sounding), **indices,
+            }).encode()
+        else:
+            # The figure goes to a scratch directory, never next to the batch outputs
+            from skewT_plot import skewT_plot
+            with stage('plot'), tempfile.TemporaryDirectory() as output_dir:
+                output, = skewT_plot(sounding, diagnostics, f'{sounding.station_id}.json',
+                                     f'png@{width}' if width else 'png', output_dir)
+                with open(output, 'rb') as f:
+                    body = f.read()
+    check_memory(name, body)
+    return body
+
+def request_name(source, kind, key):
+    """Metrics label of a request: the archived sounding's station and time, or the upload's cache key."""
+    if isinstance(source, bytes):
+        return f'upload_{key[:16]}'
+    return f'{source.station_id}_{source.timestamp:%Y%m%d%H}_{kind}_{key[:8]}'
+
+def sounding_digest(sounding):
+    """Content hash of a Sounding: its levels and metadata."""
+    sha = hashlib.sha256(repr((sounding.station_id, sounding.timestamp, sounding.lat, sounding.lon,
+                               sounding.elevation, sounding.location)).encode())
+    sha.update(sounding.profile.tobytes())
+    if sounding.flags is not None:
+        sha.update(sounding.flags.tobytes())
+    return sha.hexdigest()
+
+class RenderService:
+    """
+    Renders and index computations of the HTTP service: the response cache in front of a pool of warm workers.
+
+    Cache keys are the content hash of the request (upload bytes or archived sounding), its kind and
+    width, and the renderer version of render_manifest, so a code or library change never serves a
+    stale figure.
+    """
+
+    def __init__(self, executor, cache_bytes, archive_path=None):
+        from render_manifest import renderer_version
+
+        self.executor = executor
+        self.cache = ResponseCache(cache_bytes)
+        self.archive_path = archive_path
+        self.version = renderer_version('png')
+        self.started = time.time()
+        self._archive = None
+        self._archive_thread = ThreadPoolExecutor(max_workers=1)  # Owns the archive's SQLite connection
+
+    def respond(self, kind, content, source, width=None):
+        """(body, cached) of a request; `content` is the bytes hashed for the cache key."""
+        key = hashlib.sha256(f'{self.version}\n{kind}\n{width}\n'.encode() + content).hexdigest()
+        return self.cache.get_or_compute(key, lambda: self._render(source, kind, width, request_name(source, kind, key)))
+
+    def _render(self, source, kind, width, name):
+        future = self.executor.submit(render_request, source, kind, width, name)
+        try:
+            return future.result(timeout=REQUEST_TIMEOUT)
+        except TimeoutError:
+            # A stuck render would keep a warm worker busy, and a retry would queue a second copy of it
+            self.executor.abandon(future, f'TIMEOUT: {name} after {REQUEST_TIMEOUT} s')
+            raise
+
+    def archived(self, station_id, timestamp):
+        """Archived Sounding of a station and synoptic time, None if there is none."""
+        if self.archive_path is None:
+            return None
+        return self._archive_thread.submit(self._lookup, station_id, timestamp).result()
+
+    def _lookup(self, station_id, timestamp):
+        from archive import SoundingArchive
+
+        if self._archive is None:
+            self._archive = SoundingArchive(self.archive_path)
+        entries = self._archive.query(station_id=station_id, start=timestamp, end=timestamp + timedelta(seconds=1))
+        # A Sounding pickles as a copy of its levels, the worker never opens the archive
+        return self._archive.sounding(entries[0]) if entries else None
+
+    def close(self):
+        if self._archive is not None:
+            self._archive_thread.submit(self._archive.close).result()
+        self._archive_thread.shutdown()
+
+    def status(self):
+        return {'uptime': round(time.time() - self.started, 1), 'renderer': self.version, 'cache': self.cache.stats()}
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /render, POST /indices: GeoJSON sounding in the body -> PNG / indices JSON
+    GET /archive/<station_id>/<time>.png|.json: an archived sounding, time in ISO format (e.g. 2024-05-20T12)
+    GET /status: uptime, renderer version and cache statistics
+    PNG requests take ?width=<px> for a smaller image.
+    """
+
+    server_version = 'RadioSonde'
+    service = None  # RenderService, set by serve
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        kinds = {'/render': 'png', '/indices': 'json'}
+        if url.path not in kinds:
+            return self._error(HTTPStatus.NOT_FOUND, f'No such endpoint {url.path}')
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return self._error(HTTPStatus.BAD_REQUEST, 'Send the GeoJSON sounding as the request body')
+        if length > MAX_UPLOAD_MB * 1e6:
+            return self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'Soundings are limited to {MAX_UPLOAD_MB:g} MB')
+        body = self.rfile.read(length)
+        self._respond(kinds[url.path], body, body, url.query)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/status':
+            return self._send(HTTPStatus.OK, 'json', json.dumps(self.service.status()).encode())
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'archive':
+            return self._error(HTTPStatus.NOT_FOUND, f'No such endpoint {url.path}')
+        station_id, (name, _, kind) = parts[1], parts[2].rpartition('.')
+        if kind not in CONTENT_TYPES:
+            return self._error(HTTPStatus.NOT_FOUND, 'Archive requests end in .png or .json')
+        try:
+            timestamp = datetime.fromisoformat(name)
+        except ValueError:
+            return self._error(HTTPStatus.BAD_REQUEST, f'Invalid time {name!r}, use ISO format such as 2024-05-20T12')
+        sounding = self.service.archived(station_id, timestamp)
+        if sounding is None:
+            return self._error(HTTPStatus.NOT_FOUND, f'No archived sounding of {station_id} at {timestamp:%Y-%m-%d %H:%MZ}')
+        self._respond(kind, sounding_digest(sounding).encode(), sounding, url.query)
+
+    def _respond(self, kind, content, source, query):
+        width = parse_qs(query).get('width', [None])[0]
+        if width is not None and (not width.isdigit() or int(width) <= 0):
+            return self._error(HTTPStatus.BAD_REQUEST, f'Invalid width {width!r}')
+        try:
+            body, cached = self.service.respond(kind, content, source, int(width) if width and kind == 'png' else None)
+        except (BrokenExecutor, TimeoutError) as e:
+            return self._error(HTTPStatus.SERVICE_UNAVAILABLE, f'Render workers unavailable ({type(e).__name__})')
+        except Exception as e:
+            # The sounding couldn't be parsed or computed: the request's fault, not the server's
+            return self._error(HTTPStatus.UNPROCESSABLE_ENTITY, f'{type(e).__name__}: {e}')
+        self._send(HTTPStatus.OK, kind, body, {'X-Cache': 'hit' if cached else 'miss'})
+
+    def _error(self, status, message):
+        self._send(status, 'json', json.dumps({'error': message}).encode())
+
+    def _send(self, status, kind, body, headers=()):
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPES[kind])
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f'  > {self.address_string()} {format % args}')
+
+def serve(host=SERVE_HOST, port=SERVE_PORT, workers=2, cache_mb=CACHE_MB, archive_path=None,
+          max_memory=MAX_MEMORY_MB, trace_memory=False, metrics=METRICS_PATH, profile_dir=PROFILE_DIR, profiler=PROFILER):
+    """
+    Serve renders and indices over HTTP until interrupted (see RenderRequestHandler for the endpoints).
+
+    The worker processes load MetPy, matplotlib, the figure template and the map data when the
+    server starts, so a request only pays for its own parse, calc and plot; responses are cached
+    by content in a `cache_mb` LRU cache.
+    """
+    start_time = time.time()
+    configure_memory_guard(max_memory, trace_memory)
+    configure_metrics(metrics, profile_dir, profiler)
+    with make_pool(workers, max_memory, trace_memory, None, metrics, profile_dir, profiler, warm_up=True) as executor:
+        # Spawned workers start on the first submit: start them all now, not on the first requests
+        for future in [executor.submit(time.sleep, 0) for _ in range(workers)]:
+            future.result()
+        RenderRequestHandler.service = RenderService(executor, int(cache_mb * 1e6), archive_path)
+        server = ThreadingHTTPServer((host, port), RenderRequestHandler)
+        print(f'  > SERVING: http://{host}:{server.server_port} with {workers} workers, {cache_mb:g} MB cache '
+              f'| STARTUP: {format_runtime(time.time() - start_time)}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"  > STOPPED: {json.dumps(RenderRequestHandler.service.status()['cache'])}")
+        finally:
+            server.server_close()
+            RenderRequestHandler.service.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve Skew-T renders and indices over HTTP from warm worker processes.')
+    parser.add_argument('--host', default=SERVE_HOST, help='Address to listen on (default: RADIOSONDE_SERVE_HOST or 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=SERVE_PORT, help='Port (default: RADIOSONDE_SERVE_PORT or 8750)')
+    parser.add_argument('--workers', type=int, default=2, help='Render worker processes (default: 2)')
+    parser.add_argument('--cache-mb', type=float, default=CACHE_MB,
+                        help='Response cache size in MB (default: RADIOSONDE_SERVE_CACHE_MB or 256)')
+    parser.add_argument('--archive', default=None, metavar='DIR',
+                        help=f'Serve /archive/ requests from this archive (e.g. {ARCHIVE_DIR}, default: none)')
+    parser.add_argument('--max-memory', type=float, default=MAX_MEMORY_MB,
+                        help='Memory ceiling per process in MB, checked after every render (default: RADIOSONDE_MAX_MEMORY_MB or none)')
+    parser.add_argument('--metrics', default=METRICS_PATH,
+                        help='Append per-stage wall/CPU time and memory of every request to this JSON Lines file '
+                             '(default: RADIOSONDE_METRICS or none)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    serve(args.host, args.port, args.workers, args.cache_mb, args.archive, args.max_memory, metrics=args.metrics)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,48 +1,52 @@
 import numpy as np
 import metpy
 from metpy.units import units
-from metpy.calc import cape_cin, parcel_profile, lfc, el, lcl, ccl, lifted_index, vertical_totals, total_totals_index, storm_relative_helicity, precipitable_water
-from calc import pressure_to_height, manual_storm_motion
+from metpy.calc import ccl, lifted_index, vertical_totals, total_totals_index, storm_relative_helicity, precipitable_water
+from calc import ProfileInterpolator, manual_storm_motion
+from batch_calc import parcel_analysis, PARCEL_TYPES
+from metrics import stage
+from sounding import Diagnostics, level_range
 
 # Plot the Skew-T diagram
-def skewT_calc(pressures, temperatures, dewpoints, wind_u, wind_v, heights, lat):
+def skewT_calc(sounding):
+    """Indices, levels and parcel of a Sounding for skewT_plot, returned as Diagnostics."""
+    pressures, temperatures, dewpoints, wind_u, wind_v, heights = sounding.profile
+    lat = sounding.lat
+
     # Filter data for pressures above 100 hPa
-    valid_indices = pressures > 100
-    pressures_short = pressures[valid_indices]
-    wind_u_short = wind_u[valid_indices]
-    wind_v_short = wind_v[valid_indices]
-    heights_short = heights[valid_indices]
+    short = level_range(pressures > 100)
 
-    # Calculate CAPE and CIN
-    parcel = parcel_profile(pressures * units.hPa, temperatures[0] * units.degC, dewpoints[0] * units.degC)
-    cape, cin = cape_cin(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC, parcel)
+    # Lift the surface-based, mixed-layer and most unstable parcels together; LCL, LFC, EL, CAPE and CIN
+    # all come from that one ascent
+    with stage('parcel_analysis'):
+        parcels = parcel_analysis(pressures, temperatures, dewpoints, PARCEL_TYPES)
+    surface, mixed, unstable = (parcels[parcel_type] for parcel_type in PARCEL_TYPES)
+    parcel = surface['parcel']
+    cape, cin = surface['cape'], surface['cin']
+    mlcape, mucape = mixed['cape'], unstable['cape']
 
-    # Calculate LCL, LFC, EL, and CCL
-    pressure_lcl, temperature_lcl = lcl(pressures[0] * units.hPa, temperatures[0] * units.degC, dewpoints[0] * units.degC)
-    pressure_lfc, temperature_lfc = lfc(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC, parcel, which='bottom')
-    pressure_el, temperature_el = el(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC, parcel)
-    pressure_ccl, temperature_ccl, _ = ccl(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC)
+    # Levels of the surface parcel, and the CCL
+    pressure_lcl, temperature_lcl = surface['pressure_lcl'], surface['temperature_lcl']
+    pressure_lfc, temperature_lfc = surface['pressure_lfc'], surface['temperature_lfc']
+    pressure_el, temperature_el = surface['pressure_el'], surface['temperature_el']
+    with stage('ccl'):
+        pressure_ccl, temperature_ccl, _ = ccl(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC)
+        pressure_ccl, temperature_ccl = pressure_ccl.m_as('hPa'), temperature_ccl.m_as('degC')
 
     # Interpolate heights from the geopotential height data
-    height_lcl = pressure_to_height(pressure_lcl, pressures * units.hPa, heights)
-    height_lfc = pressure_to_height(pressure_lfc, pressures * units.hPa, heights) if not np.isnan(pressure_lfc.magnitude) else np.nan
-    height_el = pressure_to_height(pressure_el, pressures * units.hPa, heights) if not np.isnan(pressure_el.magnitude) else np.nan
-    height_ccl = pressure_to_height(pressure_ccl, pressures * units.hPa, heights)
+    with stage('level_heights'):
+        # One interpolator for the profile, all four levels in one call (an undefined level stays NaN)
+        levels = [pressure_lcl, pressure_lfc, pressure_el, pressure_ccl]
+        height_lcl, height_lfc, height_el, height_ccl = ProfileInterpolator(pressures, heights).height_at(levels)
 
     # Limit the pressure range for CAPE and CIN shading
-    cape_indices = (pressures <= pressure_lfc.magnitude) & (pressures >= pressure_el.magnitude)
-    pressures_cape = pressures[cape_indices]
-    temperatures_cape = temperatures[cape_indices]
-    parcel_cape = parcel[cape_indices]
-
-    cin_indices = pressures >= pressure_lfc.magnitude
-    pressures_cin = pressures[cin_indices]
-    temperatures_cin = temperatures[cin_indices]
-    parcel_cin = parcel[cin_indices]
+    cape_range = level_range((pressures <= pressure_lfc) & (pressures >= pressure_el))
+    cin_range = level_range(pressures >= pressure_lfc)
 
     # Bunkers storm motion (SFC-6km)
-    bunkers_motion = metpy.calc.bunkers_storm_motion(pressures * units.hPa, wind_u * units.kts, wind_v * units.kts, heights * units.m)
-    rm_storm, lm_storm, mean_wind = bunkers_motion
+    with stage('storm_motion'):
+        bunkers_motion = metpy.calc.bunkers_storm_motion(pressures * units.hPa, wind_u * units.kts, wind_v * units.kts, heights * units.m)
+        rm_storm, lm_storm, mean_wind = bunkers_motion
 
     if lat >= 0:
         u_storm = rm_storm[0].magnitude
@@ -51,37 +55,37 @@ def skewT_calc(pressures, temperatures, dewpoints, wind_u, wind_v, heights, lat)
         u_storm = lm_storm[0].magnitude
         v_storm = lm_storm[1].magnitude
 
-    u_storm3, v_storm3 = manual_storm_motion(pressures, heights, wind_u, wind_v, lat)
+    with stage('storm_motion_3km'):
+        u_storm3, v_storm3 = manual_storm_motion(pressures, heights, wind_u, wind_v, lat)
 
     # Lifting Index (LI), Vertical Totals Index (VT), Total Totals Index (TT)
-    li = lifted_index(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC).magnitude[0]
-    vt = vertical_totals(pressures * units.hPa, temperatures * units.degC).magnitude
-    tt = total_totals_index(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC).magnitude
-
-    # Storm Relative Winds
-    u_storm_rel = wind_u_short - u_storm
-    v_storm_rel = wind_v_short - v_storm
+    with stage('stability_indices'):
+        li = lifted_index(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC).magnitude[0]
+        vt = vertical_totals(pressures * units.hPa, temperatures * units.degC).magnitude
+        tt = total_totals_index(pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC).magnitude
 
     # Compute Storm Relative Helicity (SRH)
-    srh3 = storm_relative_helicity(heights * units.m, wind_u * units.kts, wind_v * units.kts,
-        depth=3 * units.km, storm_u=u_storm * units.kts, storm_v=v_storm * units.kts)[0].magnitude
-    srh6 = storm_relative_helicity(heights * units.m, wind_u * units.kts, wind_v * units.kts,
-        depth=6 * units.km, storm_u=u_storm * units.kts, storm_v=v_storm * units.kts)[0].magnitude
+    with stage('srh'):
+        srh3 = storm_relative_helicity(heights * units.m, wind_u * units.kts, wind_v * units.kts,
+            depth=3 * units.km, storm_u=u_storm * units.kts, storm_v=v_storm * units.kts)[0].magnitude
+        srh6 = storm_relative_helicity(heights * units.m, wind_u * units.kts, wind_v * units.kts,
+            depth=6 * units.km, storm_u=u_storm * units.kts, storm_v=v_storm * units.kts)[0].magnitude
 
     # Precipitable water
-    pwat = precipitable_water(pressures * units.hPa, dewpoints * units.degC).magnitude
+    with stage('pwat'):
+        pwat = precipitable_water(pressures * units.hPa, dewpoints * units.degC).magnitude
 
     # Freezing level
-    frz = np.interp(0, temperatures[::-1], heights[::-1])
+    with stage('frz'):
+        frz = np.interp(0, temperatures[::-1], heights[::-1])
 
-    return (
-        pressures_short, wind_u_short, wind_v_short,
-        parcel, cape, cin,
-        pressure_lcl, temperature_lcl, height_lcl,
-        pressure_lfc, temperature_lfc, height_lfc,
-        pressure_el, temperature_el, height_el,
-        pressure_ccl, temperature_ccl, height_ccl,
-        pressures_cape, temperatures_cape, parcel_cape,
-        pressures_cin, temperatures_cin, parcel_cin,
-        u_storm, v_storm, u_storm3, v_storm3, li, vt, tt, srh3, srh6, pwat, frz
-    )
\ No newline at end of file
+    return Diagnostics(
+        sounding, parcel, short, cape_range, cin_range,
+        cape=cape, cin=cin, mlcape=mlcape, mucape=mucape,
+        pressure_lcl=pressure_lcl, temperature_lcl=temperature_lcl, height_lcl=height_lcl,
+        pressure_lfc=pressure_lfc, temperature_lfc=temperature_lfc, height_lfc=height_lfc,
+        pressure_el=pressure_el, temperature_el=temperature_el, height_el=height_el,
+        pressure_ccl=pressure_ccl, temperature_ccl=temperature_ccl, height_ccl=height_ccl,
+        u_storm=u_storm, v_storm=v_storm, u_storm3=u_storm3, v_storm3=v_storm3,
+        li=li, vt=vt, tt=tt, srh3=srh3, srh6=srh6, pwat=pwat, frz=frz,
+    )
@@ -0,0 +1,142 @@
+import numpy as np
+
+# Rows of Sounding.profile, in the units returned by parse_geojson: hPa, °C, °C, kt, kt, m
+PROFILE_FIELDS = ('pressures', 'temperatures', 'dewpoints', 'wind_u', 'wind_v', 'heights')
+
+# Scalar results of skewT_calc, in the order of Diagnostics.values (J/kg, hPa, °C, m, kt, Δ°C, m²/s², mm)
+DIAGNOSTIC_FIELDS = (
+    'cape', 'cin', 'mlcape', 'mucape',
+    'pressure_lcl', 'temperature_lcl', 'height_lcl',
+    'pressure_lfc', 'temperature_lfc', 'height_lfc',
+    'pressure_el', 'temperature_el', 'height_el',
+    'pressure_ccl', 'temperature_ccl', 'height_ccl',
+    'u_storm', 'v_storm', 'u_storm3', 'v_storm3',
+    'li', 'vt', 'tt', 'srh3', 'srh6', 'pwat', 'frz',
+)
+
+# BUFR vertical sounding significance (table 008042, 18 bits, bit 1 = most significant) of Sounding.flags
+SURFACE = 1 << 17
+STANDARD_LEVEL = 1 << 16
+TROPOPAUSE = 1 << 15
+MAX_WIND = 1 << 14
+SIGNIFICANT_TEMPERATURE = 1 << 13
+SIGNIFICANT_HUMIDITY = 1 << 12
+SIGNIFICANT_WIND = 1 << 11
+BEGIN_MISSING_TEMPERATURE = 1 << 10
+END_MISSING_TEMPERATURE = 1 << 9
+BEGIN_MISSING_HUMIDITY = 1 << 8
+END_MISSING_HUMIDITY = 1 << 7
+BEGIN_MISSING_WIND = 1 << 6
+END_MISSING_WIND = 1 << 5
+TOP_OF_WIND = 1 << 4
+FREEZING_LEVEL = 1 << 2
+MISSING_FLAGS = (1 << 18) - 1
+
+def significance_bits(flags):
+    """Integer 008042 bits of per-level flags; NaN, negative values and the all-ones missing value carry none."""
+    flags = np.asarray(flags, dtype=float)
+    valid = (flags >= 0) & (flags != MISSING_FLAGS)  # NaN compares False
+    return np.where(valid, flags, 0).astype(np.int64)
+
+class Sounding:
+    """
+    One radiosonde profile and the metadata of its station.
+
+    The six profile columns (PROFILE_FIELDS, surface first) are the rows of one contiguous (6, L)
+    float64 block, and `pressures`, `temperatures` etc. are views into it. A sounding pickles as that
+    block plus six metadata values, so a handoff to a worker process copies one buffer. `flags`, when
+    the source reports them, holds the BUFR vertical sounding significance (table 008042) of each level,
+    and `qc` the qc.QCReport of the raw levels, when the sounding was parsed through quality_control.
+    """
+
+    __slots__ = ('profile', 'elevation', 'station_id', 'lat', 'lon', 'location', 'timestamp', 'flags', 'qc')
+
+    def __init__(self, profile, elevation, station_id, lat, lon, location, timestamp, flags=None, qc=None):
+        self.profile = np.asarray(profile, dtype=np.float64)
+        if self.profile.ndim != 2 or self.profile.shape[0] != len(PROFILE_FIELDS):
+            raise ValueError(f'Profile must be a ({len(PROFILE_FIELDS)}, levels) array, got shape {self.profile.shape}')
+        self.elevation = elevation
+        self.station_id = station_id
+        self.lat = lat
+        self.lon = lon
+        self.location = location
+        self.timestamp = timestamp
+        self.flags = flags
+        self.qc = qc
+
+    @classmethod
+    def from_columns(cls, pressures, temperatures, dewpoints, wind_u, wind_v, heights, *metadata, flags=None, qc=None):
+        """Sounding from separate profile arrays, followed by elevation, station_id, lat, lon, location and timestamp."""
+        return cls(np.vstack((pressures, temperatures, dewpoints, wind_u, wind_v, heights)).astype(np.float64, copy=False),
+                   *metadata, flags=flags, qc=qc)
+
+    pressures = property(lambda self: self.profile[0], doc='Pressure of every level (hPa)')
+    temperatures = property(lambda self: self.profile[1], doc='Temperature (°C)')
+    dewpoints = property(lambda self: self.profile[2], doc='Dewpoint (°C)')
+    wind_u = property(lambda self: self.profile[3], doc='Eastward wind (kt)')
+    wind_v = property(lambda self: self.profile[4], doc='Northward wind (kt)')
+    heights = property(lambda self: self.profile[5], doc='Geopotential height (m)')
+
+    def __len__(self):
+        return self.profile.shape[1]
+
+    def __reduce__(self):
+        # Plain ndarray: a memory-mapped cache block is sent as its data, not as a file mapping
+        flags = None if self.flags is None else np.asarray(self.flags)
+        return Sounding, (np.asarray(self.profile), self.elevation, self.station_id, self.lat, self.lon,
+                          self.location, self.timestamp, flags, self.qc)
+
+    def __repr__(self):
+        return f'Sounding({self.station_id}, {self.timestamp:%Y-%m-%d %H:%MZ}, {len(self)} levels, {self.location!r})'
+
+class Diagnostics:
+    """
+    Everything skewT_calc derives from a sounding, as plain floats and arrays (no pint quantities).
+
+    The scalar indices are one float64 array (`values`, DIAGNOSTIC_FIELDS order) and read as attributes,
+    e.g. `diagnostics.cape`. `parcel` is the surface parcel temperature (°C) on the sounding's levels.
+    The levels below 100 hPa (wind barbs), of the CAPE layer (LFC to EL) and of the CIN layer (surface
+    to LFC) are slices, so `pressures_short`, `temperatures_cape`, `parcel_cin` etc. are views of the
+    sounding and parcel arrays.
+    """
+
+    __slots__ = ('sounding', 'parcel', 'values', 'short', 'cape_range', 'cin_range')
+
+    def __init__(self, sounding, parcel, short, cape_range, cin_range, values=None, **fields):
+        self.sounding = sounding
+        self.parcel = np.asarray(parcel, dtype=np.float64)
+        self.short, self.cape_range, self.cin_range = short, cape_range, cin_range
+        if values is None:
+            values = [fields[name] for name in DIAGNOSTIC_FIELDS]
+        self.values = np.asarray(values, dtype=np.float64)
+
+    pressures_short = property(lambda self: self.sounding.pressures[self.short])
+    wind_u_short = property(lambda self: self.sounding.wind_u[self.short])
+    wind_v_short = property(lambda self: self.sounding.wind_v[self.short])
+    pressures_cape = property(lambda self: self.sounding.pressures[self.cape_range])
+    temperatures_cape = property(lambda self: self.sounding.temperatures[self.cape_range])
+    parcel_cape = property(lambda self: self.parcel[self.cape_range])
+    pressures_cin = property(lambda self: self.sounding.pressures[self.cin_range])
+    temperatures_cin = property(lambda self: self.sounding.temperatures[self.cin_range])
+    parcel_cin = property(lambda self: self.parcel[self.cin_range])
+
+    def as_dict(self):
+        """Scalar indices by name, as Python floats."""
+        return dict(zip(DIAGNOSTIC_FIELDS, self.values.tolist()))
+
+    def __reduce__(self):
+        return Diagnostics, (self.sounding, self.parcel, self.short, self.cape_range, self.cin_range, self.values)
+
+    def __repr__(self):
+        return f'Diagnostics({self.sounding!r}, cape={self.cape:.1f}, cin={self.cin:.1f})'
+
+def _field(index):
+    return property(lambda self: float(self.values[index]))
+
+for _index, _name in enumerate(DIAGNOSTIC_FIELDS):
+    setattr(Diagnostics, _name, _field(_index))
+
+def level_range(mask):
+    """Slice of the levels selected by a pressure mask; levels are ordered by pressure, so each mask is one run."""
+    index = np.flatnonzero(mask)
+    return slice(int(index[0]), int(index[-1]) + 1) if len(index) else slice(0, 0)
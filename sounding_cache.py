@@ -0,0 +1,169 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+import numpy as np
+from stream_geojson import stream_geojson
+from parse_geojson import parse_columns
+from sounding import Sounding, PROFILE_FIELDS
+from qc import QCReport
+from metrics import stage
+from get_city_name import get_city_name
+
+# Sidecar store for parsed profiles: <name>.npy (struct-of-arrays block) + <name>.json (metadata)
+CACHE_DIR = os.environ.get('RADIOSONDE_CACHE_DIR', 'SoundingCache')
+CACHE_VERSION = 2  # 2: levels after qc.quality_control
+
+# Rows of the cached block, already in the units returned by parse_geojson
+PROFILE_COLUMNS = ['pressure', 'temperature', 'dewpoint', 'wind_u', 'wind_v', 'height', 'time', 'flags', 'lon', 'lat', 'alt']
+
+def _cache_paths(path):
+    # Basename for readability, plus a short hash of the full path so equal names in different directories don't collide
+    name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    base = os.path.join(CACHE_DIR, f'{name}_{digest}')
+    return base + '.npy', base + '.json'
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION and meta.get('columns') == PROFILE_COLUMNS else None
+
+def _write_atomic(path, write):
+    # Write to a temporary name then rename, so concurrent workers never read a partial file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def _is_fresh(meta, path, stat, validate):
+    if meta is None:
+        return False
+    if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size and validate == 'mtime':
+        return True
+    # Content check: either requested explicitly, or the file was touched without changing
+    return meta['size'] == stat.st_size and meta['sha256'] == file_sha256(path)
+
+def _as_sounding(block, meta, geocode=True):
+    # The first six rows of the cached block are the profile, so the Sounding is a view of the memory map.
+    # The place name isn't cached with it: a fallback name from a failed lookup would otherwise stick
+    location = None
+    if geocode:
+        with stage('geocode'):
+            location = get_city_name(meta['lat'], meta['lon'], meta['station_id'])
+    return Sounding(
+        block[:len(PROFILE_FIELDS)],
+        meta['elevation'],
+        meta['station_id'],
+        meta['lat'],
+        meta['lon'],
+        location,
+        datetime.utcfromtimestamp(meta['syn_timestamp']),
+        block[PROFILE_COLUMNS.index('flags')],
+        QCReport(**meta['qc'])
+    )
+
+def load_profile_columns(path, validate='mtime', build=True):
+    """
+    All cached columns of a sounding, building the cache entry if needed (or returning None without `build`).
+
+    Returns:
+    - columns: Dictionary PROFILE_COLUMNS name -> read-only memory-mapped array
+    - meta: Cached metadata (station, position, syn_timestamp, source signature)
+    """
+    entry = _load_entry(path, validate, build)
+    return None if entry is None else (dict(zip(PROFILE_COLUMNS, entry[0])), entry[1])
+
+def _load_entry(path, validate, build):
+    # Memory-mapped (PROFILE_COLUMNS, levels) block and metadata of a sounding
+    data_path, meta_path = _cache_paths(path)
+    stat = os.stat(path)
+    meta = _read_meta(meta_path)
+
+    if _is_fresh(meta, path, stat, validate) and os.path.exists(data_path):
+        if meta['mtime_ns'] != stat.st_mtime_ns:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            _write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+    elif not build:
+        return None
+    else:
+        meta = _build_entry(path, stat, data_path, meta_path)
+
+    # Memory-mapped: columns are views into the page cache, nothing is copied or decoded
+    with stage('load_cache'):
+        block = np.load(data_path, mmap_mode='r')
+    return block, meta
+
+def _build_entry(path, stat, data_path, meta_path):
+    columns, properties = stream_geojson(path)
+    sounding = parse_columns(columns, properties)
+    return _write_entry(path, stat, data_path, meta_path, columns, properties, sounding)
+
+def _write_entry(path, stat, data_path, meta_path, columns, properties, sounding):
+    # The raw columns, on the levels quality_control kept for the profile
+    extra = np.vstack((columns['time'], columns['flags'], columns['lon'], columns['lat'], columns['alt']))
+    block = np.vstack((sounding.profile, extra[:, sounding.qc.levels] if sounding.qc.repaired else extra))
+    meta = {
+        'version': CACHE_VERSION,
+        'columns': PROFILE_COLUMNS,
+        'source': os.path.abspath(path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': file_sha256(path),
+        'elevation': sounding.elevation,
+        'station_id': sounding.station_id,
+        'lat': sounding.lat,
+        'lon': sounding.lon,
+        'syn_timestamp': properties['syn_timestamp'],
+        'qc': sounding.qc.as_dict(),
+    }
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _write_atomic(data_path, lambda f: np.save(f, block))
+    _write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+    return meta
+
+def cached_sounding(path, validate='mtime', geocode=True):
+    """
+    Same result as load_sounding when the cache entry is up to date, None otherwise (nothing is parsed).
+
+    With geocode=False the location is left as None, for a caller that looks place names up itself.
+    """
+    entry = _load_entry(path, validate, build=False)
+    return None if entry is None else _as_sounding(*entry, geocode)
+
+def store_sounding(path, columns, properties, sounding):
+    """
+    Write the cache entry of a sounding that was parsed elsewhere.
+
+    Parameters:
+    - path: GeoJSON sounding file the data was read from
+    - columns, properties: Output of stream_geojson for that file (the raw columns, before quality_control)
+    - sounding: parse_columns(columns, properties) Sounding
+    """
+    data_path, meta_path = _cache_paths(path)
+    _write_entry(path, os.stat(path), data_path, meta_path, columns, properties, sounding)
+
+def load_sounding(path, validate='mtime'):
+    """
+    Same result as parse_geojson(path), served from the binary cache when it is up to date.
+
+    Parameters:
+    - path: GeoJSON sounding file
+    - validate: 'mtime' trusts an unchanged size and modification time, 'hash' always compares the content hash
+
+    Returns:
+    - Sounding, its profile a read-only memory-mapped view of the cached block; the place name is
+      looked up with get_city_name (in-process / SQLite cache) rather than stored with it
+    """
+    return _as_sounding(*_load_entry(path, validate, build=True))
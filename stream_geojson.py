@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import operator
+from json.decoder import WHITESPACE
+import numpy as np
+from metrics import stage
+
+# Per-level columns, in storage order (rows of the column block)
+PROPERTY_COLUMNS = ['pressure', 'temp', 'dewpoint', 'wind_u', 'wind_v', 'gpheight', 'time', 'flags']
+COORDINATE_COLUMNS = ['lon', 'lat', 'alt']
+COLUMNS = PROPERTY_COLUMNS + COORDINATE_COLUMNS
+
+REQUIRED_COLUMNS = PROPERTY_COLUMNS[:-1]  # 'flags' is only reported on some levels
+
+BYTES_PER_LEVEL = 200  # Initial capacity estimate, the column block grows if it's too small
+CHUNK_CHARS = 1 << 18  # Text decoded per call (~1000 levels), bounds the number of live dictionaries
+
+_decoder = json.JSONDecoder()
+_FEATURE_TYPE = re.compile(r'"type"\s*:\s*"Feature"')
+_JSON_TEXT = re.compile(r'\s*\{')
+_get_required = operator.itemgetter(*REQUIRED_COLUMNS)
+
+def _read_text(source):
+    # Accept a path, raw bytes/str or a binary/text file object
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source).decode('utf-8')
+    if isinstance(source, str) and _JSON_TEXT.match(source):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read().decode('utf-8')
+    text = source.read()
+    return text.decode('utf-8') if isinstance(text, bytes) else text
+
+def _skip(text, pos, char):
+    pos = WHITESPACE.match(text, pos).end()
+    if text[pos] != char:
+        raise ValueError(f'Expected {char!r} at position {pos} of the GeoJSON document')
+    return WHITESPACE.match(text, pos + 1).end()
+
+def _fill_levels(block, start, features):
+    # Fill a run of features into the column block; None (JSON null) becomes NaN
+    points = [feature for feature in features if feature['geometry']['type'] == 'Point']
+    stop = start + len(points)
+    if not points:
+        return stop
+
+    props = [feature['properties'] for feature in points]
+    try:
+        rows = np.array([_get_required(p) for p in props], dtype=float)
+    except KeyError:
+        # Some levels omit a value, fall back to the slower lookup with defaults
+        rows = np.array([[p.get(key) for key in REQUIRED_COLUMNS] for p in props], dtype=float)
+    block[:len(REQUIRED_COLUMNS), start:stop] = rows.T
+    block[PROPERTY_COLUMNS.index('flags'), start:stop] = [p.get('flags') for p in props]
+
+    coordinates = [feature['geometry']['coordinates'][:len(COORDINATE_COLUMNS)] for feature in points]
+    try:
+        block[len(PROPERTY_COLUMNS):, start:stop] = np.array(coordinates, dtype=float).T
+    except ValueError:
+        # Positions without altitude
+        for row in range(len(COORDINATE_COLUMNS)):
+            block[len(PROPERTY_COLUMNS) + row, start:stop] = [c[row] if len(c) > row else None for c in coordinates]
+    return stop
+
+def _chunk_starts(text, pos):
+    # Opening brace of the first feature, then of the first feature after every CHUNK_CHARS characters
+    starts = [pos]
+    search = pos + CHUNK_CHARS
+    while True:
+        match = _FEATURE_TYPE.search(text, search)
+        if match is None:
+            return starts
+        brace = match.start() - 1
+        while text[brace] in ' \t\r\n':
+            brace -= 1
+        if text[brace] == '{':
+            starts.append(brace)
+            search = brace + CHUNK_CHARS
+        else:
+            search = match.end()  # "type" isn't the first key of this feature, cut at a later one
+
+def _reserve(block, size):
+    # Grow the column block (doubling) so it can hold `size` levels
+    if size <= block.shape[1]:
+        return block
+    grown = np.full((len(COLUMNS), max(size, 2 * block.shape[1])), np.nan)
+    grown[:, :block.shape[1]] = block
+    return grown
+
+def _decode_features(text, pos):
+    """
+    Decode the features array starting at `pos` (its first element), one chunk of text at a time.
+
+    Chunks are cut at feature starts and decoded by the C JSON scanner in one call each, so only
+    one chunk of dictionaries is alive at any time.
+
+    Returns (column block, level count, position after ']').
+    """
+    block = np.full((len(COLUMNS), len(text) // BYTES_PER_LEVEL + 1), np.nan)
+    count = 0
+    starts = _chunk_starts(text, pos)
+
+    for start, stop in zip(starts, starts[1:]):
+        chunk = text[start:stop].rstrip()
+        features = json.loads(f'[{chunk[:-1]}]')  # Drop the trailing comma
+        block = _reserve(block, count + len(features))
+        count = _fill_levels(block, count, features)
+
+    # The last chunk runs up to the closing bracket of the array
+    features, end = _decoder.raw_decode('[' + text[starts[-1]:])
+    block = _reserve(block, count + len(features))
+    count = _fill_levels(block, count, features)
+
+    return block, count, starts[-1] + end - 1
+
+def _as_columns(block, count):
+    block = np.ascontiguousarray(block[:, :count])
+    return {name: block[row] for row, name in enumerate(COLUMNS)}
+
+def stream_geojson(source):
+    """
+    Parse a sounding FeatureCollection straight into NumPy columns.
+
+    The top level is walked key by key and the features are decoded in bounded chunks straight
+    into a preallocated column block, so the full dictionary tree is never built.
+    Missing values become NaN.
+
+    Parameters:
+    - source: Path, bytes buffer, JSON text or file object
+
+    Returns:
+    - columns: Dictionary of column name -> float64 array (views into one contiguous block)
+    - properties: Top-level FeatureCollection properties (station metadata)
+    """
+    with stage('load'):
+        text = _read_text(source)
+
+    with stage('decode'):
+        return _stream_text(text)
+
+def _stream_text(text):
+    block = np.full((len(COLUMNS), 0), np.nan)
+    count = 0
+    properties = {}
+
+    pos = _skip(text, 0, '{')
+    while text[pos] != '}':
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _skip(text, pos, ':')
+
+        if key == 'features':
+            block, count, pos = _decode_features(text, _skip(text, pos, '['))
+        else:
+            value, pos = _decoder.raw_decode(text, pos)
+            if key == 'properties':
+                properties = value
+
+        pos = WHITESPACE.match(text, pos).end()
+        if text[pos] == ',':
+            pos = WHITESPACE.match(text, pos + 1).end()
+
+    return _as_columns(block, count), properties
+
+def columns_from_features(data):
+    """Same output as stream_geojson, for a FeatureCollection that is already loaded as a dictionary."""
+    block = np.full((len(COLUMNS), len(data['features'])), np.nan)
+    count = _fill_levels(block, 0, data['features'])
+    return _as_columns(block, count), data['properties']
@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import get_city_name
+from async_ingest import Geocoder, load, NOMINATIM_DELAY
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'GeojsonData')
+
+# The same station under two URLs, and two other stations
+SOUNDINGS = {
+    '/a/norman.json': 'norman.json',
+    '/b/norman.json': 'norman.json',
+    '/barcelona.json': 'barcelona.json',
+    '/broome.json': 'broome.json',
+}
+MAX_CONCURRENCY = 2
+
+class StandIn(ThreadingHTTPServer):
+    """Serves the sounding files and a Nominatim reverse endpoint, and records what it was asked."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.reverse_times, self.reverse_points = [], []
+        self.downloads, self.max_downloads = 0, 0
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/reverse':
+            query = parse_qs(url.query)
+            lat, lon = float(query['lat'][0]), float(query['lon'][0])
+            with self.server.lock:
+                self.server.reverse_times.append(time.monotonic())
+                self.server.reverse_points.append((lat, lon))
+            return self._send({'lat': str(lat), 'lon': str(lon), 'display_name': 'Stand-in',
+                               'address': {'city': f'City {lat:.0f}', 'country_code': 'xx'}})
+
+        if url.path not in SOUNDINGS:
+            self.send_error(404)
+            return
+        with self.server.lock:
+            self.server.downloads += 1
+            self.server.max_downloads = max(self.server.max_downloads, self.server.downloads)
+        try:
+            time.sleep(0.05)  # Long enough for concurrent downloads to overlap
+            with open(os.path.join(INPUT_DIR, SOUNDINGS[url.path]), 'rb') as f:
+                body = f.read()
+            self._send(body)
+        finally:
+            with self.server.lock:
+                self.server.downloads -= 1
+
+    def _send(self, body):
+        body = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class AsyncIngestFrontEndTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+
+        # A fresh, empty location cache that talks to the stand-in
+        for name, value in {'NOMINATIM_URL': self.base, 'GEOCODE_CACHE': os.path.join(cache_dir.name, 'locations.sqlite'),
+                            '_connection': None, '_geolocator': None, '_tree': None, '_names': {}}.items():
+            patcher = mock.patch.object(get_city_name, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def _load_all(self, geocoder):
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as io_executor:
+            return await asyncio.gather(*(load(self.base + path, geocoder, io_executor) for path in SOUNDINGS))
+
+    def test_load_from_stand_in(self):
+        geocoder = Geocoder(offline=False)
+        try:
+            soundings = asyncio.run(self._load_all(geocoder))
+        finally:
+            geocoder.close()
+
+        # One Nominatim request per station, NOMINATIM_DELAY apart
+        stations = {sounding.station_id for sounding in soundings}
+        self.assertEqual(len(self.server.reverse_times), len(stations))
+        self.assertEqual(len(set(self.server.reverse_points)), len(stations))
+        gaps = [later - earlier for earlier, later in zip(self.server.reverse_times, self.server.reverse_times[1:])]
+        self.assertTrue(all(gap >= NOMINATIM_DELAY * 0.99 for gap in gaps), gaps)
+
+        # Every sounding got its station's name from the stand-in, and downloads stayed within the I/O pool
+        for sounding in soundings:
+            self.assertEqual(sounding.location, f'CITY {sounding.lat:.0f}, XX')
+        self.assertEqual(soundings[0].station_id, soundings[1].station_id)
+        self.assertLessEqual(self.server.max_downloads, MAX_CONCURRENCY)
+
+if __name__ == '__main__':
+    unittest.main()
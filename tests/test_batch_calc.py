@@ -0,0 +1,103 @@
+import os
+import unittest
+import numpy as np
+import metpy.calc as mpcalc
+from metpy.units import units
+
+from stream_geojson import stream_geojson
+from parse_geojson import parse_columns
+from calc import manual_storm_motion
+from batch_calc import batch_calc, pad_profiles, TOLERANCES, MIXED_LAYER_DEPTH, MOST_UNSTABLE_DEPTH
+
+INPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'GeojsonData')
+FILES = ['aliceSprings.json', 'barcelona.json', 'broome.json', 'norman.json']
+
+def load(name):
+    columns, properties = stream_geojson(os.path.join(INPUT_DIR, name))
+    return parse_columns(columns, properties, location=name)
+
+def metpy_indices(sounding):
+    """The batch_calc indices of one sounding, computed with MetPy as skewT_calc did before batch_calc."""
+    pressures, temperatures, dewpoints, wind_u, wind_v, heights = sounding.profile
+    p, t, td = pressures * units.hPa, temperatures * units.degC, dewpoints * units.degC
+    u, v, z = wind_u * units.kts, wind_v * units.kts, heights * units.m
+
+    parcel = mpcalc.parcel_profile(p, t[0], td[0])
+    cape, cin = mpcalc.cape_cin(p, t, td, parcel)
+    mlcape, mlcin = mpcalc.mixed_layer_cape_cin(p, t, td, depth=MIXED_LAYER_DEPTH * units.hPa)
+    mucape, mucin = mpcalc.most_unstable_cape_cin(p, t, td, depth=MOST_UNSTABLE_DEPTH * units.hPa)
+    levels = {
+        'lcl': mpcalc.lcl(p[0], t[0], td[0]),
+        'lfc': mpcalc.lfc(p, t, td, parcel, which='bottom'),
+        'el': mpcalc.el(p, t, td, parcel),
+        'ccl': mpcalc.ccl(p, t, td)[:2],
+    }
+
+    rm_storm, lm_storm, _ = mpcalc.bunkers_storm_motion(p, u, v, z)
+    u_storm, v_storm = (rm_storm if sounding.lat >= 0 else lm_storm).m_as('kts')
+    u_storm3, v_storm3 = manual_storm_motion(pressures, heights, wind_u, wind_v, sounding.lat)
+
+    indices = {
+        'cape': cape.m_as('J/kg'), 'cin': cin.m_as('J/kg'),
+        'mlcape': mlcape.m_as('J/kg'), 'mlcin': mlcin.m_as('J/kg'),
+        'mucape': mucape.m_as('J/kg'), 'mucin': mucin.m_as('J/kg'),
+        'u_storm': u_storm, 'v_storm': v_storm, 'u_storm3': u_storm3, 'v_storm3': v_storm3,
+        'li': mpcalc.lifted_index(p, t, td).m[0],
+        'vt': mpcalc.vertical_totals(p, t).m,
+        'tt': mpcalc.total_totals_index(p, t, td).m,
+        'pwat': mpcalc.precipitable_water(p, td).m_as('mm'),
+        'frz': np.interp(0, temperatures[::-1], heights[::-1]),
+    }
+    for depth in (3, 6):
+        srh = mpcalc.storm_relative_helicity(z, u, v, depth=depth * units.km, storm_u=u_storm * units.kts, storm_v=v_storm * units.kts)
+        indices[f'srh{depth}'] = srh[0].m_as('m^2/s^2')
+    for name, (pressure, temperature) in levels.items():
+        indices[f'pressure_{name}'] = pressure.m_as('hPa')
+        indices[f'temperature_{name}'] = temperature.m_as('degC')
+        indices[f'height_{name}'] = np.interp(np.log(indices[f'pressure_{name}']), np.log(pressures[::-1]), heights[::-1], left=np.nan, right=np.nan)
+    return indices
+
+class BatchCalcParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.soundings = [load(name) for name in FILES]
+        cls.results = batch_calc(*pad_profiles([sounding.profile for sounding in cls.soundings]),
+                                 [sounding.lat for sounding in cls.soundings])
+
+    def test_matches_metpy_within_tolerances(self):
+        for i, (name, sounding) in enumerate(zip(FILES, self.soundings)):
+            expected = metpy_indices(sounding)
+            self.assertEqual(set(expected), set(TOLERANCES))
+            for key, tolerance in TOLERANCES.items():
+                with self.subTest(file=name, index=key):
+                    value = self.results[key][i]
+                    if np.isnan(expected[key]):
+                        self.assertTrue(np.isnan(value), f'{value} where MetPy has no value')
+                    else:
+                        self.assertLessEqual(abs(value - expected[key]), tolerance, f'{value} vs MetPy {expected[key]}')
+
+    def test_padded_rows_match_single_profiles(self):
+        # Each row of the padded batch gives the same indices as its sounding on its own
+        for i, sounding in enumerate(self.soundings):
+            single = batch_calc(*pad_profiles([sounding.profile]), sounding.lat)
+            for key in TOLERANCES:
+                with self.subTest(sounding=i, index=key):
+                    np.testing.assert_allclose(self.results[key][i], single[key][0], rtol=1e-9, atol=1e-9)
+
+class PadProfilesTest(unittest.TestCase):
+    def test_unequal_lengths_are_nan_padded(self):
+        profile = np.vstack([np.linspace(1000, 100, 8), np.linspace(20, -60, 8), np.linspace(10, -70, 8),
+                             np.zeros(8), np.ones(8), np.linspace(0, 16000, 8)])
+        gappy = profile[:, :5].copy()
+        gappy[2, 1] = np.nan  # A level missing a dewpoint is dropped
+
+        padded = pad_profiles([profile, gappy])
+        self.assertEqual(len(padded), 6)
+        for variable, values in enumerate(padded):
+            self.assertEqual(values.shape, (2, 8))
+            np.testing.assert_array_equal(values[0], profile[variable])
+            np.testing.assert_array_equal(values[1, :4], np.delete(gappy[variable], 1))
+            self.assertTrue(np.isnan(values[1, 4:]).all())
+
+if __name__ == '__main__':
+    unittest.main()
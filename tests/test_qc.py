@@ -0,0 +1,85 @@
+import unittest
+import numpy as np
+
+from stream_geojson import COLUMNS
+from sounding import BEGIN_MISSING_TEMPERATURE, END_MISSING_TEMPERATURE, MISSING_FLAGS
+from qc import quality_control, QCError, MIN_LEVELS, MIN_DEPTH
+
+def ascent(levels=20, depth=10000.0):
+    """Raw stream_geojson columns of a clean ascent: surface first, pressure falling and height rising every level."""
+    height = np.linspace(0.0, depth, levels)
+    temp = 293.15 - 0.0065 * height
+    return {
+        'pressure': 1000.0 * np.exp(-height / 8000.0),
+        'temp': temp,
+        'dewpoint': temp - 5.0,
+        'wind_u': np.linspace(5.0, 40.0, levels),
+        'wind_v': np.linspace(0.0, 10.0, levels),
+        'gpheight': height,
+        'time': np.arange(levels) * 10.0,
+        'flags': np.full(levels, np.nan),
+        'lon': np.full(levels, -97.4),
+        'lat': np.full(levels, 35.2),
+        'alt': height,
+    }
+
+class QualityControlTest(unittest.TestCase):
+    def test_clean_profile_is_unchanged(self):
+        columns = ascent()
+        kept, report = quality_control(columns)
+        self.assertFalse(report.repaired)
+        self.assertIsNone(report.rejected)
+        self.assertEqual(set(kept), set(COLUMNS))
+        for name in COLUMNS:
+            np.testing.assert_array_equal(kept[name], columns[name])
+
+    def test_duplicate_pressures_keep_the_first_report(self):
+        columns = ascent()
+        # A second report of level 5 with a different temperature, later in the file
+        columns = {name: np.append(column, column[5] + (1.0 if name == 'temp' else 0.0)) for name, column in columns.items()}
+        columns['time'][-1] = columns['time'][5]
+        kept, report = quality_control(columns)
+        self.assertEqual(report.duplicates, 1)
+        self.assertEqual(report.kept, 20)
+        np.testing.assert_array_equal(kept['temp'], ascent()['temp'])
+
+    def test_descent_after_burst_is_dropped(self):
+        columns = ascent()
+        # Three levels of the balloon coming back down, after the top
+        descent = {name: column[-2:-5:-1] for name, column in columns.items()}
+        descent['time'] = columns['time'][-1] + np.arange(1, 4) * 10.0
+        columns = {name: np.concatenate((column, descent[name])) for name, column in columns.items()}
+        kept, report = quality_control(columns)
+        self.assertEqual(report.descent, 3)
+        np.testing.assert_array_equal(kept['pressure'], ascent()['pressure'])
+
+    def test_missing_temperature_span_is_dropped(self):
+        columns = ascent()
+        # Levels 6-8 lie between the begin and end flags of a missing-temperature span; the other flags are unset
+        columns['flags'][[5, 9]] = BEGIN_MISSING_TEMPERATURE, END_MISSING_TEMPERATURE
+        columns['flags'][0] = MISSING_FLAGS
+        kept, report = quality_control(columns)
+        self.assertEqual(report.flagged, 3)
+        np.testing.assert_array_equal(kept['gpheight'], np.delete(ascent()['gpheight'], [6, 7, 8]))
+
+    def test_too_few_levels_is_rejected(self):
+        with self.assertRaises(QCError) as raised:
+            quality_control(ascent(levels=MIN_LEVELS - 1))
+        self.assertEqual(raised.exception.report.kept, MIN_LEVELS - 1)
+        self.assertIn(f'at least {MIN_LEVELS}', raised.exception.report.rejected)
+
+    def test_too_few_levels_after_repairs_is_rejected(self):
+        # Enough levels are read, but missing values leave fewer than MIN_LEVELS
+        columns = ascent(levels=MIN_LEVELS + 2)
+        columns['dewpoint'][1:4] = np.nan
+        with self.assertRaises(QCError) as raised:
+            quality_control(columns)
+        self.assertEqual(raised.exception.report.missing, 3)
+
+    def test_shallow_profile_is_rejected(self):
+        with self.assertRaises(QCError) as raised:
+            quality_control(ascent(depth=MIN_DEPTH - 500.0))
+        self.assertIn(f'at least {MIN_DEPTH:.0f} m', raised.exception.report.rejected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+import os
+import sys
+import argparse
+import numpy as np
+from sounding import (Sounding, significance_bits, SURFACE, STANDARD_LEVEL, TROPOPAUSE, MAX_WIND, SIGNIFICANT_TEMPERATURE,
+                      SIGNIFICANT_HUMIDITY, SIGNIFICANT_WIND, FREEZING_LEVEL)
+
+# Level thinning, off unless enabled (--thin, RADIOSONDE_THIN=1)
+THIN = os.environ.get('RADIOSONDE_THIN', '') not in ('', '0')
+TEMPERATURE_TOLERANCE = float(os.environ.get('RADIOSONDE_THIN_TEMPERATURE', 0.1))  # °C, temperature and dewpoint
+WIND_TOLERANCE = float(os.environ.get('RADIOSONDE_THIN_WIND', 1.0))  # kt, vector wind
+
+# Levels carrying any of these BUFR significance flags (see sounding.py) are always kept
+KEEP_FLAGS = (SURFACE | STANDARD_LEVEL | TROPOPAUSE | MAX_WIND | SIGNIFICANT_TEMPERATURE | SIGNIFICANT_HUMIDITY
+              | SIGNIFICANT_WIND | FREEZING_LEVEL)
+
+# Indices compared by thinning_report (batch_calc names)
+REPORT_INDICES = ['cape', 'cin', 'mlcape', 'mucape', 'height_lcl', 'height_lfc', 'height_el', 'srh3', 'srh6', 'pwat']
+
+_thin = THIN
+
+def configure_thinning(enabled):
+    """Thin the levels of every sounding rendered by this process, and by worker processes spawned after this call."""
+    global _thin
+    _thin = bool(enabled)
+    os.environ['RADIOSONDE_THIN'] = '1' if enabled else '0'
+
+def thinning_enabled():
+    return _thin
+
+def _flagged(flags, keep_flags):
+    # Levels whose significance intersects keep_flags; NaN and the all-ones missing value carry no flags
+    if flags is None:
+        return None
+    return (significance_bits(flags) & keep_flags) != 0
+
+def thin_levels(pressures, temperatures, dewpoints, wind_u, wind_v, flags=None,
+                temperature_tolerance=TEMPERATURE_TOLERANCE, wind_tolerance=WIND_TOLERANCE, keep_flags=KEEP_FLAGS):
+    """
+    Levels to keep so that no profile moves by more than the tolerances on the Skew-T.
+
+    Douglas-Peucker in skew-T space: a dropped level is replaced by linear interpolation in log-pressure
+    between its kept neighbours, which is how the diagram draws the line (the skew is linear in log-pressure,
+    so a temperature error is the same horizontal distance on the skewed axis). Every segment whose worst
+    level exceeds a tolerance is split at that level, all segments at once per pass, until none does. The
+    surface, the top, flagged levels (`keep_flags`) and the edges of runs of missing values are always kept.
+
+    Parameters:
+    - pressures, temperatures, dewpoints, wind_u, wind_v: Profile arrays, surface first (hPa, °C, °C, kt, kt)
+    - flags: Optional BUFR significance of each level (Sounding.flags)
+    - temperature_tolerance: Largest temperature and dewpoint deviation (°C)
+    - wind_tolerance: Largest vector wind deviation (kt)
+    - keep_flags: Significance bits of the levels that are never dropped
+
+    Returns:
+    - keep: Sorted indices of the kept levels
+    """
+    log_p = np.log(np.asarray(pressures, dtype=float))
+    values = np.vstack((temperatures, dewpoints, wind_u, wind_v)).astype(float)
+    levels = len(log_p)
+    if levels <= 2:
+        return np.arange(levels)
+
+    keep = np.zeros(levels, dtype=bool)
+    keep[[0, -1]] = True
+    flagged = _flagged(flags, keep_flags)
+    if flagged is not None:
+        keep |= flagged
+    # Missing data starts or ends here: keep both sides so interpolation never bridges a gap
+    missing = np.isnan(values) | np.isnan(log_p)
+    edges = np.any(missing[:, 1:] != missing[:, :-1], axis=0)
+    keep[1:] |= edges
+    keep[:-1] |= edges
+    keep |= np.isnan(log_p)
+
+    scale = np.array([temperature_tolerance, temperature_tolerance, wind_tolerance])[:, None]
+    index = np.arange(levels)
+    while True:
+        kept = np.flatnonzero(keep)
+        segment = np.searchsorted(kept, index, side='right') - 1
+        left = kept[segment]
+        right = kept[np.minimum(segment + 1, len(kept) - 1)]
+
+        # Deviation of every level from the chord of its segment, in units of the tolerances
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = (log_p - log_p[left]) / (log_p[right] - log_p[left])
+            chord = values[:, left] + weight * (values[:, right] - values[:, left])
+            error = values - chord
+            error = np.vstack((np.abs(error[:2]), np.hypot(error[2], error[3])[None])) / scale
+        error = np.where(keep, 0, np.nan_to_num(np.max(np.nan_to_num(error), axis=0)))
+
+        # Split every segment at its worst level, if that level is out of tolerance
+        worst = np.maximum.reduceat(error, kept)[segment]
+        split = np.flatnonzero((error > 1) & (error == worst))
+        if not len(split):
+            return kept
+        # One split per segment (the first of equal maxima)
+        split = split[np.r_[True, segment[split][1:] != segment[split][:-1]]]
+        keep[split] = True
+
+def thin_sounding(sounding, temperature_tolerance=TEMPERATURE_TOLERANCE, wind_tolerance=WIND_TOLERANCE,
+                  keep_flags=KEEP_FLAGS):
+    """Sounding with only the levels of thin_levels; the profile is a new contiguous block."""
+    keep = thin_levels(sounding.pressures, sounding.temperatures, sounding.dewpoints, sounding.wind_u, sounding.wind_v,
+                       sounding.flags, temperature_tolerance, wind_tolerance, keep_flags)
+    flags = None if sounding.flags is None else np.asarray(sounding.flags)[keep]
+    return Sounding(np.ascontiguousarray(sounding.profile[:, keep]), sounding.elevation, sounding.station_id,
+                    sounding.lat, sounding.lon, sounding.location, sounding.timestamp, flags, sounding.qc)
+
+def max_deviation(sounding, thinned):
+    """Largest temperature, dewpoint (°C) and vector wind (kt) deviation of the thinned profile, on the original levels."""
+    log_p, thinned_log_p = np.log(sounding.pressures[::-1]), np.log(thinned.pressures[::-1])
+    deviation = {}
+    for name in ('temperatures', 'dewpoints', 'wind_u', 'wind_v'):
+        values, thinned_values = getattr(sounding, name)[::-1], getattr(thinned, name)[::-1]
+        valid, thinned_valid = ~np.isnan(values), ~np.isnan(thinned_values)
+        interpolated = np.interp(log_p[valid], thinned_log_p[thinned_valid], thinned_values[thinned_valid])
+        deviation[name] = np.zeros_like(values)
+        deviation[name][valid] = interpolated - values[valid]
+    return {
+        'temperature': float(np.max(np.abs(deviation['temperatures']))),
+        'dewpoint': float(np.max(np.abs(deviation['dewpoints']))),
+        'wind': float(np.max(np.hypot(deviation['wind_u'], deviation['wind_v']))),
+    }
+
+def thinning_report(sounding, thinned):
+    """
+    Effect of thinning a sounding.
+
+    Returns:
+    - Dictionary with 'levels' and 'thinned_levels', the max_deviation values, and for every
+      REPORT_INDICES name the (original, thinned) values of the batch_calc index
+    """
+    from batch_calc import batch_calc, pad_profiles
+
+    results = batch_calc(*pad_profiles([sounding.profile, thinned.profile]), sounding.lat)
+    report = {'levels': len(sounding), 'thinned_levels': len(thinned)}
+    report.update(max_deviation(sounding, thinned))
+    report.update({name: (float(results[name][0]), float(results[name][1])) for name in REPORT_INDICES})
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Thin the levels of soundings and report the effect on the indices.')
+    parser.add_argument('paths', nargs='+', help='GeoJSON sounding files')
+    parser.add_argument('--temperature', type=float, default=TEMPERATURE_TOLERANCE,
+                        help='Temperature and dewpoint tolerance in °C (default: RADIOSONDE_THIN_TEMPERATURE or 0.1)')
+    parser.add_argument('--wind', type=float, default=WIND_TOLERANCE,
+                        help='Wind tolerance in kt (default: RADIOSONDE_THIN_WIND or 1)')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from sounding_cache import load_sounding
+
+    args = parse_args(argv)
+    for path in args.paths:
+        sounding = load_sounding(path)
+        report = thinning_report(sounding, thin_sounding(sounding, args.temperature, args.wind))
+        print(f"  > {path}: {report['levels']} -> {report['thinned_levels']} levels | max deviation "
+              f"T {report['temperature']:.2f}°C, Td {report['dewpoint']:.2f}°C, wind {report['wind']:.2f} kt")
+        for name in REPORT_INDICES:
+            original, thinned = report[name]
+            print(f'    {name:<12} {original:10.1f} -> {thinned:10.1f} ({thinned - original:+.1f})')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
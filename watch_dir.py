@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, BrokenExecutor, wait, FIRST_COMPLETED
+from main import INPUT_DIR, process_file, make_pool, configure_memory_guard, format_runtime, stop_on_memory_ceiling
+from memory_guard import MAX_MEMORY_MB, MemoryCeilingError
+from metrics import configure_metrics, METRICS_PATH, PROFILE_DIR, PROFILER
+
+# Ledger of processed soundings (SQLite), so a restarted daemon only picks up what's new
+LEDGER_PATH = os.environ.get('RADIOSONDE_LEDGER', 'processed_soundings.sqlite')
+
+POLL_INTERVAL = 1.0  # Seconds between directory scans
+QUEUE_PER_WORKER = 2  # Files in flight per worker; the rest waits on disk, not in memory
+BROKEN_POOL_RETRIES = 3  # Pools a file version may be in flight in when they break before it is recorded as failed
+
+class ProcessedLedger:
+    """Which file versions (path, size, mtime) were already processed, and with what outcome."""
+
+    def __init__(self, path=LEDGER_PATH):
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS processed ('
+            'path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, '
+            'status TEXT NOT NULL, error TEXT, runtime REAL, processed_at TEXT NOT NULL)')
+
+    def signatures(self):
+        """Dictionary path -> (size, mtime_ns) of every recorded file."""
+        rows = self.connection.execute('SELECT path, size, mtime_ns FROM processed')
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def record(self, path, signature, status, error=None, runtime=None):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path, *signature, status, error, runtime, datetime.now(timezone.utc).isoformat(timespec='seconds')))
+
+def scan(input_dir):
+    """Dictionary filename -> (size, mtime_ns) of the .json soundings in a directory."""
+    signatures = {}
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                stat = entry.stat()
+                signatures[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+def watch_directory(input_dir=INPUT_DIR, workers=1, use_cache=True, ledger_path=LEDGER_PATH, poll_interval=POLL_INTERVAL,
+                    max_memory=MAX_MEMORY_MB, trace_memory=False, recycle_after=None, metrics=METRICS_PATH,
+                    profile_dir=PROFILE_DIR, profiler=PROFILER, once=False):
+    """
+    Process new and changed soundings as they land in `input_dir`, until interrupted.
+
+    The directory is polled every `poll_interval` seconds. A file is queued once its size and
+    modification time stayed unchanged for a full interval (so half-written files are skipped),
+    and at most QUEUE_PER_WORKER files per worker are in flight. Every outcome is written to
+    the ledger, so each file version is processed exactly once, across restarts too. A file
+    that failed is retried only when it changes. When a worker dies (e.g. killed for memory), the
+    pool is rebuilt and the files that were in flight are requeued unrecorded; a file in flight
+    in BROKEN_POOL_RETRIES broken pools is recorded as failed. With a single worker, the watcher
+    stops once its process stays above `max_memory`; a restart resumes from the ledger.
+
+    Parameters:
+    - input_dir: Directory to watch
+    - workers: Worker processes; 1 renders in a single background thread of this process
+    - ledger_path: SQLite ledger of processed files
+    - once: Stop as soon as everything currently in the directory is processed
+
+    Returns:
+    - failures: List of (filename, error message) tuples
+    """
+    ledger = ProcessedLedger(ledger_path)
+    done = ledger.signatures()
+    failures = []
+
+    if workers <= 1:
+        configure_memory_guard(max_memory, trace_memory)
+        configure_metrics(metrics, profile_dir, profiler)
+
+    def new_executor():
+        if workers <= 1:
+            return ThreadPoolExecutor(max_workers=1)
+        return make_pool(workers, max_memory, trace_memory, recycle_after, metrics, profile_dir, profiler)
+
+    executor = new_executor()
+    capacity = QUEUE_PER_WORKER * max(workers, 1)
+
+    first_seen = {}  # filename -> (signature, time it was first seen with that signature)
+    in_flight = {}  # future -> (filename, signature)
+    broken = {}  # (filename, signature) -> broken pools the file version was in flight in
+    print(f'  > WATCHING: {os.path.abspath(input_dir)} with {max(workers, 1)} worker(s)')
+
+    try:
+        while True:
+            now = time.monotonic()
+            current = scan(input_dir)
+            running = {filename for filename, _ in in_flight.values()}
+            pending = [filename for filename, signature in current.items()
+                       if done.get(os.path.abspath(os.path.join(input_dir, filename))) != signature
+                       and filename not in running]
+
+            # Only files that stopped changing for a full poll interval, oldest first
+            first_seen = {filename: first_seen[filename] if first_seen.get(filename, (None,))[0] == current[filename]
+                          else (current[filename], now) for filename in pending}
+            ready = sorted((seen, filename) for filename, (_, seen) in first_seen.items() if now - seen >= poll_interval)
+
+            pool_broken = False
+            for _, filename in ready[:max(capacity - len(in_flight), 0)]:
+                try:
+                    future = executor.submit(process_file, filename, input_dir, use_cache)
+                except BrokenExecutor:
+                    pool_broken = True
+                    break
+                in_flight[future] = (filename, current[filename])
+
+            if once and not pending and not in_flight:
+                return failures
+            if not in_flight and not pool_broken:
+                time.sleep(poll_interval)
+                continue
+
+            finished, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            requeued = 0
+            for future in finished:
+                filename, signature = in_flight.pop(future)
+                path = os.path.abspath(os.path.join(input_dir, filename))
+                try:
+                    elapsed_time, _ = future.result()
+                    ledger.record(path, signature, 'done', runtime=elapsed_time)
+                    print(f'  > DONE: {filename} | RUNTIME: {format_runtime(elapsed_time)}')
+                except MemoryCeilingError as e:
+                    # Rendered in this process (workers=1), which can't be replaced: stop, a restart resumes
+                    ledger.record(path, signature, 'done', runtime=e.result[0])
+                    stop_on_memory_ceiling(e, [name for name, _ in in_flight.values()])
+                    return failures
+                except BrokenExecutor as e:
+                    # The sounding may be fine: requeue it, unless it was in flight in every recent broken pool
+                    pool_broken = True
+                    broken[filename, signature] = broken.get((filename, signature), 0) + 1
+                    if broken[filename, signature] < BROKEN_POOL_RETRIES:
+                        requeued += 1
+                        continue
+                    error = f'{type(e).__name__}: worker died {BROKEN_POOL_RETRIES} times while processing it'
+                    ledger.record(path, signature, 'failed', error=error)
+                    failures.append((filename, error))
+                    print(f'  > FAILED: {filename} | {error}')
+                except Exception as e:
+                    error = f'{type(e).__name__}: {e}'
+                    ledger.record(path, signature, 'failed', error=error)
+                    failures.append((filename, error))
+                    print(f'  > FAILED: {filename} | {error}')
+                done[path] = signature
+
+            if pool_broken:
+                # Every other future of the dead pool fails the same way: requeue them all on a new pool
+                for filename, signature in in_flight.values():
+                    broken[filename, signature] = broken.get((filename, signature), 0) + 1
+                print(f'  > POOL BROKEN: a worker died, restarting the pool and requeueing '
+                      f'{len(in_flight) + requeued} sounding(s) in flight')
+                in_flight.clear()
+                executor.shutdown(wait=True, cancel_futures=True)
+                executor = new_executor()
+    except KeyboardInterrupt:
+        print(f'  > STOPPED: {len(in_flight)} sounding(s) in flight are not recorded and will be picked up on restart')
+        return failures
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)